@@ -0,0 +1,123 @@
+import os
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def _env_bool(name, default=False):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name, default=""):
+    """Read a comma separated list from the environment"""
+    value = os.getenv(name, default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Settings:
+    """Application settings read from environment variables"""
+    def __init__(self):
+        # Models
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.llm_model = os.getenv("LLM_MODEL", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+        # Inference precision applied when models load: "auto", "fp32", "bf16"
+        # (where supported) or "int8" (dynamic quantization of Linear layers, CPU)
+        self.inference_precision = os.getenv("INFERENCE_PRECISION", "auto")
+
+        # Comma separated list of models to load at startup ("embedding", "llm")
+        self.model_warmup = _env_list("MODEL_WARMUP", "embedding")
+        self.model_warmup_background = _env_bool("MODEL_WARMUP_BACKGROUND", True)
+
+        # Vector database
+        self.vector_db_path = os.getenv("VECTOR_DB_PATH", "chroma_db")
+        self.index_batch_size = int(os.getenv("INDEX_BATCH_SIZE", "64"))
+        # Retrieval backend: "chroma" (collection.query) or "numpy" (exact in-process index)
+        self.vector_index_backend = os.getenv("VECTOR_INDEX_BACKEND", "chroma")
+
+        # Query embedding cache (size 0 disables it, TTL 0 means no expiry)
+        self.query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+        # Lexical fast path that resolves prompts naming a function without embedding them
+        self.lexical_fast_path = _env_bool("LEXICAL_FAST_PATH", True)
+        self.lexical_min_margin = float(os.getenv("LEXICAL_MIN_MARGIN", "1.5"))
+
+        # Session-aware retrieval: vector search candidates are re-ranked with a
+        # prior favouring functions close to those used earlier in the session
+        self.context_prior_weight = float(os.getenv("CONTEXT_PRIOR_WEIGHT", "0.2"))
+        self.context_prior_functions = int(os.getenv("CONTEXT_PRIOR_FUNCTIONS", "3"))
+        self.context_candidates = int(os.getenv("CONTEXT_CANDIDATES", "5"))
+
+        # LLM generation: token budget and batching of concurrent requests into
+        # groups whose prompt lengths differ by at most LLM_BATCH_MAX_PADDING tokens
+        self.llm_max_new_tokens = int(os.getenv("LLM_MAX_NEW_TOKENS", "256"))
+        self.llm_batching = _env_bool("LLM_BATCHING", True)
+        self.llm_batch_max_size = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+        self.llm_batch_window_ms = float(os.getenv("LLM_BATCH_WINDOW_MS", "20"))
+        self.llm_batch_max_padding = int(os.getenv("LLM_BATCH_MAX_PADDING", "16"))
+        self.llm_batch_timeout = float(os.getenv("LLM_BATCH_TIMEOUT", "300"))
+
+        # Generated code caches: template scripts (memory) and LLM-generated code
+        # (memory, plus a JSON-lines file when LLM_CODE_CACHE_PATH is set)
+        self.codegen_cache_size = int(os.getenv("CODEGEN_CACHE_SIZE", "1024"))
+        self.llm_code_cache_size = int(os.getenv("LLM_CODE_CACHE_SIZE", "256"))
+        self.llm_code_cache_path = os.getenv("LLM_CODE_CACHE_PATH", "")
+
+        # Micro-batching of concurrent query embeddings
+        self.embed_batching = _env_bool("EMBED_BATCHING", True)
+        self.embed_batch_window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+        self.embed_batch_max_size = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+
+        # Maximum number of prompts accepted by /execute/batch
+        self.execute_batch_max_items = int(os.getenv("EXECUTE_BATCH_MAX_ITEMS", "100"))
+
+        # Request timing: per-stage histograms on /metrics and a Server-Timing header
+        self.metrics_enabled = _env_bool("METRICS_ENABLED", True)
+        self.server_timing_header = _env_bool("SERVER_TIMING_HEADER", True)
+
+        # Background sampling of CPU, memory and disk usage for the system functions
+        self.system_sampler_enabled = _env_bool("SYSTEM_SAMPLER_ENABLED", True)
+        self.system_sampler_interval = float(os.getenv("SYSTEM_SAMPLER_INTERVAL", "1.0"))
+        self.system_sampler_history_seconds = float(os.getenv("SYSTEM_SAMPLER_HISTORY_SECONDS", "300"))
+        self.system_sampler_disk_interval = float(os.getenv("SYSTEM_SAMPLER_DISK_INTERVAL", "10"))
+
+        # Thread pools for the blocking stages of /execute
+        self.search_workers = int(os.getenv("SEARCH_WORKERS", "4"))
+        self.codegen_workers = int(os.getenv("CODEGEN_WORKERS", "4"))
+        self.execution_workers = int(os.getenv("EXECUTION_WORKERS", "16"))
+        self.io_workers = int(os.getenv("IO_WORKERS", "4"))
+
+        # Background execution jobs
+        self.job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.job_max_queue = int(os.getenv("JOB_MAX_QUEUE", "100"))
+        self.job_max_retained = int(os.getenv("JOB_MAX_RETAINED", "1000"))
+        self.job_retention_seconds = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+        # Streaming shell output
+        self.shell_stream_max_bytes = int(os.getenv("SHELL_STREAM_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.shell_stream_timeout = float(os.getenv("SHELL_STREAM_TIMEOUT", "300"))
+
+        # Live sessions kept in memory
+        self.session_max = int(os.getenv("SESSION_MAX", "1000"))
+        self.session_idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+        self.session_sweep_interval = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+        # Session persistence: "file" (append-only JSON logs) or "sqlite" (shared by workers)
+        self.session_backend = os.getenv("SESSION_BACKEND", "file")
+        self.session_dir = os.getenv("SESSION_DIR", "sessions")
+        self.session_db_path = os.getenv("SESSION_DB_PATH", os.path.join(self.session_dir, "sessions.db"))
+        self.session_db_pool_size = int(os.getenv("SESSION_DB_POOL_SIZE", "4"))
+        # Durability: "always" (sync every write), "interval" or "shutdown"
+        self.session_durability = os.getenv("SESSION_DURABILITY", "interval")
+        self.session_flush_interval = float(os.getenv("SESSION_FLUSH_INTERVAL", "1.0"))
+        self.session_compact_after = int(os.getenv("SESSION_COMPACT_AFTER", "100"))
+
+
+settings = Settings()
@@ -4,6 +4,9 @@ import socket
 import os
 from datetime import datetime
 
+# Imported as a module so the registry does not pick up its functions
+from app.services import system_sampler
+
 def get_system_info():
     """
     Get comprehensive system information.
@@ -24,28 +27,56 @@ def get_system_info():
     }
     return info
 
-def get_cpu_usage():
+def _samples(window=None):
+    """Samples of the running background sampler (the latest, or a window in seconds), or None"""
+    sampler = system_sampler.running_sampler()
+    if sampler is None:
+        return None
+    if window:
+        return sampler.window(float(window)) or None
+    latest = sampler.latest()
+    return [latest] if latest else None
+
+def _mean(values):
+    return sum(values) / len(values)
+
+def get_cpu_usage(per_cpu=False, window=None):
     """
     Get current CPU usage percentage.
     
+    Args:
+        per_cpu (bool): One CPU percentage per processor core
+        window (float, optional): Seconds of CPU history to average
+    
     Returns:
-        float: CPU usage percentage
+        float: CPU usage percentage (list of floats with per_cpu)
     """
-    return psutil.cpu_percent(interval=1)
+    samples = _samples(window)
+    if samples is None:
+        # No background sampler in this process: measure for one second
+        return psutil.cpu_percent(interval=1, percpu=per_cpu)
+    if per_cpu:
+        return [round(_mean(core), 1) for core in zip(*(sample["per_cpu_percent"] for sample in samples))]
+    return round(_mean([sample["cpu_percent"] for sample in samples]), 1)
 
-def get_memory_usage():
+def get_memory_usage(window=None):
     """
     Get current memory usage details.
     
+    Args:
+        window (float, optional): Seconds of memory history to average
+    
     Returns:
         dict: Memory usage statistics
     """
-    vm = psutil.virtual_memory()
+    samples = _samples(window)
+    memory = [sample["memory"] for sample in samples] if samples else [psutil.virtual_memory()]
+    percent = _mean([vm.percent for vm in memory])
     return {
-        "total": f"{vm.total / (1024.0**3):.2f} GB",
-        "available": f"{vm.available / (1024.0**3):.2f} GB",
-        "used": f"{vm.used / (1024.0**3):.2f} GB",
-        "percentage": f"{vm.percent}%"
+        "total": f"{memory[-1].total / (1024.0**3):.2f} GB",
+        "available": f"{_mean([vm.available for vm in memory]) / (1024.0**3):.2f} GB",
+        "used": f"{_mean([vm.used for vm in memory]) / (1024.0**3):.2f} GB",
+        "percentage": f"{percent if len(memory) == 1 else round(percent, 1)}%"
     }
 
 def get_disk_usage():
@@ -55,16 +86,23 @@ def get_disk_usage():
     Returns:
         dict: Disk usage statistics for each drive/partition
     """
+    samples = _samples()
+    if samples:
+        usage = samples[-1]["disks"]
+    else:
+        usage = {}
+        for partition in psutil.disk_partitions():
+            try:
+                usage[partition.mountpoint] = psutil.disk_usage(partition.mountpoint)
+            except OSError:
+                # Unreadable, stale or vanished mounts (PermissionError, ENOENT, EIO)
+                continue
     disks = {}
-    for partition in psutil.disk_partitions():
-        try:
-            partition_usage = psutil.disk_usage(partition.mountpoint)
-            disks[partition.mountpoint] = {
-                "total": f"{partition_usage.total / (1024.0**3):.2f} GB",
-                "used": f"{partition_usage.used / (1024.0**3):.2f} GB",
-                "free": f"{partition_usage.free / (1024.0**3):.2f} GB",
-                "percentage": f"{partition_usage.percent}%"
-            }
-        except PermissionError:
-            continue
+    for mountpoint, partition_usage in usage.items():
+        disks[mountpoint] = {
+            "total": f"{partition_usage.total / (1024.0**3):.2f} GB",
+            "used": f"{partition_usage.used / (1024.0**3):.2f} GB",
+            "free": f"{partition_usage.free / (1024.0**3):.2f} GB",
+            "percentage": f"{partition_usage.percent}%"
+        }
     return disks
\ No newline at end of file
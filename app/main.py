@@ -1,19 +1,51 @@
 from fastapi import FastAPI, HTTPException, Depends, Request,status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import uuid
 import inspect
 
+from app.config import settings
 from app.services.registry import FunctionRegistry
 from app.services.code_generator import CodeGenerator
 from app.services.context import SessionContext
+from app.services.sessions import SessionManager
+from app.services.session_store import get_session_store
+from app.services.model_manager import get_model_manager
+from app.services.executors import get_executor_pool
+from app.services.jobs import JobManager, QueueFullError
+from app.services.streaming import stream_command, format_sse, format_ndjson
+from app.services.system_sampler import get_system_sampler
+from app.utils.logging import PerformanceTimer
+from app.utils.metrics import PrometheusWriter
+from app.utils.timing import TimingMiddleware, get_request_metrics
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optionally load models ahead of the first request
+    model_manager.warmup(settings.model_warmup, background=settings.model_warmup_background)
+    # System functions answer from background samples instead of blocking
+    if settings.system_sampler_enabled:
+        get_system_sampler().start()
+    # Idle sessions leave memory even when no request arrives
+    sessions.start(settings.session_sweep_interval)
+    yield
+    get_system_sampler().stop()
+    sessions.close()
+    get_session_store().close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Function Execution API",
     description="API for executing automation functions using LLM+RAG",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -23,40 +55,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize services
-registry = FunctionRegistry()
-code_generator = CodeGenerator()
+# Per-stage request timing (Server-Timing header and /metrics)
+request_metrics = get_request_metrics()
+if settings.metrics_enabled:
+    app.add_middleware(TimingMiddleware, metrics=request_metrics, server_timing=settings.server_timing_header)
+
+# Initialize services (models are loaded lazily by the model manager)
+startup_timings = {}
+model_manager = get_model_manager()
+executors = get_executor_pool()
+
+with PerformanceTimer("Function registry initialization") as timer:
+    registry = FunctionRegistry(model_manager, executors)
+startup_timings["registry"] = timer.elapsed
+timer.log(logger)
+
+with PerformanceTimer("Code generator initialization") as timer:
+    code_generator = CodeGenerator(model_manager, plans=registry.code_plans)
+startup_timings["code_generator"] = timer.elapsed
+timer.log(logger)
+
+jobs = JobManager(
+    executors.get("jobs"),
+    max_queue_depth=settings.job_max_queue,
+    max_retained=settings.job_max_retained,
+    retention_seconds=settings.job_retention_seconds
+)
 
 # Session storage
-sessions = {}
+sessions = SessionManager(
+    max_sessions=settings.session_max,
+    idle_ttl=settings.session_idle_ttl
+)
 
 # Define request and response models
 class ExecuteRequest(BaseModel):
     prompt: str
     session_id: Optional[str] = None
     parameters: Optional[Dict[str, Any]] = None
+    background: bool = False
 
 class ExecuteResponse(BaseModel):
     function: str
     code: str
     execution_result: Optional[Dict[str, Any]] = None
     context: Optional[str] = None
+    retrieval_tier: Optional[str] = None
+    job_id: Optional[str] = None
+
+class BatchItem(BaseModel):
+    prompt: str
+    session_id: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+
+class ExecuteBatchRequest(BaseModel):
+    items: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    index: int
+    function: Optional[str] = None
+    code: Optional[str] = None
+    execution_result: Optional[Dict[str, Any]] = None
+    retrieval_tier: Optional[str] = None
+    error: Optional[str] = None
+
+class ExecuteBatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+class ShellStreamRequest(BaseModel):
+    command: str
+    timeout: Optional[float] = None
+    max_output_bytes: Optional[int] = None
+    format: str = "sse"
 
 # Dependency to get session context
 async def get_session(request: Request):
     session_id = request.query_params.get('session_id')
     
     if not session_id:
-        # Generate new session ID
-        session_id = f"session_{str(uuid.uuid4())}"
+        # Without an ID the client can never come back to this session, so
+        # keep it out of the session store and off the disk
+        return SessionContext(f"session_{str(uuid.uuid4())}", persist=False)
         
-    # Get or create session
-    if session_id not in sessions:
-        sessions[session_id] = SessionContext(session_id)
-    
-    return sessions[session_id]
+    # Get or create session (loading it reads from disk)
+    with request_metrics.stage("session"):
+        return await executors.run("io", sessions.get, session_id)
 
 @app.post("/execute", response_model=ExecuteResponse)
 async def execute_function(
@@ -68,15 +154,14 @@ async def execute_function(
     """
     try:
         # Get context from previous interactions
-        context_summary = session.get_context_summary()
+        with request_metrics.stage("context"):
+            context_summary = session.get_context_summary()
+            recent_functions = session.recent_functions(settings.context_prior_functions)
         
-        # Enhance the prompt with context if available
-        enhanced_prompt = request.prompt
-        if context_summary and "No previous interactions" not in context_summary:
-            enhanced_prompt = f"{request.prompt}\nContext from previous interactions:\n{context_summary}"
-        
-        # Search for the most relevant function
-        search_results = registry.search(enhanced_prompt)
+        # Search for the most relevant function; only the new prompt is
+        # embedded, the session contributes a prior over the functions it used
+        with request_metrics.stage("retrieval"):
+            search_results = await registry.asearch(request.prompt, recent_functions=recent_functions)
         
         if not search_results or not search_results['metadatas'] or not search_results['metadatas'][0]:
             raise HTTPException(status_code=404, detail="No matching function found")
@@ -86,34 +171,243 @@ async def execute_function(
         function_id = f"{function_metadata['module']}.{function_metadata['name']}"
         
         # Generate code for the function
-        code = code_generator.generate_function_code(function_metadata, request.prompt)
+        with request_metrics.stage("codegen"):
+            code = await executors.run(
+                "codegen", code_generator.generate_function_code, function_metadata, request.prompt
+            )
         
         # Execute the function if parameters are provided
         execution_result = None
-        if request.parameters:
+        job_id = None
+        if request.parameters and request.background:
+            # Run on the job pool and let the client poll /jobs/{job_id}
+            job = jobs.submit(
+                function_id,
+                registry.execute_function,
+                {"function_id": function_id, "kwargs": request.parameters}
+            )
+            job_id = job.id
+        elif request.parameters:
             kwargs = request.parameters
-            execution_result = registry.execute_function(function_id, kwargs=kwargs)
+            with request_metrics.stage("execution"):
+                execution_result = await executors.run(
+                    "execution", registry.execute_function, function_id, kwargs=kwargs
+                )
         
         # Store the interaction in session context
-        session.add_interaction(
-            request.prompt,
-            {
-                'function': function_id,
-                'execution_result': execution_result
-            }
-        )
+        with request_metrics.stage("persistence"):
+            await executors.run(
+                "io",
+                session.add_interaction,
+                request.prompt,
+                {
+                    'function': function_id,
+                    'execution_result': execution_result,
+                    'job_id': job_id
+                },
+                metadata={'retrieval_tier': search_results.get('tier')}
+            )
         
         # Return response
         return ExecuteResponse(
             function=function_id,
             code=code,
             execution_result=execution_result,
-            context=context_summary
+            context=context_summary,
+            retrieval_tier=search_results.get('tier'),
+            job_id=job_id
         )
         
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _generate_batch_code(matches):
+    """Generate code for (function_metadata, prompt) pairs, capturing errors per item"""
+    codes = []
+    for function_metadata, prompt in matches:
+        try:
+            codes.append((code_generator.generate_function_code(function_metadata, prompt), None))
+        except Exception as e:
+            codes.append((None, str(e)))
+    return codes
+
+@app.post("/execute/batch", response_model=ExecuteBatchResponse)
+async def execute_function_batch(request: ExecuteBatchRequest):
+    """
+    Execute several prompts in one call
+
+    Lexical matches are resolved per prompt; the remaining prompts are
+    embedded with one model call and looked up with one index query. Every
+    item gets its own result or error.
+    """
+    items = request.items
+    if len(items) > settings.execute_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch of {len(items)} items exceeds the limit of {settings.execute_batch_max_items}"
+        )
+
+    # Load each session once, however many items refer to it
+    session_ids = list(dict.fromkeys(item.session_id for item in items if item.session_id))
+    with request_metrics.stage("session"):
+        loaded = await asyncio.gather(*(executors.run("io", sessions.get, session_id) for session_id in session_ids))
+    batch_sessions = dict(zip(session_ids, loaded))
+
+    recent_functions = [
+        batch_sessions[item.session_id].recent_functions(settings.context_prior_functions) if item.session_id else None
+        for item in items
+    ]
+    try:
+        with request_metrics.stage("retrieval"):
+            search_results = await executors.run(
+                "search", registry.search_many, [item.prompt for item in items], recent_functions
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    results = [BatchItemResult(index=index) for index in range(len(items))]
+    matches = {}
+    for index, found in enumerate(search_results):
+        if found and found['metadatas'] and found['metadatas'][0]:
+            matches[index] = found['metadatas'][0][0]
+            results[index].function = f"{matches[index]['module']}.{matches[index]['name']}"
+            results[index].retrieval_tier = found.get('tier')
+        else:
+            results[index].error = "No matching function found"
+
+    # Code generation is cheap per item, so the whole batch is one executor call
+    with request_metrics.stage("codegen"):
+        codes = await executors.run(
+            "codegen", _generate_batch_code, [(matches[index], items[index].prompt) for index in matches]
+        )
+    for index, (code, error) in zip(matches, codes):
+        results[index].code = code
+        results[index].error = error
+
+    async def execute(result, parameters):
+        result.execution_result = await executors.run(
+            "execution", registry.execute_function, result.function, kwargs=parameters
+        )
+
+    with request_metrics.stage("execution"):
+        await asyncio.gather(*(
+            execute(results[index], items[index].parameters)
+            for index in matches if items[index].parameters and results[index].error is None
+        ))
+
+    def record_interactions():
+        # In item order, so a session's history matches the batch order
+        for item, result in zip(items, results):
+            if item.session_id and result.error is None:
+                batch_sessions[item.session_id].add_interaction(
+                    item.prompt,
+                    {'function': result.function, 'execution_result': result.execution_result, 'job_id': None},
+                    metadata={'retrieval_tier': result.retrieval_tier, 'batch': True}
+                )
+
+    if batch_sessions:
+        with request_metrics.stage("persistence"):
+            await executors.run("io", record_interactions)
+
+    return ExecuteBatchResponse(results=results)
+
+@app.post("/execute/stream")
+async def execute_function_stream(
+    request: ExecuteRequest,
+    session: SessionContext = Depends(get_session)
+):
+    """
+    Find the function for a prompt and stream LLM-generated code for it as
+    server-sent events: "function" (the match), "token" (code as it is
+    generated), then "done" with the complete code, or "error"
+    """
+    with request_metrics.stage("retrieval"):
+        search_results = await registry.asearch(
+            request.prompt,
+            recent_functions=session.recent_functions(settings.context_prior_functions)
+        )
+    if not search_results or not search_results['metadatas'] or not search_results['metadatas'][0]:
+        raise HTTPException(status_code=404, detail="No matching function found")
+
+    function_metadata = search_results['metadatas'][0][0]
+    function_id = f"{function_metadata['module']}.{function_metadata['name']}"
+    tier = search_results.get('tier')
+
+    def events():
+        # Runs on the threadpool, one chunk per iteration
+        yield format_sse({"event": "function", "function": function_id, "retrieval_tier": tier})
+        chunks = []
+        try:
+            for chunk in code_generator.llm.stream_code(function_metadata, request.prompt):
+                chunks.append(chunk)
+                yield format_sse({"event": "token", "data": chunk})
+        except Exception as e:
+            logger.exception("Streaming code generation failed")
+            yield format_sse({"event": "error", "error": str(e)})
+            return
+
+        code = "".join(chunks).strip()
+        session.add_interaction(
+            request.prompt,
+            {'function': function_id, 'execution_result': None, 'job_id': None},
+            metadata={'retrieval_tier': tier, 'streamed': True}
+        )
+        yield format_sse({"event": "done", "function": function_id, "code": code})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/shell/stream")
+async def stream_shell_command(request: ShellStreamRequest):
+    """
+    Run a shell command and stream its output line by line, as server-sent
+    events ("sse") or newline-delimited JSON ("ndjson")
+    """
+    formatters = {
+        "sse": (format_sse, "text/event-stream"),
+        "ndjson": (format_ndjson, "application/x-ndjson")
+    }
+    if request.format not in formatters:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{request.format}'")
+    formatter, media_type = formatters[request.format]
+
+    # Clients may lower the configured limits but not raise them
+    timeout = min(request.timeout or settings.shell_stream_timeout, settings.shell_stream_timeout)
+    max_output_bytes = min(request.max_output_bytes or settings.shell_stream_max_bytes,
+                           settings.shell_stream_max_bytes)
+
+    events = stream_command(request.command, max_output_bytes=max_output_bytes, timeout=timeout)
+    return StreamingResponse(
+        (formatter(event) for event in events),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status, result and timing of a background execution job
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued background execution job
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status} and cannot be cancelled")
+    return job.to_dict()
+
 @app.get("/functions")
 async def list_functions():
     """
@@ -139,9 +433,87 @@ async def list_functions():
 @app.get("/health")
 async def health_check():
     """
-    Health check endpoint
+    Health check endpoint, including model readiness and startup timings
     """
-    return {"status": "healthy", "version": "1.0.0"}
+    models = model_manager.status()
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "ready": models["embedding"]["loaded"],
+        "models": models,
+        "startup_seconds": startup_timings,
+        "query_cache": registry.db.query_cache.stats(),
+        "code_cache": code_generator.cache.stats(),
+        "retrieval_tiers": dict(registry.tier_counts),
+        "embedding_batches": registry.batcher.stats(),
+        "jobs": jobs.stats(),
+        "sessions": sessions.stats()
+    }
+
+def _cache_metrics(writer, caches):
+    """Counters and size gauges for LRUCache instances keyed by label"""
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    for counter in ("hits", "misses", "evictions", "expirations"):
+        writer.counter(f"cache_{counter}_total", f"Cache {counter}",
+                       [({"cache": name}, values[counter]) for name, values in stats.items()])
+    writer.gauge("cache_entries", "Entries held by the cache",
+                 [({"cache": name}, values["size"]) for name, values in stats.items()])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: request and per-stage latency histograms, cache,
+    batching, job, session and model gauges
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+
+    writer = PrometheusWriter()
+    writer.histogram("request_duration_seconds", "HTTP request latency by route",
+                     request_metrics.requests.snapshots())
+    writer.counter("requests_total", "HTTP responses by route and status", request_metrics.responses.samples())
+    writer.gauge("requests_in_progress", "HTTP requests being handled", request_metrics.in_progress)
+    writer.histogram("stage_duration_seconds", "Latency of request stages", request_metrics.stages.snapshots())
+
+    writer.counter("retrieval_tier_total", "Searches answered by each retrieval tier",
+                   [({"tier": tier}, count) for tier, count in registry.tier_counts.items()])
+    caches = {"query": registry.db.query_cache, "code": code_generator.cache}
+    llm_loaded = model_manager.is_loaded("llm")
+    if llm_loaded:
+        caches["llm_code"] = model_manager.llm.code_cache
+    _cache_metrics(writer, caches)
+
+    batchers = {"embedding": registry.batcher.stats()}
+    if llm_loaded and model_manager.llm.batcher is not None:
+        batchers["llm"] = model_manager.llm.batcher.stats()
+    writer.histogram("batch_size", "Requests per model batch",
+                     [({"batcher": name}, stats["batch_size"]) for name, stats in batchers.items()])
+    writer.histogram("batch_queue_wait_seconds", "Time requests waited for their batch",
+                     [({"batcher": name}, stats["queue_wait_seconds"]) for name, stats in batchers.items()])
+
+    job_counts = jobs.stats()
+    evicted = job_counts.pop("evicted")
+    writer.gauge("jobs", "Retained jobs by status", [({"status": state}, count) for state, count in job_counts.items()])
+    writer.counter("jobs_evicted_total", "Finished jobs evicted", evicted)
+
+    session_stats = sessions.stats()
+    writer.gauge("sessions_live", "Sessions held in memory", session_stats["live_sessions"])
+    writer.gauge("sessions_estimated_bytes", "Estimated memory held by live sessions", session_stats["estimated_bytes"])
+    writer.counter("session_evictions_total", "Sessions evicted from memory", session_stats["evictions"])
+    writer.counter("session_loads_total", "Sessions loaded from the store", session_stats["loads"])
+
+    sample = get_system_sampler().latest(wait=False) if settings.system_sampler_enabled else None
+    if sample is not None:
+        writer.gauge("system_cpu_percent", "CPU usage at the latest system sample", sample["cpu_percent"])
+        writer.gauge("system_memory_percent", "Memory usage at the latest system sample", sample["memory"].percent)
+
+    models = model_manager.status()
+    writer.gauge("model_loaded", "Whether a model is loaded",
+                 [({"model": name}, int(state["loaded"])) for name, state in models.items()])
+    writer.gauge("model_load_seconds", "Time taken to load a model",
+                 [({"model": name}, state["load_seconds"]) for name, state in models.items()
+                  if state["load_seconds"] is not None])
+    return PlainTextResponse(writer.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,25 +2,63 @@ import chromadb
 from chromadb.config import Settings
 import os
 import json
+import hashlib
 import inspect
 import importlib
 from app.functions import application, system, utilities
+from app.models.index import create_index
+from app.services.embedding import normalize_query
 
 class VectorDatabase:
-    def __init__(self, persist_directory="chroma_db"):
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_directory,
-            anonymized_telemetry=False
-        ))
-        self.collection = self.client.get_or_create_collection("function_registry")
-        
-    def add_function(self, function, description, module_name):
-        """Add a function to the vector database"""
+    def __init__(self, persist_directory="chroma_db", embedding_function=None, fingerprint_salt="",
+                 batch_size=64, index_backend="chroma", query_cache=None):
+        """
+        Open (or create) the persisted function index
+
+        Args:
+            persist_directory (str): Directory holding the Chroma index
+            embedding_function (callable, optional): Chroma embedding function
+            fingerprint_salt (str): Extra input to every fingerprint, e.g. the
+                embedding model name, so that changing it re-embeds everything
+            batch_size (int): Number of documents embedded per forward pass
+            index_backend (str): Backend answering searches ("chroma" or "numpy")
+            query_cache (LRUCache, optional): Cache of query embeddings
+        """
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        self.embedding_function = embedding_function
+        self.fingerprint_salt = fingerprint_salt
+        self.batch_size = batch_size
+        self.query_cache = query_cache
+        self.collection = self._get_collection()
+        self.index = create_index(index_backend, self.collection)
+
+    def _get_collection(self):
+        """Open the function collection with the configured embedding function"""
+        kwargs = {}
+        if self.embedding_function is not None:
+            kwargs["embedding_function"] = self.embedding_function
+        return self.client.get_or_create_collection("function_registry", **kwargs)
+
+    def build_function_record(self, function, description, module_name):
+        """
+        Build the document, metadata and fingerprint stored for a function
+
+        Args:
+            function (callable): Function to index
+            description (str): Short description of the function
+            module_name (str): Name of the module the function belongs to
+
+        Returns:
+            dict: Record with "id", "document" and "metadata" keys
+        """
         # Get function signature details
         signature = str(inspect.signature(function))
         doc = function.__doc__ or ""
         source = inspect.getsource(function)
-        
+
         # Metadata
         metadata = {
             "name": function.__name__,
@@ -29,22 +67,225 @@ class VectorDatabase:
             "docstring": doc.strip(),
             "source": source,
         }
-        
+
         # Create documents for embedding
         document = f"{function.__name__}{signature}\n{doc}\n{description}"
-        
+
+        metadata["fingerprint"] = self._fingerprint(document, metadata)
+        return {
+            "id": f"{module_name}.{function.__name__}",
+            "document": document,
+            "metadata": metadata
+        }
+
+    def _fingerprint(self, document, metadata):
+        """Content hash of everything that ends up in the index for a function"""
+        payload = json.dumps(
+            {"salt": self.fingerprint_salt, "document": document, "metadata": metadata},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_fingerprints(self):
+        """
+        Get the fingerprints of every indexed function
+
+        Returns:
+            dict: Mapping of function ID to stored fingerprint
+        """
+        stored = self.collection.get(include=["metadatas"])
+        return {
+            function_id: (metadata or {}).get("fingerprint")
+            for function_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+
+    def sync_functions(self, records):
+        """
+        Bring the index in line with the given records, embedding only what changed
+
+        Args:
+            records (list): Records built by build_function_record
+
+        Returns:
+            dict: Counts of "added", "updated", "removed" and "unchanged" functions
+        """
+        stored = self.get_fingerprints()
+        current = {record["id"]: record for record in records}
+
+        added = [record for function_id, record in current.items() if function_id not in stored]
+        updated = [
+            record for function_id, record in current.items()
+            if function_id in stored and stored[function_id] != record["metadata"]["fingerprint"]
+        ]
+        removed = [function_id for function_id in stored if function_id not in current]
+
+        if removed:
+            self.collection.delete(ids=removed)
+
+        changed = added + updated
+        self._write_records(changed, upsert=True)
+        if removed or changed:
+            self.index.refresh()
+
+        return {
+            "added": len(added),
+            "updated": len(updated),
+            "removed": len(removed),
+            "unchanged": len(current) - len(changed)
+        }
+
+    def add_function(self, function, description, module_name):
+        """Add a function to the vector database"""
+        record = self.build_function_record(function, description, module_name)
+
         # Add to collection
         self.collection.add(
-            documents=[document],
-            metadatas=[metadata],
-            ids=[f"{module_name}.{function.__name__}"]
+            documents=[record["document"]],
+            metadatas=[record["metadata"]],
+            ids=[record["id"]]
         )
-    
+        self.index.refresh()
+
+    def add_functions(self, functions, batch_size=None):
+        """
+        Add many functions at once, embedding their documents in batches
+
+        Args:
+            functions (list): (function, description, module_name) tuples
+            batch_size (int, optional): Documents per embedding call
+                (default: the database batch size)
+
+        Returns:
+            int: Number of functions added
+        """
+        records = [
+            self.build_function_record(function, description, module_name)
+            for function, description, module_name in functions
+        ]
+        self._write_records(records, batch_size=batch_size)
+        self.index.refresh()
+        return len(records)
+
+    def _write_records(self, records, batch_size=None, upsert=False):
+        """Embed records in batches and write them with as few collection calls as possible"""
+        if not records:
+            return
+
+        write = self.collection.upsert if upsert else self.collection.add
+        # Chroma caps the number of records accepted by a single call
+        max_write = getattr(self.client, "get_max_batch_size", lambda: len(records))()
+
+        for start in range(0, len(records), max_write):
+            chunk = records[start:start + max_write]
+            documents = [record["document"] for record in chunk]
+            write(
+                documents=documents,
+                metadatas=[record["metadata"] for record in chunk],
+                ids=[record["id"] for record in chunk],
+                embeddings=self._embed_documents(documents, batch_size or self.batch_size)
+            )
+
+    def _embed_documents(self, documents, batch_size):
+        """Embed documents batch_size at a time (None lets Chroma embed them)"""
+        if self.embedding_function is None:
+            return None
+
+        embeddings = []
+        for start in range(0, len(documents), batch_size):
+            embeddings.extend(self.embedding_function(documents[start:start + batch_size]))
+        return embeddings
+
+    def _query_cache_key(self, query):
+        # Key on the embedding model too so a model change never serves stale vectors
+        return (self.fingerprint_salt, normalize_query(query))
+
+    def embed_query(self, query):
+        """Embed a query with the configured embedding function, reusing cached vectors"""
+        if self.query_cache is None:
+            return self.embedding_function([query])[0]
+
+        return self.query_cache.get_or_set(
+            self._query_cache_key(query),
+            lambda: self.embedding_function([query])[0]
+        )
+
+    async def embed_query_async(self, query, batcher):
+        """
+        Embed a query, sending cache misses through an EmbeddingBatcher
+
+        Args:
+            query (str): Query text
+            batcher (EmbeddingBatcher): Batcher in front of the embedding model
+
+        Returns:
+            list: Query embedding
+        """
+        if self.query_cache is None:
+            return await batcher.embed(query)
+
+        key = self._query_cache_key(query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            embedding = await batcher.embed(query)
+            self.query_cache.set(key, embedding)
+        return embedding
+
+    def embed_queries(self, queries):
+        """
+        Embed several queries, embedding all cache misses with one call
+
+        Args:
+            queries (list): Query texts
+
+        Returns:
+            list: One embedding per query
+        """
+        if self.query_cache is None:
+            return list(self.embedding_function(list(queries)))
+
+        keys = [self._query_cache_key(query) for query in queries]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        # Duplicates within the batch are embedded once
+        missing = {}
+        for query, key, embedding in zip(queries, keys, embeddings):
+            if embedding is None and key not in missing:
+                missing[key] = query
+        if missing:
+            vectors = dict(zip(missing, self.embedding_function(list(missing.values()))))
+            for key, vector in vectors.items():
+                self.query_cache.set(key, vector)
+            embeddings = [vectors[key] if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+    def search_by_embeddings(self, query_embeddings, n_results=3):
+        """Search for the functions closest to each query embedding with one index query"""
+        return self.index.search_many(query_embeddings, n_results=n_results)
+
+    def get_embeddings(self, function_ids):
+        """
+        Get the stored embeddings of functions
+
+        Args:
+            function_ids (list): Function IDs
+
+        Returns:
+            dict: Mapping of function ID to its embedding (IDs not in the index are omitted)
+        """
+        stored = self.collection.get(ids=list(function_ids), include=["embeddings"])
+        return dict(zip(stored["ids"], stored["embeddings"]))
+
+    def search_by_embedding(self, query_embedding, n_results=3):
+        """Search for functions closest to an already computed query embedding"""
+        return self.index.search(query_embedding, n_results=n_results)
+
     def search_functions(self, query, n_results=3):
         """Search for functions matching the query"""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        
-        return results
\ No newline at end of file
+        if self.embedding_function is None:
+            # Let Chroma embed the query with its default embedding function
+            return self.collection.query(
+                query_texts=[query],
+                n_results=n_results
+            )
+
+        return self.search_by_embedding(self.embed_query(query), n_results=n_results)
@@ -0,0 +1,163 @@
+import numpy as np
+
+
+class ChromaIndex:
+    """Index backend that answers queries with Chroma's collection.query"""
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def refresh(self):
+        """Chroma queries the collection directly, nothing to rebuild"""
+        pass
+
+    def search(self, query_embedding, n_results=3):
+        """
+        Find the functions closest to a query embedding
+
+        Args:
+            query_embedding (list): Query vector
+            n_results (int): Number of results to return
+
+        Returns:
+            dict: Chroma query result ("ids", "metadatas", "documents", "distances")
+        """
+        return self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results
+        )
+
+    def search_many(self, query_embeddings, n_results=3):
+        """
+        Find the functions closest to each of several query embeddings with one query
+
+        Args:
+            query_embeddings (list): Query vectors
+            n_results (int): Number of results per query
+
+        Returns:
+            list: One Chroma-shaped result per query
+        """
+        if not len(query_embeddings):
+            return []
+        results = self.collection.query(
+            query_embeddings=list(query_embeddings),
+            n_results=n_results
+        )
+        keys = [key for key in ("ids", "metadatas", "documents", "distances") if results.get(key) is not None]
+        return [{key: [results[key][i]] for key in keys} for i in range(len(query_embeddings))]
+
+
+class NumpyIndex:
+    """
+    Exact in-process index over L2-normalized function embeddings
+
+    All embeddings live in one contiguous float32 matrix, so a query is a single
+    matrix-vector product followed by argpartition. Distances are reported as
+    squared L2 between unit vectors, the same metric as the default Chroma space.
+    """
+    name = "numpy"
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.ids = []
+        self.metadatas = []
+        self.documents = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.refresh()
+
+    def refresh(self):
+        """Reload every embedding from the collection into the matrix"""
+        stored = self.collection.get(include=["embeddings", "metadatas", "documents"])
+        self.ids = list(stored["ids"])
+        self.metadatas = list(stored["metadatas"])
+        self.documents = list(stored["documents"])
+
+        embeddings = stored["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        self.matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors):
+        """L2-normalize vectors along the last axis into a contiguous float32 array"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query_embedding, n_results=3):
+        """
+        Find the functions closest to a query embedding
+
+        Args:
+            query_embedding (list): Query vector
+            n_results (int): Number of results to return
+
+        Returns:
+            dict: Result in the same shape as Chroma's collection.query
+        """
+        return self.search_many([query_embedding], n_results=n_results)[0]
+
+    def search_many(self, query_embeddings, n_results=3):
+        """
+        Find the functions closest to each of several query embeddings
+
+        All queries are scored with a single matrix-matrix product.
+
+        Args:
+            query_embeddings (list): Query vectors
+            n_results (int): Number of results per query
+
+        Returns:
+            list: One result per query, in the same shape as Chroma's collection.query
+        """
+        k = min(n_results, len(self.ids))
+        if k == 0:
+            return [{"ids": [[]], "metadatas": [[]], "documents": [[]], "distances": [[]]}
+                    for _ in query_embeddings]
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        all_scores = queries @ self.matrix.T
+
+        results = []
+        for scores in all_scores:
+            if k < len(scores):
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            results.append({
+                "ids": [[self.ids[i] for i in top]],
+                "metadatas": [[self.metadatas[i] for i in top]],
+                "documents": [[self.documents[i] for i in top]],
+                "distances": [[float(2.0 - 2.0 * scores[i]) for i in top]],
+            })
+        return results
+
+
+INDEX_BACKENDS = {
+    ChromaIndex.name: ChromaIndex,
+    NumpyIndex.name: NumpyIndex,
+}
+
+
+def create_index(backend, collection):
+    """
+    Create an index backend by name
+
+    Args:
+        backend (str): "chroma" or "numpy"
+        collection: Chroma collection holding the function records
+
+    Returns:
+        ChromaIndex or NumpyIndex: The index backend
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown vector index backend '{backend}', expected one of {sorted(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](collection)
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+from app.utils.metrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched encode calls
+
+    Requests arriving within `max_wait_ms` of the first queued request (up to
+    `max_batch_size` of them) are embedded with a single call, which runs in
+    an executor so the event loop stays free, and the vectors are handed back
+    to the waiting callers.
+    """
+    def __init__(self, embed_batch, max_batch_size=32, max_wait_ms=5.0, executor=None):
+        """
+        Args:
+            embed_batch (callable): Embeds a list of texts, returning a list of vectors
+            max_batch_size (int): Maximum number of texts per encode call
+            max_wait_ms (float): How long to wait for more requests after the first
+            executor (Executor, optional): Executor running embed_batch (default: loop default)
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        """Start the batching task on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text):
+        """
+        Embed a single text as part of the next batch
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            list: Embedding vector
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Wait for a request, then gather more until the window closes or the batch is full"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            while not self._queue.empty() and len(batch) < self.max_batch_size:
+                batch.append(self._queue.get_nowait())
+            timeout = deadline - self._loop.time()
+            if len(batch) >= self.max_batch_size or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = [item for item in await self._collect() if not item[1].cancelled()]
+                if not batch:
+                    continue
+
+                started = time.perf_counter()
+                self.batch_sizes.observe(len(batch))
+                for _, _, enqueued in batch:
+                    self.queue_wait.observe(started - enqueued)
+
+                texts = [text for text, _, _ in batch]
+                vectors = await self._loop.run_in_executor(self.executor, self.embed_batch, texts)
+                if len(vectors) != len(batch):
+                    raise RuntimeError(f"Embedded {len(vectors)} vectors for {len(batch)} texts")
+                for (_, future, _), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                # Keep the worker alive; fail whatever this cycle left unresolved
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self):
+        """
+        Get batching histograms
+
+        Returns:
+            dict: Batch size and queue wait (seconds) histogram snapshots
+        """
+        return {
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+
+class GenerationBatcher:
+    """
+    Groups concurrent text generation requests into padded batches
+
+    Requests arriving within `max_wait_ms` of the first queued request (up to
+    `max_batch_size` of them) are sorted by prompt length and split into
+    groups whose lengths differ by at most `max_padding` tokens, so no row of
+    a batch is padded by more than that. Each group is one generate call on a
+    single worker thread; callers block until their completion is ready, or
+    at most `timeout` seconds.
+    """
+    def __init__(self, generate_batch, measure, max_batch_size=8, max_wait_ms=20.0, max_padding=16,
+                 timeout=300.0):
+        """
+        Args:
+            generate_batch (callable): Generates completions for a list of prompts
+            measure (callable): Returns a prompt's length in tokens
+            max_batch_size (int): Maximum number of prompts collected per cycle
+            max_wait_ms (float): How long to wait for more requests after the first
+            max_padding (int): Maximum length difference within one batch
+            timeout (float): Seconds a caller waits for its completion
+        """
+        self.generate_batch = generate_batch
+        self.measure = measure
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_padding = max_padding
+        self.timeout = timeout
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        """
+        Generate a completion for a prompt as part of the next batch
+
+        Args:
+            prompt (str): Prompt text
+
+        Returns:
+            str: The completion
+
+        Raises:
+            TimeoutError: No completion within `timeout` seconds
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((prompt, self.measure(prompt), future, time.perf_counter()))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The worker skips cancelled requests that are still queued
+            future.cancel()
+            raise TimeoutError(f"No completion within {self.timeout} seconds") from None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="generation-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        """Wait for a request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def group(self, items):
+        """
+        Split requests into groups of similar length
+
+        Args:
+            items (list): Requests as tuples whose second element is the length
+
+        Returns:
+            list: Lists of requests, shortest first
+        """
+        groups = []
+        for item in sorted(items, key=lambda item: item[1]):
+            if groups and item[1] - groups[-1][0][1] <= self.max_padding:
+                groups[-1].append(item)
+            else:
+                groups.append([item])
+        return groups
+
+    @staticmethod
+    def _resolve(future, result=None, exception=None):
+        """Hand a result or exception to a caller that may have given up waiting"""
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _generate_group(self, group):
+        """Generate one group and resolve every future in it"""
+        self.batch_sizes.observe(len(group))
+        try:
+            completions = self.generate_batch([prompt for prompt, _, _, _ in group])
+            if len(completions) != len(group):
+                raise RuntimeError(f"Generated {len(completions)} completions for {len(group)} prompts")
+        except Exception as e:
+            for _, _, future, _ in group:
+                self._resolve(future, exception=e)
+            return
+        for (_, _, future, _), completion in zip(group, completions):
+            self._resolve(future, completion)
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = [item for item in self._collect() if not item[2].cancelled()]
+                started = time.perf_counter()
+                for _, _, _, enqueued in batch:
+                    self.queue_wait.observe(started - enqueued)
+                for group in self.group(batch):
+                    self._generate_group(group)
+            except Exception as e:
+                # Keep the worker alive; fail whatever this cycle left unresolved
+                logger.exception("Generation batching failed")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        self._resolve(future, exception=e)
+
+    def stats(self):
+        """
+        Get batching histograms
+
+        Returns:
+            dict: Batch size and queue wait (seconds) histogram snapshots
+        """
+        return {
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
@@ -1,38 +1,28 @@
 import re
 import inspect
-from app.services.llm import LLMService
+from app.config import settings
+from app.services.model_manager import get_model_manager
+from app.utils.cache import LRUCache
 
-class CodeGenerator:
-    def __init__(self):
-        self.llm = LLMService()
-    
-    def generate_function_code(self, function_info, user_input=None):
-        """
-        Generate executable Python code for a function
-        
-        Args:
-            function_info (dict): Information about the function
-            user_input (str, optional): Original user query for context
-            
-        Returns:
-            str: Generated Python code
-        """
-        # Extract function details
-        module_name = function_info['module']
-        function_name = function_info['name']
-        
-        # Parse function signature to extract parameters
-        signature_str = function_info['signature']
-        params = self._parse_parameters(signature_str)
-        param_values = self._extract_parameter_values(user_input, params)
-        
-        # Generate code template
-        code = f"""from app.functions.{module_name} import {function_name}
+
+def render_script(module_name, function_name, arguments):
+    """
+    Render the script that imports and calls a function
+
+    Args:
+        module_name (str): Module under app.functions
+        function_name (str): Function name
+        arguments (str): Formatted call arguments
+
+    Returns:
+        str: Generated Python code
+    """
+    return f"""from app.functions.{module_name} import {function_name}
 
 def main():
     try:
         # Execute the function
-        result = {function_name}({self._format_arguments(param_values)})
+        result = {function_name}({arguments})
         
         # Handle the result
         if result is None:
@@ -54,93 +44,206 @@ def main():
 if __name__ == "__main__":
     main()
 """
-        return code
-    
-    def _parse_parameters(self, signature_str):
-        """Parse function signature to extract parameters"""
-        params = []
-        # Remove parentheses and split parameters
-        if '(' in signature_str and ')' in signature_str:
-            param_str = signature_str.split('(', 1)[1].rsplit(')', 1)[0]
-            
-            # Handle empty parameter list
-            if not param_str.strip():
-                return params
-                
-            # Split by comma, but respect nested structures
-            depth = 0
-            current = ""
-            for char in param_str + ',':
-                if char == ',' and depth == 0:
-                    if current.strip():
-                        params.append(current.strip())
-                    current = ""
-                    continue
-                elif char == '(':
-                    depth += 1
-                elif char == ')':
-                    depth -= 1
-                current += char
-        
-        # Process each parameter
-        processed_params = []
-        for p in params:
-            # Check for default value
-            has_default = '=' in p
-            name = p.split('=', 1)[0].strip() if has_default else p.strip()
-            default = p.split('=', 1)[1].strip() if has_default else None
-            
-            # Remove type hints if present
-            if ':' in name:
-                name = name.split(':', 1)[0].strip()
-                
-            processed_params.append({
-                'name': name,
-                'has_default': has_default,
-                'default': default
-            })
-            
-        return processed_params
-    
-    def _extract_parameter_values(self, user_input, params):
+
+
+def parameter_patterns(name):
+    """Patterns extracting a parameter's value from a prompt, tried in order"""
+    # Look for patterns like "with url google.com" or "url: google.com"
+    return [
+        rf"(?:with|using|for)\s+{name}\s+(?:of|as|:)?\s+([^,\.]+)",
+        rf"{name}(?:\s+is|:)\s+([^,\.]+)",
+        rf"(?:set|using)\s+{name}\s+(?:to|as)\s+([^,\.]+)"
+    ]
+
+
+def parse_parameters(signature_str):
+    """Parse a signature string into its parameter names"""
+    params = []
+    # Remove parentheses and split parameters
+    if '(' in signature_str and ')' in signature_str:
+        param_str = signature_str.split('(', 1)[1].rsplit(')', 1)[0]
+
+        # Handle empty parameter list
+        if not param_str.strip():
+            return params
+
+        # Split by comma, but respect nested structures
+        depth = 0
+        current = ""
+        for char in param_str + ',':
+            if char == ',' and depth == 0:
+                if current.strip():
+                    params.append(current.strip())
+                current = ""
+                continue
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            current += char
+
+    # Drop default values and type hints
+    return [p.split('=', 1)[0].split(':', 1)[0].strip() for p in params]
+
+
+def format_arguments(param_values):
+    """Format arguments for function call"""
+    args = []
+    for name, value in param_values.items():
+        # Check if value is a string that should be quoted
+        if value.isdigit():
+            args.append(f"{name}={value}")
+        elif value.lower() in ('true', 'false', 'none'):
+            args.append(f"{name}={value.capitalize()}")
+        else:
+            args.append(f'{name}="{value}"')
+
+    return ", ".join(args)
+
+
+class CodePlan:
+    """
+    Code generation for one function, compiled once
+
+    The parameter extraction regexes are compiled up front and the script is
+    pre-rendered around a slot for the call arguments, so generating code for
+    a request only runs the regexes and joins three strings.
+    """
+    ARGUMENTS_SLOT = "\x00arguments\x00"
+
+    def __init__(self, module_name, function_name, parameters, signature=None):
+        """
+        Args:
+            module_name (str): Module under app.functions
+            function_name (str): Function name
+            parameters (list): Parameter names
+            signature (str, optional): Signature the plan was compiled from
+        """
+        self.module_name = module_name
+        self.function_name = function_name
+        self.signature = signature
+        # Skip 'self' parameter
+        self.parameters = [name for name in parameters if name != 'self']
+        self.extractors = [
+            (name, name.lower(), [re.compile(pattern, re.IGNORECASE) for pattern in parameter_patterns(name)])
+            for name in self.parameters
+        ]
+        self.prefix, self.suffix = render_script(module_name, function_name, self.ARGUMENTS_SLOT).split(
+            self.ARGUMENTS_SLOT
+        )
+
+    @classmethod
+    def from_function(cls, function, module_name):
+        """Compile a plan from a function object, reading parameters with inspect.signature"""
+        signature = inspect.signature(function)
+        parameters = [
+            name for name, parameter in signature.parameters.items()
+            if parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)
+        ]
+        return cls(module_name, function.__name__, parameters, str(signature))
+
+    @classmethod
+    def from_metadata(cls, function_info):
+        """Compile a plan from stored function metadata"""
+        return cls(
+            function_info['module'],
+            function_info['name'],
+            parse_parameters(function_info['signature']),
+            function_info['signature']
+        )
+
+    def extract_parameter_values(self, user_input):
         """Extract parameter values from user input"""
         param_values = {}
-        
-        if not user_input or not params:
+
+        if not user_input or not self.extractors:
             return param_values
-            
-        # Use regex to try to extract parameter values from user input
-        for param in params:
-            name = param['name']
-            # Skip 'self' parameter
-            if name == 'self':
+
+        lowered = user_input.lower()
+        for name, lowered_name, patterns in self.extractors:
+            # Every pattern contains the name, so most parameters are ruled out here
+            if lowered_name not in lowered:
                 continue
-                
-            # Look for patterns like "with url google.com" or "url: google.com"
-            patterns = [
-                rf"(?:with|using|for)\s+{name}\s+(?:of|as|:)?\s+([^,\.]+)",
-                rf"{name}(?:\s+is|:)\s+([^,\.]+)",
-                rf"(?:set|using)\s+{name}\s+(?:to|as)\s+([^,\.]+)"
-            ]
-            
             for pattern in patterns:
-                matches = re.search(pattern, user_input, re.IGNORECASE)
+                matches = pattern.search(user_input)
                 if matches:
                     param_values[name] = matches.group(1).strip()
                     break
-        
+
         return param_values
-    
-    def _format_arguments(self, param_values):
-        """Format arguments for function call"""
-        args = []
-        for name, value in param_values.items():
-            # Check if value is a string that should be quoted
-            if value.isdigit():
-                args.append(f"{name}={value}")
-            elif value.lower() in ('true', 'false', 'none'):
-                args.append(f"{name}={value.capitalize()}")
-            else:
-                args.append(f'{name}="{value}"')
-        
-        return ", ".join(args)
+
+    def render(self, user_input=None):
+        """
+        Generate the script for a prompt
+
+        Args:
+            user_input (str, optional): Original user query
+
+        Returns:
+            str: Generated Python code
+        """
+        return self.render_arguments(self.extract_parameter_values(user_input))
+
+    def render_arguments(self, param_values):
+        """Generate the script for already extracted parameter values"""
+        return self.prefix + format_arguments(param_values) + self.suffix
+
+
+class CodeGenerator:
+    def __init__(self, model_manager=None, plans=None, cache=None):
+        """
+        Args:
+            model_manager (ModelManager, optional): Source of the LLM
+            plans (dict, optional): Code plans by function ID, usually the
+                registry's; plans for other functions are compiled on first use
+            cache (LRUCache, optional): Generated scripts by function
+                fingerprint and arguments (default: sized by CODEGEN_CACHE_SIZE)
+        """
+        self.model_manager = model_manager or get_model_manager()
+        self.plans = plans if plans is not None else {}
+        self.cache = cache if cache is not None else LRUCache(settings.codegen_cache_size)
+
+    @property
+    def llm(self):
+        """LLM service, loaded on first use"""
+        return self.model_manager.llm
+
+    def get_plan(self, function_info):
+        """
+        Get the code plan for a function, compiling it if needed
+
+        Args:
+            function_info (dict): Information about the function
+
+        Returns:
+            CodePlan: The function's plan
+        """
+        function_id = f"{function_info['module']}.{function_info['name']}"
+        plan = self.plans.get(function_id)
+        if plan is None or plan.signature != function_info['signature']:
+            plan = CodePlan.from_metadata(function_info)
+            self.plans[function_id] = plan
+        return plan
+
+    def generate_function_code(self, function_info, user_input=None):
+        """
+        Generate executable Python code for a function
+
+        Args:
+            function_info (dict): Information about the function
+            user_input (str, optional): Original user query for context
+
+        Returns:
+            str: Generated Python code
+        """
+        plan = self.get_plan(function_info)
+        param_values = plan.extract_parameter_values(user_input)
+
+        # The fingerprint covers the function's source, so edits invalidate its entries
+        key = (
+            function_info.get('fingerprint') or function_info['signature'],
+            plan.module_name,
+            plan.function_name,
+            tuple(param_values.items())
+        )
+        return self.cache.get_or_set(key, lambda: plan.render_arguments(param_values))
@@ -1,26 +1,41 @@
+from collections import deque
 from datetime import datetime
 import json
-import os
+
+from app.services.session_store import get_session_store
 
 class SessionContext:
-    def __init__(self, session_id=None, max_history=10):
+    # Number of recent interactions included in the context summary
+    SUMMARY_SIZE = 3
+
+    def __init__(self, session_id=None, max_history=10, persist=True, store=None):
         """
         Initialize session context with optional existing session ID
         
         Args:
             session_id (str, optional): Session identifier
             max_history (int): Maximum number of interactions to store
+            persist (bool): Load from and save to disk (False for throwaway sessions)
+            store (WriteBehindSessionStore, optional): Persistence backend
+                (default: the process-wide session store)
         """
         self.session_id = session_id or self._generate_session_id()
         self.max_history = max_history
-        self.interaction_history = []
+        self.persist = persist
+        self.store = (store or get_session_store()) if persist else None
+        self.interaction_history = deque(maxlen=max_history)
         self.session_data = {}
+        # Summary lines of the last SUMMARY_SIZE interactions and the cached summary
+        self._summary_entries = deque(maxlen=self.SUMMARY_SIZE)
+        self._summary = None
+        # Serialized sizes of the interactions in history and of each data value,
+        # kept up to date on every change so estimated_size() never re-serializes
+        self._interaction_sizes = deque(maxlen=max_history)
+        self._data_sizes = {}
         
-        # Create sessions directory if it doesn't exist
-        os.makedirs('sessions', exist_ok=True)
-        
-        # Load existing session if available
-        self._load_session()
+        if self.persist:
+            # Load existing session if available
+            self._load_session()
     
     def _generate_session_id(self):
         """Generate a unique session ID"""
@@ -28,27 +43,47 @@ class SessionContext:
     
     def _load_session(self):
         """Load session from disk if it exists"""
-        session_file = f"sessions/{self.session_id}.json"
-        if os.path.exists(session_file):
-            try:
-                with open(session_file, 'r') as f:
-                    data = json.load(f)
-                    self.interaction_history = data.get('history', [])
-                    self.session_data = data.get('data', {})
-            except Exception:
-                # If loading fails, start with empty session
-                pass
+        try:
+            history, self.session_data = self.store.load(self.session_id, self.max_history)
+        except Exception:
+            # If loading fails, start with empty session
+            return
+        self.interaction_history = deque(history, maxlen=self.max_history)
+        self._interaction_sizes = deque(map(self._json_size, self.interaction_history), maxlen=self.max_history)
+        self._data_sizes = {key: self._json_size(value) for key, value in self.session_data.items()}
+        self._summary_entries = deque(
+            (self._summarize(interaction) for interaction in history[-self.SUMMARY_SIZE:]),
+            maxlen=self.SUMMARY_SIZE
+        )
+        self._summary = None
     
-    def _save_session(self):
-        """Save session to disk"""
-        session_file = f"sessions/{self.session_id}.json"
-        data = {
-            'history': self.interaction_history,
-            'data': self.session_data
-        }
-        
-        with open(session_file, 'w') as f:
-            json.dump(data, f)
+    @property
+    def shared(self):
+        """Whether other worker processes may write to this session"""
+        return bool(self.store and self.store.shared)
+    
+    def refresh(self):
+        """Re-read the session from its store to pick up other workers' writes"""
+        if self.store:
+            self._load_session()
+    
+    def flush(self):
+        """Make sure everything in memory is on disk"""
+        if self.store:
+            self.store.flush(self.session_id)
+    
+    def release(self):
+        """Flush the session as it leaves memory and let the store forget it"""
+        if self.store:
+            self.store.release(self.session_id)
+    
+    @staticmethod
+    def _json_size(value):
+        return len(json.dumps(value, default=str))
+    
+    def estimated_size(self):
+        """Rough in-memory footprint of the session in bytes (serialized history and data)"""
+        return sum(self._interaction_sizes) + sum(self._data_sizes.values())
     
     def add_interaction(self, user_query, response, metadata=None):
         """
@@ -66,51 +101,94 @@ class SessionContext:
             'metadata': metadata or {}
         }
         
-        # Add to history and limit size
+        # Add to history; the deque drops the oldest interaction beyond max_history
         self.interaction_history.append(interaction)
-        if len(self.interaction_history) > self.max_history:
-            self.interaction_history = self.interaction_history[-self.max_history:]
+        self._interaction_sizes.append(self._json_size(interaction))
+        self._summary_entries.append(self._summarize(interaction))
+        self._summary = None
         
-        # Save session
-        self._save_session()
+        # Append to the session log (written behind unless durability is "always")
+        if self.store:
+            self.store.append_interaction(self.session_id, interaction, self.max_history)
     
     def set_data(self, key, value):
         """Store data in the session"""
         self.session_data[key] = value
-        self._save_session()
+        self._data_sizes[key] = self._json_size(value)
+        if self.store:
+            self.store.set_data(self.session_id, key, value)
     
     def get_data(self, key, default=None):
         """Retrieve data from the session"""
         return self.session_data.get(key, default)
     
+    def recent_functions(self, limit=3):
+        """
+        Get the functions used in the session, most recent first
+        
+        Args:
+            limit (int): Maximum number of distinct functions
+        
+        Returns:
+            list: Function IDs
+        """
+        functions = []
+        for interaction in reversed(self.interaction_history):
+            response = interaction.get('response')
+            function_id = response.get('function') if isinstance(response, dict) else None
+            if function_id and function_id not in functions:
+                functions.append(function_id)
+                if len(functions) == limit:
+                    break
+        return functions
+    
+    def _summarize(self, interaction):
+        """
+        Precompute the summary lines of one interaction
+        
+        Returns:
+            tuple: (timestamp, user line, system line)
+        """
+        try:
+            timestamp = datetime.fromisoformat(interaction['timestamp']).strftime('%H:%M:%S')
+        except (KeyError, TypeError, ValueError):
+            # Malformed stored interactions must not make the session unloadable
+            timestamp = "unknown"
+        
+        # Simplified response summary
+        response = interaction.get('response')
+        if isinstance(response, dict):
+            if 'function' in response:
+                system = f"System: Used function '{response['function']}'"
+            elif 'error' in response:
+                system = f"System: Error - {response['error']}"
+            else:
+                system = "System: Response provided"
+        else:
+            system = "System: Response provided"
+        
+        return timestamp, f"User: {interaction.get('user_query', '')}", system
+    
     def get_context_summary(self):
         """
         Generate a summary of recent interactions for context
         
+        The summary is cached and only rebuilt, from precomputed lines, after
+        an interaction is added.
+        
         Returns:
             str: Summary of recent interactions
         """
         if not self.interaction_history:
             return "No previous interactions."
         
-        summary = []
-        for i, interaction in enumerate(self.interaction_history[-3:]):  # Last 3 interactions
-            timestamp = datetime.fromisoformat(interaction['timestamp']).strftime('%H:%M:%S')
-            summary.append(f"Interaction {i+1} ({timestamp}):")
-            summary.append(f"User: {interaction['user_query']}")
-            
-            # Simplified response summary
-            response = interaction['response']
-            if isinstance(response, dict):
-                if 'function' in response:
-                    summary.append(f"System: Used function '{response['function']}'")
-                elif 'error' in response:
-                    summary.append(f"System: Error - {response['error']}")
-                else:
-                    summary.append("System: Response provided")
-            else:
-                summary.append("System: Response provided")
-            
-            summary.append("---")
+        if self._summary is None:
+            summary = []
+            for i, (timestamp, user, system) in enumerate(self._summary_entries):  # Last 3 interactions
+                summary.append(f"Interaction {i+1} ({timestamp}):")
+                summary.append(user)
+                summary.append(system)
+                summary.append("---")
+            self._summary = "\n".join(summary)
         
-        return "\n".join(summary)
\ No newline at end of file
+        return self._summary
@@ -1,39 +1,73 @@
-from sentence_transformers import SentenceTransformer
-import torch
+def normalize_query(text):
+    """Normalize a prompt for use as a cache key (case and whitespace insensitive)"""
+    return " ".join(text.lower().split())
+
 
 class EmbeddingService:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, model_name="all-MiniLM-L6-v2", precision="auto"):
         """
         Initialize the embedding service with a chosen model
-        
+
         Args:
             model_name (str): Name of the sentence-transformers model to use
+            precision (str): "auto"/"fp32", "bf16" or "int8" (dynamic quantization)
         """
+        # Heavy imports are deferred so importing this module stays cheap
+        from sentence_transformers import SentenceTransformer
+        import torch
+        from app.services.precision import apply_precision, resolve_precision
+
         # Using a lightweight but effective model
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model.to(self.device)
-    
+        self.precision = resolve_precision(precision, self.device)
+        self.model = apply_precision(self.model, self.precision)
+
     def get_embedding(self, text):
         """
         Get embedding vector for a text
-        
+
         Args:
             text (str): Text to embed
-            
+
         Returns:
             list: Embedding vector
         """
-        return self.model.encode(text).tolist()
-    
+        # Via a float32 tensor so bfloat16 models convert cleanly
+        return self.model.encode(text, convert_to_tensor=True).float().cpu().tolist()
+
     def get_embeddings(self, texts):
         """
         Get embedding vectors for multiple texts
-        
+
         Args:
             texts (list): List of texts to embed
-            
+
         Returns:
             list: List of embedding vectors
         """
-        return self.model.encode(texts).tolist()
\ No newline at end of file
+        return self.model.encode(texts, convert_to_tensor=True).float().cpu().tolist()
+
+
+class LazyEmbeddingFunction:
+    """Chroma embedding function that loads the embedding model on first use"""
+    def __init__(self, model_manager):
+        """
+        Args:
+            model_manager (ModelManager): Manager that owns the embedding model
+        """
+        self.model_manager = model_manager
+
+    def __call__(self, input):
+        """Embed a batch of documents for Chroma"""
+        return self.model_manager.embedding.get_embeddings(list(input))
+
+    def embed_query(self, input):
+        """Embed a batch of queries for Chroma"""
+        return self(input)
+
+    @staticmethod
+    def name():
+        return "lazy_sentence_transformer"
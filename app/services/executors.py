@@ -0,0 +1,90 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+
+
+class ExecutorPool:
+    """
+    Named, separately sized thread pools for the blocking stages of a request
+
+    Keeping retrieval, code generation, function execution and disk I/O on
+    their own pools means a slow function (e.g. one sleeping in psutil) can
+    only exhaust the execution pool, never the event loop or the other stages.
+    """
+    def __init__(self, sizes):
+        """
+        Args:
+            sizes (dict): Mapping of pool name to maximum number of worker threads
+        """
+        self.sizes = dict(sizes)
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Get (creating on first use) the executor for a pool
+
+        Args:
+            name (str): Pool name, e.g. "search", "codegen", "execution" or "io"
+
+        Returns:
+            ThreadPoolExecutor: The pool's executor
+        """
+        executor = self._executors.get(name)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(name)
+                if executor is None:
+                    if name not in self.sizes:
+                        raise KeyError(f"Unknown executor pool '{name}'")
+                    executor = ThreadPoolExecutor(
+                        max_workers=self.sizes[name],
+                        thread_name_prefix=f"{name}-worker"
+                    )
+                    self._executors[name] = executor
+        return executor
+
+    async def run(self, name, func, *args, **kwargs):
+        """
+        Run a blocking callable on a pool without blocking the event loop
+
+        Args:
+            name (str): Pool name
+            func (callable): Function to run
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            Any: The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get(name), functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        """Shut every pool down; pools are recreated on next use"""
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_executor_pool():
+    """Get the process-wide executor pool"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = ExecutorPool({
+                    "search": settings.search_workers,
+                    "codegen": settings.codegen_workers,
+                    "execution": settings.execution_workers,
+                    "io": settings.io_workers,
+                    "jobs": settings.job_workers,
+                })
+    return _default_pool
@@ -0,0 +1,178 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit"""
+    pass
+
+
+class Job:
+    """A function execution running in the background"""
+    def __init__(self, function_id, kwargs=None):
+        self.id = f"job_{uuid.uuid4()}"
+        self.function_id = function_id
+        self.kwargs = kwargs or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self):
+        """Serialize the job for API responses"""
+        queued_until = self.started_at or self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "function": self.function_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": queued_until - self.created_at,
+            "run_seconds": (self.finished_at or time.time()) - self.started_at if self.started_at else None,
+        }
+
+
+class JobManager:
+    """
+    Runs function executions on a worker pool and keeps their results
+
+    Submissions beyond `max_queue_depth` unfinished jobs are rejected.
+    Finished jobs are kept for `retention_seconds` and at most `max_retained`
+    of them are retained, the oldest being evicted first.
+    """
+    def __init__(self, executor, max_queue_depth=100, max_retained=1000, retention_seconds=3600):
+        """
+        Args:
+            executor (Executor): Worker pool running the jobs
+            max_queue_depth (int): Maximum number of queued or running jobs
+            max_retained (int): Maximum number of finished jobs kept
+            retention_seconds (float): How long finished jobs are kept
+        """
+        self.executor = executor
+        self.max_queue_depth = max_queue_depth
+        self.max_retained = max_retained
+        self.retention_seconds = retention_seconds
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def submit(self, function_id, func, kwargs=None):
+        """
+        Queue a function execution
+
+        Args:
+            function_id (str): ID of the function being executed
+            func (callable): Callable run as func(**kwargs); a returned
+                {"success": False, "error": ...} dict marks the job as failed
+            kwargs (dict, optional): Keyword arguments for func
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            QueueFullError: If too many jobs are already queued or running
+        """
+        job = Job(function_id, kwargs)
+        with self._lock:
+            self._evict()
+            pending = sum(1 for existing in self._jobs.values() if not existing.finished)
+            if pending >= self.max_queue_depth:
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+            # The future must exist before the job can be looked up and cancelled
+            job.future = self.executor.submit(self._run, job, func)
+            job.future.add_done_callback(lambda future: self._on_done(job, future))
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job, func):
+        job.started_at = time.time()
+        job.status = RUNNING
+        outcome = func(**job.kwargs)
+        job.result = outcome
+        job.finished_at = time.time()
+        if isinstance(outcome, dict) and outcome.get("success") is False:
+            job.error = outcome.get("error")
+            job.status = FAILED
+        else:
+            job.status = SUCCEEDED
+        return outcome
+
+    def _on_done(self, job, future):
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        try:
+            future.result()
+        except CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+
+    def get(self, job_id):
+        """Get a job by ID, or None if it is unknown or has been evicted"""
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job (running jobs cannot be interrupted)
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job is now cancelled
+        """
+        job = self.get(job_id)
+        if job is None:
+            return False
+        if job.status == CANCELLED:
+            return True
+        return job.future.cancel()
+
+    def _evict(self):
+        """Drop finished jobs past their retention time or beyond max_retained (lock held)"""
+        cutoff = time.time() - self.retention_seconds
+        finished = [job for job in self._jobs.values() if job.finished]
+        overflow = len(finished) - self.max_retained
+        for job in finished:
+            if overflow > 0 or job.finished_at < cutoff:
+                del self._jobs[job.id]
+                self.evicted += 1
+                overflow -= 1
+
+    def stats(self):
+        """
+        Get job counts
+
+        Returns:
+            dict: Number of retained jobs per status and evictions so far
+        """
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts["evicted"] = self.evicted
+        return counts
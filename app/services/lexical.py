@@ -0,0 +1,134 @@
+import math
+import re
+from collections import defaultdict
+
+# Verbs implied by almost every prompt; they never need to appear in the query
+IMPLIED_NAME_TOKENS = {"get"}
+
+# Field weights used to rank lexical candidates
+FIELD_WEIGHTS = {"name": 3.0, "doc": 1.0, "module": 1.0}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens with plural forms folded"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower().replace("_", " ")):
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def ngrams(tokens, n=2):
+    """Space-joined n-grams of a token list"""
+    return [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+class LexicalIndex:
+    """
+    Token and bigram inverted index over function names, docstring first
+    lines and module names
+
+    A prompt is resolved lexically only when exactly one function has every
+    (non-implied) token of its name present in the prompt, or when one such
+    function clearly outranks the others. Everything else is left to vector
+    search.
+    """
+    def __init__(self, min_margin=1.5):
+        """
+        Args:
+            min_margin (float): How many times higher the best candidate must
+                score than the runner-up when several names match fully
+        """
+        self.min_margin = min_margin
+        self.postings = defaultdict(dict)
+        self.name_postings = defaultdict(set)
+        self.name_tokens = {}
+        self.idf = {}
+
+    def build(self, functions):
+        """
+        Build the index
+
+        Args:
+            functions (dict): Mapping of function ID to metadata with "name",
+                "module" and "docstring" keys
+        """
+        self.postings.clear()
+        self.name_postings.clear()
+        self.name_tokens.clear()
+
+        for function_id, metadata in functions.items():
+            docstring = (metadata.get("docstring") or "").strip()
+            fields = {
+                "name": tokenize(metadata["name"]),
+                "doc": tokenize(docstring.split("\n")[0]) if docstring else [],
+                "module": tokenize(metadata["module"]),
+            }
+            for field, tokens in fields.items():
+                for term in tokens + ngrams(tokens):
+                    weights = self.postings[term]
+                    weights[function_id] = max(weights.get(function_id, 0.0), FIELD_WEIGHTS[field])
+
+            core = {token for token in fields["name"] if token not in IMPLIED_NAME_TOKENS}
+            self.name_tokens[function_id] = core or set(fields["name"])
+            for token in self.name_tokens[function_id]:
+                self.name_postings[token].add(function_id)
+
+        total = max(len(functions), 1)
+        self.idf = {
+            term: math.log(1 + total / len(weights))
+            for term, weights in self.postings.items()
+        }
+
+    def _expand(self, token):
+        """Indexed terms a query token matches: itself or an indexed prefix (info <- information)"""
+        matches = {token} if token in self.postings else set()
+        for length in range(3, len(token)):
+            if token[:length] in self.name_postings:
+                matches.add(token[:length])
+        return matches
+
+    def match(self, query):
+        """
+        Resolve a query to a single function if the match is unambiguous
+
+        Args:
+            query (str): User prompt
+
+        Returns:
+            tuple or None: (function_id, score) for a confident match, otherwise None
+        """
+        tokens = tokenize(query)
+        terms = set()
+        for token in tokens:
+            terms |= self._expand(token)
+        terms.update(term for term in ngrams(tokens) if term in self.postings)
+        if not terms:
+            return None
+
+        # Functions whose whole name is present in the prompt
+        candidates = set()
+        for term in terms:
+            candidates |= self.name_postings.get(term, set())
+        candidates = [
+            function_id for function_id in candidates
+            if self.name_tokens[function_id] <= terms
+        ]
+        if not candidates:
+            return None
+
+        scores = {
+            function_id: sum(
+                self.idf[term] * self.postings[term].get(function_id, 0.0) for term in terms
+            )
+            for function_id in candidates
+        }
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if len(ranked) > 1 and ranked[0][1] < self.min_margin * ranked[1][1]:
+            return None
+        return ranked[0]
@@ -1,29 +1,137 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+import copy
+import hashlib
+import json
+import threading
+
+from app.config import settings
+from app.services.batching import GenerationBatcher
+from app.services.embedding import normalize_query
+from app.utils.cache import LRUCache, PersistentLRUCache
+
+# Static instructions, placed before anything request specific so their
+# key/values can be computed once and shared by every code generation call
+CODE_PROMPT_PREFIX = """Generate Python code to call the function described below.
+
+The code should:
+1. Import the function from the correct module
+2. Include proper error handling
+3. Be executable as a standalone script
+4. Follow PEP 8 style guidelines
+
+Return only the Python code without any explanations.
+"""
+
+
+def build_code_prompt(function_metadata, additional_context=None):
+    """
+    Build the request-specific part of a code generation prompt
+
+    Args:
+        function_metadata (dict): Metadata of the function to execute
+        additional_context (str, optional): Any additional context or parameters
+
+    Returns:
+        str: Prompt text that follows CODE_PROMPT_PREFIX
+    """
+    context = f"Additional context: {additional_context}\n" if additional_context else ""
+    return f"""
+Function name: {function_metadata['name']}
+Module: {function_metadata['module']}
+Signature: {function_metadata['signature']}
+Description: {function_metadata['docstring']}
+{context}
+```python
+"""
+
+
+CODE_FENCE = "```"
+
+
+def until_code_fence(chunks):
+    """
+    Forward text chunks until the closing code fence appears
+
+    Trailing backticks are held back until it is clear they do not start
+    the fence, so the fence itself is never forwarded.
+
+    Args:
+        chunks (iterable): Text chunks of a completion
+
+    Yields:
+        str: Text before the closing fence
+    """
+    text = ""
+    sent = 0
+    for chunk in chunks:
+        text += chunk
+        fence = text.find(CODE_FENCE, sent)
+        end = fence if fence != -1 else len(text) - (len(text) - len(text.rstrip("`")))
+        if end > sent:
+            yield text[sent:end]
+            sent = end
+        if fence != -1:
+            return
+    if len(text) > sent:
+        yield text[sent:]
+
+
+def extract_code(completion):
+    """Extract the code from a completion, dropping anything after the closing fence"""
+    code = completion.split("```python")[-1].split("```")[0].strip()
+    return code or completion.strip()
+
 
 class LLMService:
-    def __init__(self, model_name="TinyLlama/TinyLlama-1.1B-Chat-v1.0"):
+    def __init__(self, model_name="TinyLlama/TinyLlama-1.1B-Chat-v1.0", code_cache=None, max_new_tokens=None,
+                 precision="auto"):
         """
         Initialize the LLM service
         
         Args:
             model_name (str): Model to use for text generation
+            code_cache (LRUCache, optional): Generated code by function and
+                context (default: the process-wide LLM code cache)
+            max_new_tokens (int, optional): Token budget per generation
+                (default: LLM_MAX_NEW_TOKENS)
+            precision (str): "auto", "fp32", "bf16" or "int8" (dynamic quantization)
         """
+        # Heavy imports are deferred so importing this module stays cheap
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        from app.services.precision import apply_precision, resolve_precision, torch_dtype
+
+        self.model_name = model_name
+        self.precision = resolve_precision(precision, 'cuda' if torch.cuda.is_available() else 'cpu')
+        self.max_new_tokens = max_new_tokens or settings.llm_max_new_tokens
+        self.code_cache = code_cache if code_cache is not None else get_llm_code_cache()
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
         self.model = AutoModelForCausalLM.from_pretrained(
             model_name,
-            torch_dtype="auto",
+            torch_dtype=torch_dtype(self.precision),
             # low_cpu_mem_usage=True,
             device_map="auto"
         )
+        self.model = apply_precision(self.model, self.precision)
+        self._prefix = None
+        self._prefix_lock = threading.Lock()
+        self.batcher = GenerationBatcher(
+            self.generate_batch,
+            measure=self.prompt_length,
+            max_batch_size=settings.llm_batch_max_size,
+            max_wait_ms=settings.llm_batch_window_ms,
+            max_padding=settings.llm_batch_max_padding,
+            timeout=settings.llm_batch_timeout
+        ) if settings.llm_batching else None
     
-    def generate_response(self, prompt, max_length=1024):
+    def generate_response(self, prompt, max_new_tokens=None):
         """
         Generate a response for a given prompt
         
         Args:
             prompt (str): Prompt for text generation
-            max_length (int): Maximum length of generated text
+            max_new_tokens (int, optional): Maximum number of generated tokens
             
         Returns:
             str: Generated response
@@ -31,15 +139,100 @@ class LLMService:
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
         outputs = self.model.generate(
             **inputs,
-            max_length=max_length,
+            max_new_tokens=max_new_tokens or self.max_new_tokens,
             num_return_sequences=1,
             temperature=0.7,
             top_p=0.9,
-            do_sample=True
+            do_sample=True,
+            pad_token_id=self.tokenizer.pad_token_id
         )
         response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
         return response
     
+    def _prefix_cache(self):
+        """Token IDs and key/value cache of CODE_PROMPT_PREFIX, computed on first use"""
+        if self._prefix is None:
+            with self._prefix_lock:
+                if self._prefix is None:
+                    import torch
+                    from transformers import DynamicCache
+
+                    prefix_ids = self.tokenizer(CODE_PROMPT_PREFIX, return_tensors="pt").input_ids.to(self.model.device)
+                    with torch.no_grad():
+                        cache = self.model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+                    self._prefix = (prefix_ids, cache)
+        return self._prefix
+    
+    def _encode_prompt(self, prompt):
+        """Token IDs of a prompt continuing CODE_PROMPT_PREFIX"""
+        return self.tokenizer(prompt, add_special_tokens=False).input_ids
+    
+    def prompt_length(self, prompt):
+        """Number of tokens of a prompt continuing CODE_PROMPT_PREFIX"""
+        return len(self._encode_prompt(prompt))
+    
+    def _prepare_inputs(self, prompts):
+        """
+        Build the input IDs, attention mask and prefix cache copy for a batch
+        
+        Returns:
+            tuple: (input_ids, attention_mask, cache)
+        """
+        import torch
+
+        prefix_ids, prefix_cache = self._prefix_cache()
+        encoded = [self._encode_prompt(prompt) for prompt in prompts]
+        width = max(len(ids) for ids in encoded)
+        pad = self.tokenizer.pad_token_id
+        rows = [[pad] * (width - len(ids)) + ids for ids in encoded]
+        masks = [[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded]
+
+        device = self.model.device
+        batch_size = len(prompts)
+        input_ids = torch.cat([prefix_ids.expand(batch_size, -1), torch.tensor(rows, device=device)], dim=1)
+        attention_mask = torch.cat([
+            torch.ones((batch_size, prefix_ids.shape[1]), dtype=torch.long, device=device),
+            torch.tensor(masks, dtype=torch.long, device=device)
+        ], dim=1)
+
+        # generate() extends the cache in place, so each call gets its own copy
+        cache = copy.deepcopy(prefix_cache)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        return input_ids, attention_mask, cache
+    
+    def generate_batch(self, prompts, max_new_tokens=None):
+        """
+        Generate completions for prompts that continue CODE_PROMPT_PREFIX
+        
+        The prefix's cached key/values are copied for every row instead of
+        being recomputed. Shorter prompts are padded between the prefix and
+        the prompt; their padding is masked out and positions are derived
+        from the attention mask, so every row sees an unbroken sequence.
+        
+        Args:
+            prompts (list): Request-specific prompt texts
+            max_new_tokens (int, optional): Maximum number of generated tokens
+            
+        Returns:
+            list: Generated text (without the prompt) per prompt
+        """
+        import torch
+
+        input_ids, attention_mask, cache = self._prepare_inputs(prompts)
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=cache,
+                max_new_tokens=max_new_tokens or self.max_new_tokens,
+                temperature=0.7,
+                top_p=0.9,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+        return self.tokenizer.batch_decode(outputs[:, input_ids.shape[1]:], skip_special_tokens=True)
+    
     def generate_code(self, function_metadata, additional_context=None):
         """
         Generate executable Python code for a function
@@ -51,32 +244,145 @@ class LLMService:
         Returns:
             str: Generated Python code
         """
-        # Construct a prompt that instructs the model to generate executable Python code
-        prompt = f"""
-        Generate Python code to call the following function:
-        
-        Function name: {function_metadata['name']}
-        Module: {function_metadata['module']}
-        Signature: {function_metadata['signature']}
-        Description: {function_metadata['docstring']}
-        
-        {f'Additional context: {additional_context}' if additional_context else ''}
+        # Each miss costs a full generation, so identical requests are served from the cache
+        key = self._code_cache_key(function_metadata, additional_context)
+        code = self.code_cache.get(key)
+        if code is None:
+            code = self._generate_code(function_metadata, additional_context)
+            self.code_cache.set(key, code)
+        return code
+    
+    def _code_cache_key(self, function_metadata, additional_context):
+        """Key on the model and precision, the function's content fingerprint and the normalized context"""
+        function_key = function_metadata.get('fingerprint') or [
+            function_metadata['module'], function_metadata['name'],
+            function_metadata['signature'], function_metadata['docstring']
+        ]
+        payload = json.dumps([
+            self.model_name,
+            self.precision,
+            function_key,
+            normalize_query(additional_context) if additional_context else None
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def stream_code(self, function_metadata, additional_context=None, max_new_tokens=None):
+        """
+        Generate code for a function, yielding text as tokens are produced
         
-        The code should:
-        1. Import the function from the correct module
-        2. Include proper error handling
-        3. Be executable as a standalone script
-        4. Follow PEP 8 style guidelines
+        Generation runs on a background thread feeding a TextIteratorStreamer
+        and stops at the closing code fence, or as soon as the consumer stops
+        iterating. Completed generations are added to the code cache, and
+        cached code is yielded in one piece.
         
-        Return only the Python code without any explanations.
-        ```python
+        Args:
+            function_metadata (dict): Metadata of the function to execute
+            additional_context (str, optional): Any additional context or parameters
+            max_new_tokens (int, optional): Maximum number of generated tokens
+            
+        Yields:
+            str: Chunks of generated code
         """
+        key = self._code_cache_key(function_metadata, additional_context)
+        cached = self.code_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        cancelled = threading.Event()
+        failure = []
+        streamer = self._start_stream(
+            build_code_prompt(function_metadata, additional_context), max_new_tokens, cancelled, failure
+        )
+        chunks = []
+        try:
+            for chunk in until_code_fence(streamer):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # Also reached when the client disconnects mid-stream
+            cancelled.set()
+
+        if failure:
+            raise failure[0]
+        code = "".join(chunks).strip()
+        if code:
+            self.code_cache.set(key, code)
+    
+    def _start_stream(self, prompt, max_new_tokens, cancelled, failure):
+        """
+        Start generating a completion on a background thread
         
-        response = self.generate_response(prompt)
+        Generation stops at the closing code fence or once `cancelled` is set.
         
-        # Extract code from response if needed
-        code = response.split("```python")[-1].split("```")[0].strip()
-        if not code:
-            code = response.strip()
+        Args:
+            prompt (str): Prompt continuing CODE_PROMPT_PREFIX
+            max_new_tokens (int, optional): Maximum number of generated tokens
+            cancelled (threading.Event): Set when the consumer stops iterating
+            failure (list): Receives the exception if generation fails
             
-        return code
\ No newline at end of file
+        Returns:
+            iterable: Decoded text chunks as they are generated
+        """
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, StopStringCriteria, TextIteratorStreamer
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        input_ids, attention_mask, cache = self._prepare_inputs([prompt])
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def generate():
+            try:
+                with torch.no_grad():
+                    self.model.generate(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        past_key_values=cache,
+                        max_new_tokens=max_new_tokens or self.max_new_tokens,
+                        temperature=0.7,
+                        top_p=0.9,
+                        do_sample=True,
+                        pad_token_id=self.tokenizer.pad_token_id,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([
+                            StopStringCriteria(self.tokenizer, [CODE_FENCE]),
+                            Cancelled()
+                        ])
+                    )
+            except Exception as e:
+                failure.append(e)
+                streamer.end()
+
+        threading.Thread(target=generate, name="llm-stream", daemon=True).start()
+        return streamer
+    
+    def _generate_code(self, function_metadata, additional_context=None):
+        """Generate code with the model (uncached), batched with concurrent requests"""
+        prompt = build_code_prompt(function_metadata, additional_context)
+        if self.batcher is not None:
+            completion = self.batcher.generate(prompt)
+        else:
+            completion = self.generate_batch([prompt])[0]
+        return extract_code(completion)
+
+
+_default_code_cache = None
+_default_code_cache_lock = threading.Lock()
+
+
+def get_llm_code_cache():
+    """Get the process-wide cache of LLM-generated code, persisted if LLM_CODE_CACHE_PATH is set"""
+    global _default_code_cache
+    if _default_code_cache is None:
+        with _default_code_cache_lock:
+            if _default_code_cache is None:
+                if settings.llm_code_cache_path:
+                    _default_code_cache = PersistentLRUCache(
+                        settings.llm_code_cache_path, settings.llm_code_cache_size
+                    )
+                else:
+                    _default_code_cache = LRUCache(settings.llm_code_cache_size)
+    return _default_code_cache
@@ -0,0 +1,195 @@
+import logging
+import threading
+
+from app.config import settings
+from app.services.precision import validate_precision
+from app.utils.logging import PerformanceTimer
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAMES = ("embedding", "llm")
+
+
+class ModelManager:
+    """Loads the heavy ML models on first use and keeps them cached"""
+    def __init__(self, embedding_model=None, llm_model=None,
+                 embedding_factory=None, llm_factory=None, precision=None):
+        """
+        Initialize the model manager without loading any model
+
+        Args:
+            embedding_model (str, optional): sentence-transformers model name
+            llm_model (str, optional): Causal LM model name
+            embedding_factory (callable, optional): Builds the embedding service
+            llm_factory (callable, optional): Builds the LLM service
+            precision (str, optional): Inference precision applied when the
+                models load (default: settings.inference_precision)
+        """
+        self.embedding_model = embedding_model or settings.embedding_model
+        self.llm_model = llm_model or settings.llm_model
+        self.precision = validate_precision(precision or settings.inference_precision)
+        self._factories = {}
+        self._models = {}
+        self._errors = {}
+        self._locks = {name: threading.Lock() for name in MODEL_NAMES}
+        self._warmup_thread = None
+        self._reload_listeners = []
+        self.timings = {}
+        self.configure(embedding_factory, llm_factory)
+
+    def configure(self, embedding_factory=None, llm_factory=None):
+        """
+        Replace the model factories and drop any loaded models
+
+        Args:
+            embedding_factory (callable, optional): Builds the embedding service
+            llm_factory (callable, optional): Builds the LLM service
+        """
+        self._factories = {
+            "embedding": embedding_factory or self._load_embedding,
+            "llm": llm_factory or self._load_llm,
+        }
+        self._models.clear()
+        self._errors.clear()
+        self.timings.clear()
+        for listener in self._reload_listeners:
+            listener()
+
+    def add_reload_listener(self, listener):
+        """
+        Register a callback run whenever the models are replaced, e.g. to
+        invalidate caches derived from the old embedding model
+
+        Args:
+            listener (callable): Function called without arguments
+        """
+        self._reload_listeners.append(listener)
+
+    def _load_embedding(self):
+        from app.services.embedding import EmbeddingService
+        return EmbeddingService(self.embedding_model, precision=self.precision)
+
+    def _load_llm(self):
+        from app.services.llm import LLMService
+        return LLMService(self.llm_model, precision=self.precision)
+
+    def get(self, name):
+        """
+        Get a model, loading it on first access
+
+        Args:
+            name (str): Model name ("embedding" or "llm")
+
+        Returns:
+            object: The loaded model service
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            if name not in self._models:
+                timer = PerformanceTimer(f"Loading {name} model")
+                try:
+                    with timer:
+                        self._models[name] = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.exception("Failed to load %s model", name)
+                    raise
+                self._errors.pop(name, None)
+                self.timings[name] = timer.elapsed
+                timer.log(logger)
+        return self._models[name]
+
+    @property
+    def embedding(self):
+        """Embedding service (loaded on first access)"""
+        return self.get("embedding")
+
+    @property
+    def llm(self):
+        """LLM service (loaded on first access)"""
+        return self.get("llm")
+
+    @property
+    def embedding_key(self):
+        """
+        Identifies the vectors the embedding model produces: model name plus
+        precision, since quantized or bfloat16 models embed slightly differently
+        """
+        if self.precision in ("auto", "fp32"):
+            return self.embedding_model
+        return f"{self.embedding_model}@{self.precision}"
+
+    def is_loaded(self, name):
+        """Check whether a model has already been loaded"""
+        return name in self._models
+
+    def embedding_function(self):
+        """Chroma embedding function backed by the lazily loaded embedding model"""
+        from app.services.embedding import LazyEmbeddingFunction
+        return LazyEmbeddingFunction(self)
+
+    def warmup(self, models=None, background=True):
+        """
+        Load models ahead of the first request
+
+        Args:
+            models (list, optional): Models to load (default: settings.model_warmup)
+            background (bool): Load in a daemon thread instead of blocking
+
+        Returns:
+            threading.Thread or None: The warmup thread when running in background
+        """
+        models = [name for name in (models if models is not None else settings.model_warmup)
+                  if name in MODEL_NAMES]
+        if not models:
+            return None
+
+        def _warmup():
+            for name in models:
+                try:
+                    self.get(name)
+                except Exception:
+                    # Already logged; the model will be retried on first use
+                    pass
+
+        if not background:
+            _warmup()
+            return None
+
+        self._warmup_thread = threading.Thread(target=_warmup, name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def status(self):
+        """
+        Report the readiness of every model
+
+        Returns:
+            dict: Per-model load state, load time, precision and last error
+        """
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": self.timings.get(name),
+                "precision": getattr(self._models.get(name), "precision", self.precision),
+                "error": self._errors.get(name),
+            }
+            for name in MODEL_NAMES
+        }
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def get_model_manager():
+    """Get the process-wide model manager"""
+    global _default_manager
+    if _default_manager is None:
+        with _default_lock:
+            if _default_manager is None:
+                _default_manager = ModelManager()
+    return _default_manager
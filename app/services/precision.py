@@ -0,0 +1,83 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "auto" keeps each library's default (float32 embeddings, torch_dtype="auto" LLM)
+PRECISIONS = ("auto", "fp32", "bf16", "int8")
+
+
+def validate_precision(precision):
+    """Raise ValueError for an unknown precision mode"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision '{precision}', expected one of {PRECISIONS}")
+    return precision
+
+
+def bf16_supported(device="cpu"):
+    """Check whether bfloat16 matmuls are natively supported on a device"""
+    import torch
+
+    if device == "cuda":
+        return torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def resolve_precision(precision, device="cpu"):
+    """
+    Resolve a precision mode for a device
+
+    bf16 falls back to fp32 where the hardware lacks native support, and
+    int8 dynamic quantization only runs on CPU.
+
+    Args:
+        precision (str): Requested mode
+        device (str): "cpu" or "cuda"
+
+    Returns:
+        str: The mode that will actually be used
+    """
+    validate_precision(precision)
+    if precision == "bf16" and not bf16_supported(device):
+        logger.warning("bfloat16 is not supported on %s, using fp32", device)
+        return "fp32"
+    if precision == "int8" and device != "cpu":
+        logger.warning("int8 dynamic quantization is CPU only, using fp32 on %s", device)
+        return "fp32"
+    return precision
+
+
+def torch_dtype(precision):
+    """dtype to load weights in for a resolved precision mode"""
+    import torch
+
+    if precision == "auto":
+        return "auto"
+    if precision == "bf16":
+        return torch.bfloat16
+    # int8 quantizes float32 weights after loading
+    return torch.float32
+
+
+def apply_precision(model, precision):
+    """
+    Convert a loaded model to a resolved precision mode
+
+    Args:
+        model (torch.nn.Module): Model loaded in float32 (or its auto dtype)
+        precision (str): Resolved precision mode
+
+    Returns:
+        torch.nn.Module: The converted model (int8 returns a new module)
+    """
+    import torch
+
+    if precision == "bf16":
+        return model.to(torch.bfloat16)
+    if precision == "int8":
+        # Weights of Linear layers are stored as int8; activations are
+        # quantized on the fly, which suits CPU inference with small batches
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
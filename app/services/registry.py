@@ -1,26 +1,58 @@
 import inspect
+import logging
+from collections import Counter
+import numpy as np
 from app.models.database import VectorDatabase
 from app.functions import application, system, utilities
+from app.config import settings
+from app.services.model_manager import get_model_manager
+from app.services.batching import EmbeddingBatcher
+from app.services.code_generator import CodePlan
+from app.services.executors import get_executor_pool
+from app.services.lexical import LexicalIndex
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
 
 class FunctionRegistry:
-    def __init__(self):
-        self.db = VectorDatabase()
+    def __init__(self, model_manager=None, executors=None):
+        self.model_manager = model_manager or get_model_manager()
+        self.executors = executors or get_executor_pool()
+        self.db = VectorDatabase(
+            persist_directory=settings.vector_db_path,
+            embedding_function=self.model_manager.embedding_function(),
+            fingerprint_salt=self.model_manager.embedding_key,
+            batch_size=settings.index_batch_size,
+            index_backend=settings.vector_index_backend,
+            query_cache=LRUCache(settings.query_cache_size, settings.query_cache_ttl)
+        )
+        # Normalized stored embeddings of functions, used for the session prior
+        self.function_vectors = {}
+        # Cached query vectors are only valid for the model that produced them
+        self.model_manager.add_reload_listener(self.db.query_cache.clear)
+        self.model_manager.add_reload_listener(self.function_vectors.clear)
         self.modules = {
             "application": application,
             "system": system,
             "utilities": utilities
         }
         self.functions = {}
+        self.records = {}
+        # Code generation plans, compiled once per function
+        self.code_plans = {}
+        self.lexical_index = LexicalIndex(min_margin=settings.lexical_min_margin)
+        self.tier_counts = Counter()
+        self.batcher = EmbeddingBatcher(
+            self.db.embedding_function,
+            max_batch_size=settings.embed_batch_max_size,
+            max_wait_ms=settings.embed_batch_window_ms,
+            executor=self.executors.get("search")
+        )
         self._populate_registry()
     
     def _populate_registry(self):
         """Populate the registry with all available functions"""
-        # Clear existing collection
-        try:
-            self.db.client.delete_collection("function_registry")
-            self.db.collection = self.db.client.create_collection("function_registry")
-        except:
-            pass
+        records = []
 
         # For each module
         for module_name, module in self.modules.items():
@@ -29,22 +61,206 @@ class FunctionRegistry:
                 if not name.startswith('_'):  # Skip private functions
                     # Store function reference
                     self.functions[f"{module_name}.{name}"] = obj
+                    self.code_plans[f"{module_name}.{name}"] = CodePlan.from_function(obj, module_name)
                     
                     # Extract description from docstring
                     doc = obj.__doc__ or ""
                     description = doc.strip().split('\n')[0] if doc else f"Function to {name.replace('_', ' ')}"
                     
-                    # Add to vector DB
-                    self.db.add_function(obj, description, module_name)
+                    records.append(self.db.build_function_record(obj, description, module_name))
+
+        self.records = {record["id"]: record for record in records}
+        self.function_vectors.clear()
+        self.lexical_index.build({
+            function_id: record["metadata"] for function_id, record in self.records.items()
+        })
+
+        # Only new, changed or removed functions touch the vector DB
+        self.index_stats = self.db.sync_functions(records)
+        logger.info("Function index synchronized: %s", self.index_stats)
+        self._load_function_vectors()
+
+    def _load_function_vectors(self):
+        """Read every stored function embedding once, so the session prior never waits on the index"""
+        for function_id, stored in self.db.get_embeddings(self.records).items():
+            vector = np.asarray(stored, dtype=np.float32)
+            self.function_vectors[function_id] = vector / (np.linalg.norm(vector) or 1.0)
     
     def get_function(self, function_id):
         """Get a function by its ID"""
         return self.functions.get(function_id)
     
-    def search(self, query):
-        """Search for functions matching the query"""
-        results = self.db.search_functions(query)
+    def search(self, query, prompt=None, recent_functions=None, n_results=3):
+        """
+        Search for functions matching the query
+
+        Unambiguous prompts are answered from the lexical index without
+        touching the embedding model; everything else goes to vector search.
+
+        Args:
+            query (str): Text used for vector search
+            prompt (str, optional): The user's own prompt used for lexical
+                matching (default: query)
+            recent_functions (list, optional): IDs of functions used earlier in
+                the session, most recent first, used as a prior when ranking
+            n_results (int): Number of results to return
+
+        Returns:
+            dict: Chroma-shaped results with a "tier" key ("lexical" or "vector")
+        """
+        lexical = self._lexical_search(prompt or query)
+        if lexical:
+            return lexical
+
+        results = self.db.search_functions(query, n_results=self._candidate_count(recent_functions, n_results))
+        results = self._apply_context_prior(results, recent_functions, n_results)
+        results["tier"] = "vector"
+        self.tier_counts["vector"] += 1
+        return results
+
+    async def asearch(self, query, prompt=None, recent_functions=None, n_results=3):
+        """
+        Async variant of search that micro-batches query embeddings with
+        other concurrent requests
+
+        Args:
+            query (str): Text used for vector search
+            prompt (str, optional): The user's own prompt used for lexical matching
+            recent_functions (list, optional): IDs of functions used earlier in the session
+            n_results (int): Number of results to return
+
+        Returns:
+            dict: Chroma-shaped results with a "tier" key ("lexical" or "vector")
+        """
+        lexical = self._lexical_search(prompt or query)
+        if lexical:
+            return lexical
+
+        if not settings.embed_batching:
+            return await self.executors.run("search", self.search, query, prompt, recent_functions, n_results)
+
+        embedding = await self.db.embed_query_async(query, self.batcher)
+        # The prior may read function vectors missing from the cache (e.g.
+        # after a model reload), so it runs off the event loop with the search
+        results = await self.executors.run(
+            "search", self._search_embedding, embedding, recent_functions, n_results
+        )
+        results["tier"] = "vector"
+        self.tier_counts["vector"] += 1
+        return results
+
+    def _search_embedding(self, embedding, recent_functions, n_results):
+        """Vector search for a computed query embedding, re-ranked with the session prior"""
+        results = self.db.search_by_embedding(embedding, n_results=self._candidate_count(recent_functions, n_results))
+        return self._apply_context_prior(results, recent_functions, n_results)
+
+    def search_many(self, queries, recent_functions=None, n_results=3):
+        """
+        Search for the functions matching several queries at once
+
+        Queries answered by the lexical index skip the model; the rest are
+        embedded with one call (cache misses only) and looked up with one
+        index query.
+
+        Args:
+            queries (list): User prompts
+            recent_functions (list, optional): Per query, IDs of functions
+                used earlier in its session (or None)
+            n_results (int): Number of results per query
+
+        Returns:
+            list: One Chroma-shaped result with a "tier" key per query
+        """
+        recent_functions = recent_functions or [None] * len(queries)
+        results = [self._lexical_search(query) for query in queries]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        embeddings = self.db.embed_queries([queries[i] for i in pending])
+        candidates = max(self._candidate_count(recent_functions[i], n_results) for i in pending)
+        for i, found in zip(pending, self.db.search_by_embeddings(embeddings, n_results=candidates)):
+            found = self._apply_context_prior(found, recent_functions[i], n_results)
+            found["tier"] = "vector"
+            results[i] = found
+        self.tier_counts["vector"] += len(pending)
+        return results
+
+    def _candidate_count(self, recent_functions, n_results):
+        """Fetch extra candidates for the session prior to re-rank"""
+        if recent_functions and settings.context_prior_weight > 0:
+            return max(n_results, settings.context_candidates)
+        return n_results
+
+    def _function_vector(self, function_id):
+        """Normalized stored embedding of a function, or None if it is not indexed"""
+        vector = self.function_vectors.get(function_id)
+        if vector is None:
+            stored = self.db.get_embeddings([function_id]).get(function_id)
+            if stored is None:
+                return None
+            vector = np.asarray(stored, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+            self.function_vectors[function_id] = vector
+        return vector
+
+    def _apply_context_prior(self, results, recent_functions, n_results):
+        """
+        Re-rank vector search candidates with the session prior
+
+        Each candidate scores (1 - w) * similarity + w * prior, where the
+        similarity is recovered from the squared L2 distance between unit
+        vectors (1 - d / 2) and the prior is the candidate's highest cosine
+        similarity to a recently used function.
+
+        Returns:
+            dict: The results, re-ordered and trimmed to n_results, with a
+                "scores" key when the prior was applied
+        """
+        weight = settings.context_prior_weight
+        keys = [key for key in ("ids", "metadatas", "documents", "distances") if results.get(key)]
+        recent = [] if weight <= 0 else [
+            vector for vector in map(self._function_vector, recent_functions or []) if vector is not None
+        ]
+        if not recent or not results["ids"][0]:
+            for key in keys:
+                results[key] = [results[key][0][:n_results]]
+            return results
+
+        recent = np.stack(recent)
+        scores = []
+        for function_id, distance in zip(results["ids"][0], results["distances"][0]):
+            vector = self._function_vector(function_id)
+            prior = float(np.max(recent @ vector)) if vector is not None else 0.0
+            scores.append((1 - weight) * (1 - distance / 2) + weight * prior)
+
+        order = sorted(range(len(scores)), key=lambda i: -scores[i])[:n_results]
+        for key in keys:
+            results[key] = [[results[key][0][i] for i in order]]
+        results["scores"] = [[scores[i] for i in order]]
         return results
+
+    def _lexical_search(self, prompt):
+        """Answer from the lexical index when the match is unambiguous"""
+        if not settings.lexical_fast_path:
+            return None
+        match = self.lexical_index.match(prompt)
+        if not match:
+            return None
+        self.tier_counts["lexical"] += 1
+        return self._lexical_results(*match)
+
+    def _lexical_results(self, function_id, score):
+        """Wrap a lexical match in the same shape as vector search results"""
+        record = self.records[function_id]
+        return {
+            "ids": [[function_id]],
+            "metadatas": [[record["metadata"]]],
+            "documents": [[record["document"]]],
+            "distances": [[0.0]],
+            "scores": [[score]],
+            "tier": "lexical"
+        }
     
     def execute_function(self, function_id, args=None, kwargs=None):
         """Execute a function by its ID with optional arguments"""
@@ -0,0 +1,468 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("always", "interval", "shutdown")
+
+
+class WriteBehindSessionStore(ABC):
+    """
+    Base class for session stores that buffer writes
+
+    Subclasses implement load() and _write_batch(). Durability modes:
+        always:   every record is written durably before the call returns
+        interval: records are buffered and written by a background flusher
+                  every `flush_interval` seconds, batched across sessions
+        shutdown: records are buffered until flush() or close()
+    """
+    # Whether several processes share the store (sessions must then be
+    # re-read on every request instead of trusting the in-memory copy)
+    shared = False
+
+    def __init__(self, durability="interval", flush_interval=1.0, compact_after=100):
+        """
+        Args:
+            durability (str): "always", "interval" or "shutdown"
+            flush_interval (float): Seconds between background flushes
+            compact_after (int): Records per session that trigger a compaction
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode '{durability}', expected one of {DURABILITY_MODES}")
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self._pending = {}
+        self._max_history = {}
+        self._pending_lock = threading.Lock()
+        # Held from taking records out of the buffer until they are written,
+        # so a load never reads the store while records are in flight
+        self._flush_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _start_flusher(self):
+        if self.durability != "shutdown":
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-flusher", daemon=True)
+            self._flusher.start()
+
+    @abstractmethod
+    def load(self, session_id, max_history=10):
+        """
+        Load a session
+
+        Args:
+            session_id (str): Session identifier
+            max_history (int): Number of most recent interactions to return
+
+        Returns:
+            tuple: (interaction history, session data)
+        """
+
+    @abstractmethod
+    def _write_batch(self, batch, durable=False):
+        """
+        Persist buffered records
+
+        Args:
+            batch (dict): Mapping of session ID to a list of records
+            durable (bool): Sync to stable storage before returning
+        """
+
+    def append_interaction(self, session_id, interaction, max_history=10):
+        """Record a new interaction"""
+        self._max_history[session_id] = max_history
+        self._append(session_id, {'op': 'interaction', 'interaction': interaction})
+
+    def set_data(self, session_id, key, value):
+        """Record a session data update"""
+        self._append(session_id, {'op': 'set', 'key': key, 'value': value})
+
+    def _append(self, session_id, record):
+        if self.durability == "always":
+            self._write_batch({session_id: [record]}, durable=True)
+            return
+        with self._pending_lock:
+            self._pending.setdefault(session_id, []).append(record)
+
+    def flush(self, session_id=None):
+        """
+        Write buffered records
+
+        Args:
+            session_id (str, optional): Only flush this session (default: all)
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                if session_id is None:
+                    batch, self._pending = self._pending, {}
+                else:
+                    records = self._pending.pop(session_id, None)
+                    batch = {session_id: records} if records else {}
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    logger.exception("Failed to write %d sessions", len(batch))
+
+    def release(self, session_id):
+        """
+        Flush a session that is leaving memory and drop its bookkeeping
+
+        Args:
+            session_id (str): Session identifier
+        """
+        self.flush(session_id)
+        self._max_history.pop(session_id, None)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the background flusher and write everything still buffered"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+
+class AppendLogSessionStore(WriteBehindSessionStore):
+    """
+    Append-only session persistence in JSON files
+
+    Every session has a snapshot file (`<id>.json`, the original session
+    format) and an append-only log (`<id>.log`, one JSON record per line).
+    Writes only ever append a record, so their cost does not depend on the
+    length of the history. Compaction folds the log back into the snapshot
+    once it reaches `compact_after` records.
+    """
+    def __init__(self, directory="sessions", durability="interval", flush_interval=1.0,
+                 compact_after=100):
+        """
+        Args:
+            directory (str): Directory holding the session files
+            durability (str): "always", "interval" or "shutdown"
+            flush_interval (float): Seconds between background flushes
+            compact_after (int): Log records that trigger a compaction
+        """
+        super().__init__(durability, flush_interval, compact_after)
+        self.directory = directory
+        self._log_records = {}
+        self._write_lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._start_flusher()
+
+    def _snapshot_path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _log_path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.log")
+
+    def load(self, session_id, max_history=10):
+        """
+        Load a session from its snapshot and log
+
+        Args:
+            session_id (str): Session identifier
+            max_history (int): Number of most recent interactions to return
+
+        Returns:
+            tuple: (interaction history, session data)
+        """
+        # Buffered records must be on disk before reading it back
+        with self._flush_lock:
+            self.flush(session_id)
+            with self._write_lock:
+                self._max_history[session_id] = max_history
+                history, data, records = self._read(session_id)
+                self._log_records[session_id] = records
+        return history[-max_history:], data
+
+    def release(self, session_id):
+        """Flush a session that is leaving memory and drop its bookkeeping"""
+        super().release(session_id)
+        with self._write_lock:
+            self._log_records.pop(session_id, None)
+
+    def _read(self, session_id):
+        """Read the snapshot and replay the log (write lock held)"""
+        history, data = [], {}
+        snapshot = self._snapshot_path(session_id)
+        if os.path.exists(snapshot):
+            try:
+                with open(snapshot, 'r') as f:
+                    stored = json.load(f)
+                history = stored.get('history', [])
+                data = stored.get('data', {})
+            except Exception:
+                logger.warning("Ignoring unreadable session snapshot %s", snapshot)
+
+        records = 0
+        log = self._log_path(session_id)
+        if os.path.exists(log):
+            with open(log, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        continue
+                    records += 1
+                    if record.get('op') == 'interaction':
+                        history.append(record['interaction'])
+                    elif record.get('op') == 'set':
+                        data[record['key']] = record['value']
+        return history, data, records
+
+    def _write_batch(self, batch, durable=False):
+        for session_id, records in batch.items():
+            try:
+                self._write(session_id, records, fsync=durable)
+            except Exception:
+                logger.exception("Failed to write session %s", session_id)
+
+    def _write(self, session_id, records, fsync=False):
+        """Append records to a session log, compacting it when it grows too long"""
+        lines = [json.dumps(record, default=str) + "\n" for record in records]
+        with self._write_lock:
+            with open(self._log_path(session_id), 'a') as f:
+                f.writelines(lines)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._log_records[session_id] = self._log_records.get(session_id, 0) + len(lines)
+            if self._log_records[session_id] >= self.compact_after:
+                self.compact(session_id)
+
+    def compact(self, session_id):
+        """Fold the log into a fresh snapshot and truncate the log"""
+        with self._write_lock:
+            history, data, _ = self._read(session_id)
+            history = history[-self._max_history.get(session_id, 10):]
+
+            snapshot = self._snapshot_path(session_id)
+            tmp = snapshot + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'history': history, 'data': data}, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, snapshot)
+
+            log = self._log_path(session_id)
+            if os.path.exists(log):
+                os.remove(log)
+            self._log_records.pop(session_id, None)
+
+
+class SQLiteSessionStore(WriteBehindSessionStore):
+    """
+    Session persistence in a SQLite database shared by every worker process
+
+    The database runs in WAL mode so readers never block the writer.
+    Interactions are indexed by session ID and timestamp, buffered records
+    are inserted with executemany in one transaction per flush, and each
+    session is pruned to its most recent interactions once `compact_after`
+    new ones have been written.
+    """
+    shared = True
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            record TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_interactions_session ON interactions (session_id, timestamp)",
+        """CREATE TABLE IF NOT EXISTS session_data (
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (session_id, key)
+        )""",
+    )
+
+    def __init__(self, path="sessions/sessions.db", durability="interval", flush_interval=1.0,
+                 compact_after=100, pool_size=4):
+        """
+        Args:
+            path (str): SQLite database file
+            durability (str): "always", "interval" or "shutdown"
+            flush_interval (float): Seconds between background flushes
+            compact_after (int): New interactions per session that trigger pruning
+            pool_size (int): Number of pooled connections
+        """
+        super().__init__(durability, flush_interval, compact_after)
+        self.path = path
+        self._written = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._pool = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            self._pool.put(self._connect())
+        with self._connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+        self._start_flusher()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL only syncs at checkpoints; "always" syncs every commit
+        connection.execute(f"PRAGMA synchronous={'FULL' if self.durability == 'always' else 'NORMAL'}")
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, committing on success"""
+        connection = self._pool.get()
+        try:
+            with connection:
+                yield connection
+        finally:
+            self._pool.put(connection)
+
+    def load(self, session_id, max_history=10):
+        """
+        Load a session's most recent interactions and data
+
+        Args:
+            session_id (str): Session identifier
+            max_history (int): Number of most recent interactions to return
+
+        Returns:
+            tuple: (interaction history, session data)
+        """
+        # Buffered records must be committed before reading them back
+        with self._flush_lock:
+            self.flush(session_id)
+            self._max_history[session_id] = max_history
+            with self._connection() as connection:
+                rows = connection.execute(
+                    "SELECT record FROM interactions WHERE session_id = ? "
+                    "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                    (session_id, max_history)
+                ).fetchall()
+                data_rows = connection.execute(
+                    "SELECT key, value FROM session_data WHERE session_id = ?",
+                    (session_id,)
+                ).fetchall()
+        history = [json.loads(record) for (record,) in reversed(rows)]
+        data = {key: json.loads(value) for key, value in data_rows}
+        return history, data
+
+    def _write_batch(self, batch, durable=False):
+        # Durability comes from the connections' synchronous level
+        interactions = []
+        data = []
+        for session_id, records in batch.items():
+            for record in records:
+                if record['op'] == 'interaction':
+                    interaction = record['interaction']
+                    interactions.append((
+                        session_id,
+                        interaction.get('timestamp', ''),
+                        json.dumps(interaction, default=str)
+                    ))
+                elif record['op'] == 'set':
+                    data.append((session_id, record['key'], json.dumps(record['value'], default=str)))
+
+        # "always" writes arrive here without the flush lock held; take it
+        # before borrowing a connection, since release() holds it while borrowing one
+        with self._flush_lock:
+            due = self._due_for_pruning(interactions)
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT INTO interactions (session_id, timestamp, record) VALUES (?, ?, ?)",
+                interactions
+            )
+            connection.executemany(
+                "INSERT INTO session_data (session_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id, key) DO UPDATE SET value = excluded.value",
+                data
+            )
+            for session_id in due:
+                self._prune(connection, session_id)
+
+    def _prune(self, connection, session_id):
+        """Delete all but a session's most recent interactions"""
+        connection.execute(
+            "DELETE FROM interactions WHERE session_id = ? AND id NOT IN ("
+            "SELECT id FROM interactions WHERE session_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?)",
+            (session_id, session_id, self._max_history.get(session_id, 10))
+        )
+
+    def _due_for_pruning(self, interactions):
+        """Sessions that received compact_after interactions since they were last pruned (flush lock held)"""
+        due = []
+        for session_id, _, _ in interactions:
+            self._written[session_id] = self._written.get(session_id, 0) + 1
+            if self._written[session_id] >= self.compact_after:
+                del self._written[session_id]
+                due.append(session_id)
+        return due
+
+    def release(self, session_id):
+        """Flush a session that is leaving memory and drop its bookkeeping"""
+        with self._flush_lock:
+            self.flush(session_id)
+            # Prune now rather than keep counting for a session that left memory
+            if self._written.pop(session_id, 0):
+                with self._connection() as connection:
+                    self._prune(connection, session_id)
+            super().release(session_id)
+
+    def close(self):
+        """Flush buffered records and close every pooled connection"""
+        super().close()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def create_session_store(backend="file"):
+    """
+    Create the session store configured in settings
+
+    Args:
+        backend (str): "file" (append-only JSON logs) or "sqlite"
+
+    Returns:
+        WriteBehindSessionStore: The session store
+    """
+    options = {
+        "durability": settings.session_durability,
+        "flush_interval": settings.session_flush_interval,
+        "compact_after": settings.session_compact_after,
+    }
+    if backend == "file":
+        return AppendLogSessionStore(directory=settings.session_dir, **options)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path=settings.session_db_path, pool_size=settings.session_db_pool_size, **options)
+    raise ValueError(f"Unknown session backend '{backend}', expected 'file' or 'sqlite'")
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_session_store():
+    """Get the process-wide session store"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = create_session_store(settings.session_backend)
+    return _default_store
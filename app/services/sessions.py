@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.context import SessionContext
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Bounded in-memory store of live sessions
+
+    Sessions idle for longer than `idle_ttl` seconds, and the least recently
+    used sessions beyond `max_sessions`, are flushed to disk and dropped from
+    memory. They are rehydrated from disk the next time they are requested.
+    Sessions in a store shared by several workers are re-read on every get,
+    since another worker may have written to them since. Idle sessions are
+    evicted on the next get, or by a background sweeper once start() is called.
+    """
+    def __init__(self, max_sessions=1000, idle_ttl=1800, session_factory=SessionContext):
+        """
+        Args:
+            max_sessions (int): Maximum number of sessions kept in memory
+            idle_ttl (float): Seconds of inactivity before a session is evicted
+            session_factory (callable): Builds (and loads) a session from its ID
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.session_factory = session_factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.loads = 0
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def get(self, session_id):
+        """
+        Get a live session, loading it from disk if it is not in memory
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            SessionContext: The session
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], time.monotonic())
+                self._sessions.move_to_end(session_id)
+                evicted = self._collect_evictions()
+                session = entry[0]
+            else:
+                session = None
+
+        if session is not None and getattr(session, "shared", False):
+            session.refresh()
+
+        if session is None:
+            # Load outside the lock; another request may race us to it
+            loaded = self.session_factory(session_id)
+            with self._lock:
+                entry = self._sessions.get(session_id)
+                if entry is None:
+                    self.loads += 1
+                    entry = (loaded, time.monotonic())
+                self._sessions[session_id] = (entry[0], time.monotonic())
+                self._sessions.move_to_end(session_id)
+                evicted = self._collect_evictions()
+                session = entry[0]
+
+        self._release(evicted)
+        return session
+
+    def _collect_evictions(self):
+        """Remove idle and overflowing sessions (lock held) and return them"""
+        evicted = []
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, (session, last_access) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+            evicted.append(session)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _release(self, sessions):
+        for session in sessions:
+            try:
+                session.release()
+            except Exception:
+                logger.exception("Failed to flush evicted session %s", session.session_id)
+
+    def evict_idle(self):
+        """Evict idle sessions without waiting for the next request"""
+        with self._lock:
+            evicted = self._collect_evictions()
+        self._release(evicted)
+        return len(evicted)
+
+    def start(self, interval=60.0):
+        """
+        Evict idle sessions every `interval` seconds on a daemon thread, so
+        they leave memory even when no request arrives (no-op if running)
+
+        Args:
+            interval (float): Seconds between sweeps
+        """
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return self
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep, args=(interval,), name="session-sweeper", daemon=True)
+        self._sweeper.start()
+        return self
+
+    def stop(self):
+        """Stop the background sweeper"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def _sweep(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception:
+                logger.exception("Idle session sweep failed")
+
+    def close(self):
+        """Stop the sweeper, flush every live session to disk and empty the store"""
+        self.stop()
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        self._release(sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        """
+        Get session gauges
+
+        Returns:
+            dict: Live session count, estimated memory, evictions and loads
+        """
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+        return {
+            "live_sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "estimated_bytes": sum(session.estimated_size() for session in sessions),
+            "evictions": self.evictions,
+            "loads": self.loads,
+        }
@@ -0,0 +1,166 @@
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+# Largest piece of output read at once; longer lines are forwarded in pieces
+CHUNK_SIZE = 64 * 1024
+
+# Chunks buffered between the reader threads and the consumer; when the
+# consumer falls behind, the readers block and the command blocks on its pipe
+MAX_QUEUED_CHUNKS = 16
+
+
+class _OutputBudget:
+    """Byte cap shared by the stdout and stderr readers, applied before a chunk is buffered"""
+    def __init__(self, max_bytes):
+        self.remaining = max_bytes
+        self.exceeded = threading.Event()
+        self._lock = threading.Lock()
+
+    def take(self, size):
+        """Reserve `size` bytes, or mark the budget exceeded and return False"""
+        with self._lock:
+            if size > self.remaining:
+                self.exceeded.set()
+                return False
+            self.remaining -= size
+            return True
+
+
+def _put(events, item, stop):
+    """Queue an item, giving up once the stream is closed"""
+    while not stop.is_set():
+        try:
+            events.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _pump(process, pipe, name, events, budget, stop):
+    """Forward bounded chunks from a process pipe to the event queue"""
+    try:
+        for line in iter(lambda: pipe.readline(CHUNK_SIZE), b""):
+            if stop.is_set():
+                break
+            if not budget.take(len(line)):
+                # Kill right away: the command may keep running without writing
+                # to this pipe, and the other pipe stays open until it exits
+                _kill(process)
+                break
+            _put(events, (name, line), stop)
+    finally:
+        pipe.close()
+        _put(events, (name, None), stop)
+
+
+def _kill(process):
+    """Kill the command with every process it started"""
+    try:
+        if hasattr(os, "killpg"):
+            # The shell leads its own process group, so its children die with it
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def stream_command(command, max_output_bytes=10 * 1024 * 1024, timeout=300):
+    """
+    Run a shell command and yield its output line by line as it is produced
+
+    Output is read in pieces of at most CHUNK_SIZE bytes (longer lines are
+    forwarded in several pieces) and at most MAX_QUEUED_CHUNKS pieces are
+    buffered, so memory stays bounded however verbose the command or slow
+    the consumer. The command and every process it started are killed when
+    it exceeds the byte cap or the timeout, or when the consumer stops iterating.
+
+    Args:
+        command (str): The command to execute
+        max_output_bytes (int): Maximum stdout + stderr bytes forwarded
+        timeout (float): Seconds before the process is killed
+
+    Yields:
+        dict: {"event": "stdout"|"stderr", "data": line} for every output line,
+            then a final {"event": "exit", ...} with the return code and whether
+            the output was truncated or the command timed out
+    """
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    events = queue.Queue(maxsize=MAX_QUEUED_CHUNKS)
+    budget = _OutputBudget(max_output_bytes)
+    stop = threading.Event()
+    for pipe, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=_pump, args=(process, pipe, name, events, budget, stop), daemon=True).start()
+
+    deadline = time.monotonic() + timeout
+    open_pipes = 2
+    truncated = False
+    timed_out = False
+    finished = False
+    try:
+        while open_pipes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            try:
+                name, line = events.get(timeout=remaining)
+            except queue.Empty:
+                timed_out = True
+                break
+
+            if line is None:
+                open_pipes -= 1
+                continue
+            yield {"event": name, "data": line.decode("utf-8", errors="replace").rstrip("\n")}
+
+        # A reader stops at the cap without forwarding the chunk that crossed it
+        truncated = budget.exceeded.is_set()
+        if timed_out or truncated:
+            _kill(process)
+        try:
+            returncode = process.wait(timeout=max(deadline - time.monotonic(), 1))
+        except subprocess.TimeoutExpired:
+            # Output pipes closed but the process kept running past the deadline
+            timed_out = True
+            _kill(process)
+            returncode = process.wait()
+        finished = not (timed_out or truncated)
+        yield {
+            "event": "exit",
+            "returncode": returncode,
+            "success": returncode == 0 and finished,
+            "truncated": truncated,
+            "timed_out": timed_out,
+        }
+    finally:
+        # Also reached when the client disconnects mid-stream
+        stop.set()
+        if not finished:
+            _kill(process)
+        process.wait()
+
+
+def format_sse(event):
+    """Format a stream_command event as a server-sent event"""
+    name = event["event"]
+    data = event["data"] if "data" in event else json.dumps(event)
+    lines = "".join(f"data: {part}\n" for part in data.split("\n"))
+    return f"event: {name}\n{lines}\n"
+
+
+def format_ndjson(event):
+    """Format a stream_command event as one line of newline-delimited JSON"""
+    return json.dumps(event) + "\n"
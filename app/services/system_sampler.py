@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SystemSampler:
+    """
+    Samples CPU, memory and disk usage on a background thread
+
+    Samples are kept in a ring buffer, so the system functions can answer
+    from the latest one instantly (or average a recent window) instead of
+    blocking in psutil.cpu_percent(interval=1). CPU percentages cover the
+    time since the previous sample. Disk partitions change slowly and are
+    scanned every `disk_interval` seconds; samples in between carry the
+    last disk reading forward.
+    """
+    def __init__(self, interval=1.0, history_seconds=300.0, disk_interval=10.0):
+        """
+        Args:
+            interval (float): Seconds between samples
+            history_seconds (float): How much history the ring buffer holds
+            disk_interval (float): Seconds between disk usage scans
+        """
+        self.interval = interval
+        self.disk_interval = disk_interval
+        self.samples = deque(maxlen=max(1, int(history_seconds / interval)))
+        self._disks = {}
+        self._disks_at = None
+        self._lock = threading.Lock()
+        self._first_sample = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling on a daemon thread (no-op if already running)"""
+        if self.running:
+            return self
+        self._stop.clear()
+        # The first cpu_percent(interval=None) call only sets the reference point
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; collected samples are kept"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("System sampling failed")
+
+    def _scan_disks(self):
+        disks = {}
+        for partition in psutil.disk_partitions():
+            try:
+                disks[partition.mountpoint] = psutil.disk_usage(partition.mountpoint)
+            except (PermissionError, OSError):
+                continue
+        return disks
+
+    def sample(self):
+        """
+        Take one sample and append it to the ring buffer
+
+        Returns:
+            dict: "timestamp", "cpu_percent", "per_cpu_percent", "memory"
+                (psutil virtual_memory) and "disks" (usage per mountpoint)
+        """
+        now = time.monotonic()
+        per_cpu = psutil.cpu_percent(interval=None, percpu=True)
+        if self._disks_at is None or now - self._disks_at >= self.disk_interval:
+            self._disks, self._disks_at = self._scan_disks(), now
+        sample = {
+            "timestamp": time.time(),
+            "monotonic": now,
+            "cpu_percent": sum(per_cpu) / len(per_cpu) if per_cpu else 0.0,
+            "per_cpu_percent": per_cpu,
+            "memory": psutil.virtual_memory(),
+            "disks": self._disks,
+        }
+        with self._lock:
+            self.samples.append(sample)
+        self._first_sample.set()
+        return sample
+
+    def latest(self, wait=True):
+        """
+        Get the newest sample
+
+        Args:
+            wait (bool): While running, block until the first sample exists
+                (at most one interval after start)
+
+        Returns:
+            dict or None: The sample, or None when nothing has been sampled
+        """
+        if wait and self.running:
+            self._first_sample.wait(self.interval + 1)
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def window(self, seconds):
+        """
+        Get the samples of the last `seconds` seconds, oldest first
+
+        Returns:
+            list: Samples (at least the latest one, when any exists)
+        """
+        latest = self.latest()
+        if latest is None:
+            return []
+        since = latest["monotonic"] - seconds
+        with self._lock:
+            samples = [sample for sample in self.samples if sample["monotonic"] > since]
+        return samples or [latest]
+
+
+_default_sampler = None
+_default_lock = threading.Lock()
+
+
+def get_system_sampler():
+    """Get the process-wide system sampler (created stopped)"""
+    global _default_sampler
+    if _default_sampler is None:
+        with _default_lock:
+            if _default_sampler is None:
+                _default_sampler = SystemSampler(
+                    interval=settings.system_sampler_interval,
+                    history_seconds=settings.system_sampler_history_seconds,
+                    disk_interval=settings.system_sampler_disk_interval
+                )
+    return _default_sampler
+
+
+def running_sampler():
+    """The process-wide sampler if it is sampling, otherwise None"""
+    sampler = _default_sampler
+    return sampler if sampler is not None and sampler.running else None
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional time-to-live and hit/miss counters"""
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Args:
+            max_size (int): Maximum number of entries (0 disables caching)
+            ttl (float, optional): Seconds an entry stays valid (None for no expiry)
+        """
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Get a cached value, marking it as most recently used"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries beyond max_size"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, factory):
+        """Get a cached value or compute it with factory() and cache it"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: Size, capacity, hits, misses, evictions, expirations and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class PersistentLRUCache(LRUCache):
+    """
+    LRUCache whose entries survive restarts
+
+    Every set() appends a [key, value] line to a JSON-lines file, which is
+    replayed on start (a torn final line is skipped). Once the file holds
+    more than twice max_size lines it is rewritten with the live entries
+    only. Keys must be strings and values JSON-serializable; reloaded entries
+    start a fresh TTL.
+    """
+    def __init__(self, path, max_size=1024, ttl=None):
+        """
+        Args:
+            path (str): JSON-lines file backing the cache
+            max_size (int): Maximum number of entries (0 disables caching)
+            ttl (float, optional): Seconds an entry stays valid (None for no expiry)
+        """
+        super().__init__(max_size, ttl)
+        self.path = path
+        self._file_lock = threading.Lock()
+        self._lines = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    key, value = json.loads(line)
+                except (ValueError, TypeError):
+                    continue
+                super().set(key, value)
+                self._lines += 1
+        # Replayed overwrites and evictions are not real evictions
+        self.evictions = 0
+
+    def set(self, key, value):
+        """Store a value and append it to the backing file"""
+        if self.max_size <= 0:
+            return
+        super().set(key, value)
+        line = json.dumps([key, value]) + "\n"
+        with self._file_lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+            self._lines += 1
+            if self._lines > 2 * self.max_size:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the file with only the live entries (file lock held)"""
+        with self._lock:
+            entries = [[key, value] for key, (value, _) in self._entries.items()]
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(tmp, self.path)
+        self._lines = len(entries)
+
+    def clear(self):
+        """Drop every entry from memory and disk (counters are kept)"""
+        super().clear()
+        with self._file_lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._lines = 0
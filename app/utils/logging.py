@@ -92,26 +92,31 @@ def setup_logging(log_level="INFO", log_format="standard", log_file=None):
     return logger
 
 class PerformanceTimer:
-    """Utility for timing operations"""
+    """Utility for timing operations (elapsed time uses the monotonic perf_counter clock)"""
     def __init__(self, name=None):
         self.name = name or "Operation"
         self.start_time = None
         self.end_time = None
+        self._start = None
+        self._end = None
         
     def __enter__(self):
         self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._end = None
         return self
         
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._end = time.perf_counter()
         self.end_time = time.time()
         
     @property
     def elapsed(self):
         """Get elapsed time in seconds"""
-        if self.start_time is None:
+        if self._start is None:
             return 0
-        end = self.end_time or time.time()
-        return end - self.start_time
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
         
     def log(self, logger=None, level="INFO"):
         """Log the timing information"""
@@ -0,0 +1,173 @@
+import bisect
+import threading
+
+# Default buckets (seconds) for latency histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default buckets for batch size histograms
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (Prometheus style, upper-bound inclusive)"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets (tuple): Sorted bucket upper bounds; +Inf is implicit
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record a single observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """
+        Get the current state of the histogram
+
+        Returns:
+            dict: "count", "sum", "mean" and cumulative "buckets" keyed by upper bound
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else bound] = running
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class LabeledHistogram:
+    """Histograms keyed by a tuple of label values"""
+    def __init__(self, label_names, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            label_names (tuple): Names of the labels, in the order values are given
+            buckets (tuple): Bucket upper bounds of every histogram
+        """
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        """Record an observation for a tuple of label values"""
+        histogram = self._histograms.get(label_values)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(label_values, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def snapshots(self):
+        """(labels dict, histogram snapshot) pairs"""
+        with self._lock:
+            items = list(self._histograms.items())
+        return [(dict(zip(self.label_names, values)), histogram.snapshot()) for values, histogram in items]
+
+
+class LabeledCounter:
+    """Thread-safe counters keyed by a tuple of label values"""
+    def __init__(self, label_names):
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        """(labels dict, value) pairs"""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.label_names, values)), value) for values, value in items]
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class PrometheusWriter:
+    """Builds a Prometheus text exposition (format 0.0.4)"""
+    def __init__(self, namespace="app"):
+        self.namespace = namespace
+        self._lines = []
+
+    def _family(self, name, kind, help_text):
+        name = f"{self.namespace}_{name}"
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def _samples(self, name, kind, help_text, samples):
+        name = self._family(name, kind, help_text)
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name, help_text, samples):
+        """
+        Add a counter family
+
+        Args:
+            name (str): Metric name without the namespace, ending in "_total"
+            help_text (str): One-line description
+            samples (number or list): A value, or (labels dict, value) pairs
+        """
+        self._samples(name, "counter", help_text, samples)
+
+    def gauge(self, name, help_text, samples):
+        """Add a gauge family (same arguments as counter)"""
+        self._samples(name, "gauge", help_text, samples)
+
+    def histogram(self, name, help_text, snapshots):
+        """
+        Add a histogram family
+
+        Args:
+            name (str): Metric name without the namespace
+            help_text (str): One-line description
+            snapshots (dict or list): A Histogram snapshot, or (labels dict, snapshot) pairs
+        """
+        name = self._family(name, "histogram", help_text)
+        if not isinstance(snapshots, list):
+            snapshots = [({}, snapshots)]
+        for labels, snapshot in snapshots:
+            for bound, count in snapshot["buckets"].items():
+                bucket_labels = dict(labels, le=bound if bound == "+Inf" else _format_value(float(bound)))
+                self._lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self):
+        """The exposition text"""
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,132 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.utils.metrics import LabeledCounter, LabeledHistogram
+
+logger = logging.getLogger(__name__)
+
+# Stage durations (seconds) of the request being handled, in stage order
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class RequestMetrics:
+    """
+    Per-stage and per-route latency histograms plus request counters
+
+    Stages are timed with time.perf_counter (monotonic), recorded into a
+    histogram per stage and into the current request's timings, which
+    TimingMiddleware reports in a Server-Timing header.
+    """
+    def __init__(self):
+        self.stages = LabeledHistogram(("stage",))
+        self.requests = LabeledHistogram(("method", "route"))
+        self.responses = LabeledCounter(("method", "route", "status"))
+        self.in_progress = 0
+
+    def observe_stage(self, name, seconds):
+        """Record a stage duration for the histograms and the current request"""
+        self.stages.observe((name,), seconds)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block as one stage of the current request
+
+        Args:
+            name (str): Stage name, e.g. "retrieval"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - start)
+
+
+def format_server_timing(stages, total=None):
+    """
+    Format stage durations as a Server-Timing header value
+
+    Args:
+        stages (dict): Stage name to duration in seconds
+        total (float, optional): Whole request duration in seconds
+
+    Returns:
+        str: e.g. "retrieval;dur=1.204, codegen;dur=0.031, total;dur=1.502"
+    """
+    entries = [f"{name};dur={1000 * seconds:.3f}" for name, seconds in stages.items()]
+    if total is not None:
+        entries.append(f"total;dur={1000 * total:.3f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing every HTTP request
+
+    Adds a Server-Timing header with the stages recorded before the response
+    starts (streaming responses only report the stages done by then) and
+    feeds the request histograms and counters. Routes are labeled by their
+    path template so path parameters do not create new series.
+    """
+    def __init__(self, app, metrics, server_timing=True):
+        """
+        Args:
+            app: The ASGI application to wrap
+            metrics (RequestMetrics): Where timings are recorded
+            server_timing (bool): Add the Server-Timing response header
+        """
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages = {}
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if self.server_timing:
+                    header = format_server_timing(stages, time.perf_counter() - start)
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ])
+            await send(message)
+
+        self.metrics.in_progress += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.in_progress -= 1
+            _request_stages.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            self.metrics.requests.observe(labels, elapsed)
+            self.metrics.responses.inc(labels + (str(status[0]),))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s %s took %.4f seconds", labels[0], labels[1], elapsed,
+                             extra={"route": labels[1], "status": status[0],
+                                    "stage_seconds": stages, "total_seconds": elapsed})
+
+
+_default_metrics = None
+
+
+def get_request_metrics():
+    """Get the process-wide request metrics"""
+    global _default_metrics
+    if _default_metrics is None:
+        _default_metrics = RequestMetrics()
+    return _default_metrics
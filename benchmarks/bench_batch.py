@@ -0,0 +1,99 @@
+"""
+Benchmark /execute/batch against the same prompts sent as sequential /execute calls.
+
+Requests go through the ASGI app in-process, so the figures are server-side
+cost per item without network overhead.
+
+Prompts map to functions that only read system state, since every item
+is executed.
+
+Usage:
+    python -m benchmarks.bench_batch --items 10,50,100
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+from benchmarks.bench_suite import EXECUTE_PROMPTS
+from benchmarks.fakes import install_fakes
+
+
+async def time_requests(app, batch_prompts, repeat):
+    """Time sequential /execute calls and one /execute/batch call for the same prompts"""
+    from app.main import registry
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sequential = batched = 0.0
+        for _ in range(repeat):
+            # Cold query cache for both, so both pay for embedding
+            registry.db.query_cache.clear()
+            start = time.perf_counter()
+            for prompt in batch_prompts:
+                response = await client.post("/execute", json={"prompt": prompt})
+                response.raise_for_status()
+            sequential += time.perf_counter() - start
+
+            registry.db.query_cache.clear()
+            start = time.perf_counter()
+            response = await client.post("/execute/batch", json={"items": [{"prompt": p} for p in batch_prompts]})
+            response.raise_for_status()
+            batched += time.perf_counter() - start
+    return sequential / repeat, batched / repeat
+
+
+def run(sizes, repeat=5):
+    """
+    Run the comparison for every batch size
+
+    Returns:
+        list: One result dict per size
+    """
+    pool = EXECUTE_PROMPTS
+    with tempfile.TemporaryDirectory() as workdir:
+        # app.main builds its registry and session store from these at import
+        settings.vector_db_path = os.path.join(workdir, "index")
+        settings.session_dir = os.path.join(workdir, "sessions")
+        settings.execute_batch_max_items = max(settings.execute_batch_max_items, max(sizes))
+        from app.main import app
+
+        results = []
+        for size in sizes:
+            batch_prompts = [pool[i % len(pool)] + ("" if i < len(pool) else f" #{i}") for i in range(size)]
+            sequential, batched = asyncio.run(time_requests(app, batch_prompts, repeat))
+            results.append({
+                "items": size,
+                "sequential_seconds": sequential,
+                "batch_seconds": batched,
+                "sequential_ms_per_item": 1000 * sequential / size,
+                "batch_ms_per_item": 1000 * batched / size,
+            })
+    return results
+
+
+def print_results(results):
+    print(f"{'items':>6} {'sequential (s)':>15} {'batch (s)':>10} {'seq/item (ms)':>14} {'batch/item (ms)':>16} {'speedup':>8}")
+    for r in results:
+        print(f"{r['items']:>6} {r['sequential_seconds']:>15.3f} {r['batch_seconds']:>10.3f} "
+              f"{r['sequential_ms_per_item']:>14.2f} {r['batch_ms_per_item']:>16.2f} "
+              f"{r['sequential_seconds'] / r['batch_seconds']:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", default="10,50,100", help="Comma separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per size")
+    parser.add_argument("--offline", action="store_true", help="Use the deterministic stand-in models")
+    args = parser.parse_args()
+    if args.offline:
+        install_fakes()
+    print_results(run([int(size) for size in args.items.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark code generation: precompiled per-function plans versus re-parsing
+the signature and recompiling the extraction regexes on every request.
+
+Usage:
+    python -m benchmarks.bench_codegen --repeat 2000
+"""
+import argparse
+import inspect
+import re
+import time
+
+from app.services.code_generator import (
+    CodeGenerator, CodePlan, format_arguments, parameter_patterns, parse_parameters, render_script
+)
+from benchmarks.bench_retrieval import registry_functions
+
+PROMPTS = [
+    "open chrome with url github.com",
+    "open notepad with filename notes.txt",
+    "list directory with path /tmp",
+    "set path to /var/log and list it",
+    "copy file with source a.txt, destination: b.txt",
+    "run shell command with command ls -la",
+    "create a directory, path is /tmp/reports",
+    "get cpu usage",
+    "how much memory is used",
+]
+
+
+def legacy_generate(function_info, user_input):
+    """The per-request path plans replace: parse, match and render every time"""
+    param_values = {}
+    params = [name for name in parse_parameters(function_info['signature']) if name != 'self']
+    if user_input:
+        for name in params:
+            for pattern in parameter_patterns(name):
+                matches = re.search(pattern, user_input, re.IGNORECASE)
+                if matches:
+                    param_values[name] = matches.group(1).strip()
+                    break
+    return render_script(function_info['module'], function_info['name'], format_arguments(param_values))
+
+
+def function_infos():
+    return [
+        {"module": module_name, "name": function.__name__, "signature": str(inspect.signature(function))}
+        for function, _, module_name in registry_functions()
+    ]
+
+
+def time_calls(generate, cases, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for function_info, prompt in cases:
+            generate(function_info, prompt)
+    return time.perf_counter() - start
+
+
+def run(repeat=1000):
+    """
+    Time both paths over every (function, prompt) pair
+
+    Returns:
+        dict: Timings, per-call cost and whether the outputs are identical
+    """
+    infos = function_infos()
+    cases = [(info, prompt) for info in infos for prompt in PROMPTS]
+
+    start = time.perf_counter()
+    plans = {
+        f"{module_name}.{function.__name__}": CodePlan.from_function(function, module_name)
+        for function, _, module_name in registry_functions()
+    }
+    compile_seconds = time.perf_counter() - start
+    generator = CodeGenerator(model_manager=object(), plans=plans)
+
+    identical = all(
+        generator.generate_function_code(info, prompt) == legacy_generate(info, prompt) for info, prompt in cases
+    )
+    legacy_seconds = time_calls(legacy_generate, cases, repeat)
+    plan_seconds = time_calls(generator.generate_function_code, cases, repeat)
+    calls = len(cases) * repeat
+    return {
+        "functions": len(infos),
+        "calls": calls,
+        "identical": identical,
+        "compile_ms": 1000 * compile_seconds,
+        "legacy_us": 1e6 * legacy_seconds / calls,
+        "plan_us": 1e6 * plan_seconds / calls,
+        "speedup": legacy_seconds / plan_seconds,
+    }
+
+
+def print_report(report):
+    print(f"{report['functions']} functions, {report['calls']} calls, "
+          f"outputs identical: {report['identical']}, plans compiled in {report['compile_ms']:.2f} ms")
+    print(f"{'path':>8} {'per call (us)':>14}")
+    print(f"{'legacy':>8} {report['legacy_us']:>14.2f}")
+    print(f"{'plan':>8} {report['plan_us']:>14.2f}")
+    print(f"speedup: {report['speedup']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1000, help="Passes over every (function, prompt) pair")
+    args = parser.parse_args()
+    print_report(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare session-aware retrieval strategies on the labeled multi-turn prompt set.
+
+Strategies:
+    concatenated: the prompt followed by the session's context summary (the
+                  original /execute behaviour)
+    prompt:       the prompt alone
+    prior:        the prompt alone, re-ranked with the session prior over
+                  previously used functions (CONTEXT_PRIOR_WEIGHT)
+
+Usage:
+    python -m benchmarks.bench_context --weight 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from app.config import settings
+from app.services.context import SessionContext
+from app.services.model_manager import ModelManager
+from app.services.registry import FunctionRegistry
+from benchmarks.fakes import fake_model_manager
+
+DATASET = os.path.join(os.path.dirname(__file__), "datasets", "multiturn.json")
+STRATEGIES = ("concatenated", "prompt", "prior")
+
+
+def load_conversations(path=DATASET):
+    with open(path) as f:
+        return json.load(f)["conversations"]
+
+
+def search(registry, strategy, session, prompt):
+    """Run one retrieval the way the strategy would in /execute"""
+    if strategy == "concatenated":
+        query = prompt
+        context_summary = session.get_context_summary()
+        if "No previous interactions" not in context_summary:
+            query = f"{prompt}\nContext from previous interactions:\n{context_summary}"
+        return query, registry.search(query, prompt=prompt)
+    recent = session.recent_functions(settings.context_prior_functions) if strategy == "prior" else None
+    return prompt, registry.search(prompt, recent_functions=recent)
+
+
+def evaluate(registry, strategy, conversations, weight):
+    """
+    Replay every conversation, feeding the predicted function back into the session
+
+    Returns:
+        dict: Accuracy, follow-up accuracy, query length and search latency
+    """
+    settings.context_prior_weight = weight if strategy == "prior" else 0.0
+    correct = follow_up_correct = follow_ups = 0
+    lengths, latencies = [], []
+    for conversation in conversations:
+        session = SessionContext(persist=False)
+        for turn, expected in enumerate(conversation["turns"]):
+            # Uncached, so latency includes embedding the query
+            registry.db.query_cache.clear()
+            start = time.perf_counter()
+            query, results = search(registry, strategy, session, expected["prompt"])
+            latencies.append(time.perf_counter() - start)
+            lengths.append(len(query))
+
+            top = results["ids"][0][0] if results["ids"][0] else None
+            hit = top == expected["expected"]
+            correct += hit
+            if turn:
+                follow_ups += 1
+                follow_up_correct += hit
+            session.add_interaction(expected["prompt"], {"function": top})
+
+    turns = len(lengths)
+    latencies_ms = sorted(1000 * latency for latency in latencies)
+    return {
+        "strategy": strategy,
+        "accuracy": correct / turns,
+        "follow_up_accuracy": follow_up_correct / follow_ups if follow_ups else None,
+        "mean_query_chars": statistics.fmean(lengths),
+        "p50_ms": statistics.median(latencies_ms),
+        "mean_ms": statistics.fmean(latencies_ms),
+    }
+
+
+def run(weight=0.2, lexical=True, model_manager=None, path=DATASET):
+    """
+    Evaluate every strategy on the dataset
+
+    Returns:
+        list: One result dict per strategy
+    """
+    conversations = load_conversations(path)
+    model_manager = model_manager or ModelManager()
+    saved = (settings.vector_db_path, settings.context_prior_weight, settings.lexical_fast_path)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            settings.vector_db_path = workdir
+            settings.lexical_fast_path = lexical
+            registry = FunctionRegistry(model_manager)
+            return [evaluate(registry, strategy, conversations, weight) for strategy in STRATEGIES]
+    finally:
+        settings.vector_db_path, settings.context_prior_weight, settings.lexical_fast_path = saved
+
+
+def print_results(results):
+    print(f"{'strategy':>13} {'accuracy':>9} {'follow-ups':>11} {'query chars':>12} {'p50 (ms)':>9} {'mean (ms)':>10}")
+    for r in results:
+        follow_up = f"{r['follow_up_accuracy']:.0%}" if r["follow_up_accuracy"] is not None else "-"
+        print(f"{r['strategy']:>13} {r['accuracy']:>9.0%} {follow_up:>11} {r['mean_query_chars']:>12.0f} "
+              f"{r['p50_ms']:>9.3f} {r['mean_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weight", type=float, default=settings.context_prior_weight,
+                        help="Prior weight for the 'prior' strategy")
+    parser.add_argument("--no-lexical", action="store_true", help="Send every prompt to vector search")
+    parser.add_argument("--dataset", default=DATASET, help="Labeled multi-turn prompt set")
+    parser.add_argument("--offline", action="store_true", help="Use the deterministic stand-in models")
+    args = parser.parse_args()
+    model_manager = fake_model_manager() if args.offline else None
+    print_results(run(args.weight, not args.no_lexical, model_manager, path=args.dataset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark function indexing: one add_function call per function versus the
+batched VectorDatabase.add_functions path.
+
+Usage:
+    python -m benchmarks.bench_indexing --sizes 10,100,1000,10000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+from app.models.database import VectorDatabase
+from app.services.model_manager import ModelManager
+from benchmarks.fakes import fake_model_manager
+
+FUNCTION_TEMPLATE = '''
+def synthetic_function_{i}(path, retries={i}):
+    """
+    Synthetic automation function number {i} for {topic}.
+
+    Args:
+        path (str): Path to operate on
+        retries (int): Number of attempts
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return True
+'''
+
+TOPICS = ["files", "network", "processes", "browsers", "archives", "printers", "audio", "windows"]
+
+
+def make_synthetic_functions(count, directory):
+    """
+    Write a module with `count` synthetic functions and import it
+
+    Returns:
+        list: (function, description, module_name) tuples
+    """
+    path = os.path.join(directory, f"synthetic_{count}.py")
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(FUNCTION_TEMPLATE.format(i=i, topic=TOPICS[i % len(TOPICS)]))
+
+    spec = importlib.util.spec_from_file_location(f"synthetic_{count}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    return [
+        (getattr(module, f"synthetic_function_{i}"), f"Synthetic function {i}", spec.name)
+        for i in range(count)
+    ]
+
+
+def time_single(functions, model_manager, directory):
+    """Index with one add_function call (one embedding pass, one write) per function"""
+    db = VectorDatabase(directory, embedding_function=model_manager.embedding_function())
+    start = time.perf_counter()
+    for function, description, module_name in functions:
+        db.add_function(function, description, module_name)
+    return time.perf_counter() - start
+
+
+def time_bulk(functions, model_manager, directory, batch_size):
+    """Index with a single add_functions call"""
+    db = VectorDatabase(directory, embedding_function=model_manager.embedding_function())
+    start = time.perf_counter()
+    db.add_functions(functions, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def run(sizes, batch_size, single_max, model_manager=None):
+    """
+    Run the benchmark for every size
+
+    Returns:
+        list: One result dict per size
+    """
+    model_manager = model_manager or ModelManager()
+    # Load the model up front so it is not part of the first measurement
+    model_manager.embedding.get_embeddings(["warmup"])
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            functions = make_synthetic_functions(size, workdir)
+            result = {"functions": size, "single_seconds": None}
+            if size <= single_max:
+                result["single_seconds"] = time_single(
+                    functions, model_manager, os.path.join(workdir, f"single_{size}"))
+            result["bulk_seconds"] = time_bulk(
+                functions, model_manager, os.path.join(workdir, f"bulk_{size}"), batch_size)
+            results.append(result)
+    return results
+
+
+def print_results(results):
+    print(f"{'functions':>10} {'single (s)':>12} {'bulk (s)':>10} {'bulk/fn (ms)':>13} {'speedup':>8}")
+    for r in results:
+        single = r["single_seconds"]
+        speedup = f"{single / r['bulk_seconds']:.1f}x" if single else "-"
+        print(f"{r['functions']:>10} {single if single is not None else float('nan'):>12.3f} "
+              f"{r['bulk_seconds']:>10.3f} {1000 * r['bulk_seconds'] / r['functions']:>13.3f} {speedup:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000",
+                        help="Comma separated numbers of synthetic functions")
+    parser.add_argument("--batch-size", type=int, default=64, help="Documents per embedding call")
+    parser.add_argument("--single-max", type=int, default=1000,
+                        help="Largest size also timed with per-function add_function calls")
+    parser.add_argument("--offline", action="store_true", help="Use the deterministic stand-in models")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    model_manager = fake_model_manager() if args.offline else None
+    print_results(run(sizes, args.batch_size, args.single_max, model_manager))
+
+
+if __name__ == "__main__":
+    main()
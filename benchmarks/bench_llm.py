@@ -0,0 +1,106 @@
+"""
+Benchmark LLM code generation on CPU: full prompts versus the cached prompt
+prefix, one request at a time and batched across concurrent requests.
+
+Modes:
+    baseline: CODE_PROMPT_PREFIX + prompt through generate_response, one at a time
+    prefix:   generate_batch([prompt]) reusing the prefix key/values, one at a time
+    batched:  `concurrency` threads going through the GenerationBatcher
+
+Usage:
+    python -m benchmarks.bench_llm --model TinyLlama/TinyLlama-1.1B-Chat-v1.0 --requests 8
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.services.llm import CODE_PROMPT_PREFIX, LLMService, build_code_prompt
+from benchmarks.bench_codegen import function_infos
+
+CONTEXTS = ["", "use the default arguments", "the user asked twice", "log the result"]
+
+
+def make_prompts(count):
+    infos = function_infos()
+    prompts = []
+    for i in range(count):
+        info = dict(infos[i % len(infos)], docstring="")
+        prompts.append(build_code_prompt(info, CONTEXTS[i % len(CONTEXTS)] or None))
+    return prompts
+
+
+def measure(service, mode, prompts, concurrency):
+    """
+    Time every prompt in one mode
+
+    Returns:
+        dict: Total time, per-request latency and generated tokens per second
+    """
+    def count_tokens(text):
+        return len(service.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def one(prompt):
+        start = time.perf_counter()
+        if mode == "baseline":
+            # generate_response returns the prompt followed by the completion
+            full = CODE_PROMPT_PREFIX + prompt
+            response = service.generate_response(full)
+            elapsed = time.perf_counter() - start
+            return elapsed, max(0, count_tokens(response) - count_tokens(full))
+        if mode == "prefix":
+            completion = service.generate_batch([prompt])[0]
+        else:
+            completion = service.batcher.generate(prompt)
+        return time.perf_counter() - start, count_tokens(completion)
+
+    start = time.perf_counter()
+    if mode == "batched":
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, prompts))
+    else:
+        outcomes = [one(prompt) for prompt in prompts]
+    total = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    tokens = sum(count for _, count in outcomes)
+    return {
+        "mode": mode,
+        "requests": len(prompts),
+        "total_seconds": total,
+        "p50_seconds": statistics.median(latencies),
+        "max_seconds": latencies[-1],
+        "tokens": tokens,
+        "tokens_per_second": tokens / total,
+    }
+
+
+def run(model, requests=8, concurrency=4, max_new_tokens=128):
+    settings.llm_batching = True
+    service = LLMService(model, max_new_tokens=max_new_tokens)
+    prompts = make_prompts(requests)
+    # Load weights and the prefix cache before timing
+    service.generate_batch(prompts[:1], max_new_tokens=1)
+    return [measure(service, mode, prompts, concurrency) for mode in ("baseline", "prefix", "batched")]
+
+
+def print_results(results):
+    print(f"{'mode':>9} {'requests':>9} {'total (s)':>10} {'p50 (s)':>8} {'max (s)':>8} {'tokens':>7} {'tokens/s':>9}")
+    for r in results:
+        print(f"{r['mode']:>9} {r['requests']:>9} {r['total_seconds']:>10.2f} {r['p50_seconds']:>8.2f} "
+              f"{r['max_seconds']:>8.2f} {r['tokens']:>7} {r['tokens_per_second']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=settings.llm_model, help="Causal LM to load")
+    parser.add_argument("--requests", type=int, default=8, help="Generation requests per mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests in batched mode")
+    parser.add_argument("--max-new-tokens", type=int, default=128, help="Token budget per request")
+    args = parser.parse_args()
+    print_results(run(args.model, args.requests, args.concurrency, args.max_new_tokens))
+
+
+if __name__ == "__main__":
+    main()
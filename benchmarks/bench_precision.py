@@ -0,0 +1,150 @@
+"""
+Compare inference precision modes against the full-precision baseline.
+
+Every mode runs in its own process so resident memory is measured cleanly.
+Reports model load time, RSS, query embedding latency, retrieval top-1
+agreement with fp32 and, with --llm, generation throughput.
+
+Usage:
+    python -m benchmarks.bench_precision --precisions fp32,bf16,int8 --llm
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import psutil
+
+from app.config import settings
+from benchmarks.bench_context import load_conversations
+from benchmarks.bench_retrieval import PROMPTS, registry_functions
+
+
+def prompts():
+    """Single-turn prompts plus every prompt of the multi-turn dataset"""
+    turns = [turn["prompt"] for conversation in load_conversations() for turn in conversation["turns"]]
+    return PROMPTS + turns
+
+
+def function_documents():
+    """(id, document) pairs exactly as they are indexed"""
+    from app.models.database import VectorDatabase
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = VectorDatabase(workdir, embedding_function=None)
+        records = [db.build_function_record(*function) for function in registry_functions()]
+    return [(record["id"], record["document"]) for record in records]
+
+
+def worker(precision, embedding_model, llm_model=None, repeat=20):
+    """Measure one precision mode in the current process"""
+    from app.services.embedding import EmbeddingService
+
+    process = psutil.Process()
+    rss_start = process.memory_info().rss
+    start = time.perf_counter()
+    service = EmbeddingService(embedding_model, precision=precision)
+    load_seconds = time.perf_counter() - start
+
+    ids, documents = zip(*function_documents())
+    matrix = np.asarray(service.get_embeddings(list(documents)), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    queries = prompts()
+    latencies = []
+    top1 = []
+    for query in queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            vector = np.asarray(service.get_embedding(query), dtype=np.float32)
+            latencies.append(time.perf_counter() - started)
+        top1.append(ids[int(np.argmax(matrix @ (vector / np.linalg.norm(vector))))])
+
+    result = {
+        "precision": service.precision,
+        "embedding_load_seconds": load_seconds,
+        "embedding_rss_mb": (process.memory_info().rss - rss_start) / 2 ** 20,
+        "embed_p50_ms": 1000 * statistics.median(latencies),
+        "top1": top1,
+    }
+
+    if llm_model:
+        from app.services.llm import LLMService, build_code_prompt
+
+        rss_before_llm = process.memory_info().rss
+        start = time.perf_counter()
+        llm = LLMService(llm_model, precision=precision)
+        result["llm_load_seconds"] = time.perf_counter() - start
+        result["llm_rss_mb"] = (process.memory_info().rss - rss_before_llm) / 2 ** 20
+
+        info = {"name": "get_cpu_usage", "module": "system", "signature": "()", "docstring": "Get CPU usage."}
+        prompt = build_code_prompt(info)
+        llm.generate_batch([prompt], max_new_tokens=1)
+        start = time.perf_counter()
+        completion = llm.generate_batch([prompt], max_new_tokens=64)[0]
+        elapsed = time.perf_counter() - start
+        tokens = len(llm.tokenizer(completion, add_special_tokens=False).input_ids)
+        result["llm_seconds"] = elapsed
+        result["llm_tokens_per_second"] = tokens / elapsed if elapsed else 0.0
+
+    result["rss_mb"] = process.memory_info().rss / 2 ** 20
+    return result
+
+
+def run(precisions, embedding_model, llm_model=None, repeat=20):
+    """
+    Measure every precision in a subprocess and compare with the first one
+
+    Returns:
+        list: One result dict per precision, with top-1 agreement against the first
+    """
+    results = []
+    for precision in precisions:
+        command = [sys.executable, "-m", "benchmarks.bench_precision", "--worker", precision,
+                   "--embedding-model", embedding_model, "--repeat", str(repeat)]
+        if llm_model:
+            command += ["--llm-model", llm_model]
+        output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=os.getcwd()).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    baseline = results[0]["top1"]
+    for result in results:
+        result["top1_agreement"] = sum(a == b for a, b in zip(baseline, result["top1"])) / len(baseline)
+    return results
+
+
+def print_results(results):
+    print(f"{'precision':>9} {'load (s)':>9} {'emb RSS (MB)':>13} {'embed p50 (ms)':>15} {'top-1 agree':>12} "
+          f"{'LLM RSS (MB)':>13} {'LLM tok/s':>10}")
+    for r in results:
+        llm_rss = f"{r['llm_rss_mb']:.0f}" if "llm_rss_mb" in r else "-"
+        llm_speed = f"{r['llm_tokens_per_second']:.1f}" if "llm_tokens_per_second" in r else "-"
+        print(f"{r['precision']:>9} {r['embedding_load_seconds']:>9.2f} {r['embedding_rss_mb']:>13.0f} "
+              f"{r['embed_p50_ms']:>15.2f} {r['top1_agreement']:>12.0%} {llm_rss:>13} {llm_speed:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--precisions", default="fp32,bf16,int8",
+                        help="Comma separated modes; the first is the agreement baseline")
+    parser.add_argument("--embedding-model", default=settings.embedding_model)
+    parser.add_argument("--llm", action="store_true", help="Also load the LLM and measure generation")
+    parser.add_argument("--llm-model", default=None, help="LLM to measure (implies --llm)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed embeddings per prompt")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    llm_model = args.llm_model or (settings.llm_model if args.llm else None)
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.embedding_model, llm_model, args.repeat)))
+        return
+    print_results(run(args.precisions.split(","), args.embedding_model, llm_model, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
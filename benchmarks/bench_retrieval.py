@@ -0,0 +1,118 @@
+"""
+Compare the Chroma and NumPy index backends for parity and query latency.
+
+Usage:
+    python -m benchmarks.bench_retrieval --synthetic 500 --repeat 200
+"""
+import argparse
+import inspect
+import statistics
+import tempfile
+import time
+
+from app.functions import application, system, utilities
+from app.models.database import VectorDatabase
+from app.models.index import ChromaIndex, NumpyIndex
+from app.services.model_manager import ModelManager
+from benchmarks.bench_indexing import make_synthetic_functions
+from benchmarks.fakes import fake_model_manager
+from benchmarks.stats import percentile
+
+PROMPTS = [
+    "open calculator",
+    "open chrome with url github.com",
+    "open notepad",
+    "show me system information",
+    "get cpu usage",
+    "how much memory is used",
+    "disk usage",
+    "run shell command ls",
+    "list the files in this directory",
+    "create a new folder",
+    "copy a file to the backup folder",
+]
+
+
+def registry_functions():
+    """(function, description, module_name) tuples for the bundled functions"""
+    functions = []
+    for module_name, module in (("application", application), ("system", system), ("utilities", utilities)):
+        for name, obj in inspect.getmembers(module, inspect.isfunction):
+            if not name.startswith('_'):
+                doc = obj.__doc__ or ""
+                description = doc.strip().split('\n')[0] if doc else f"Function to {name.replace('_', ' ')}"
+                functions.append((obj, description, module_name))
+    return functions
+
+
+def time_index(index, query_embeddings, n_results, repeat):
+    """Time index.search over every query, returning per-query latencies and results"""
+    latencies = []
+    results = []
+    for _ in range(repeat):
+        results = []
+        for embedding in query_embeddings:
+            start = time.perf_counter()
+            results.append(index.search(embedding, n_results=n_results))
+            latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def run(synthetic=0, n_results=3, repeat=100, model_manager=None):
+    """
+    Index the bundled (and optionally synthetic) functions and query both backends
+
+    Returns:
+        dict: Parity and latency figures per backend
+    """
+    model_manager = model_manager or ModelManager()
+    with tempfile.TemporaryDirectory() as workdir:
+        db = VectorDatabase(workdir, embedding_function=model_manager.embedding_function())
+        functions = registry_functions()
+        if synthetic:
+            functions += make_synthetic_functions(synthetic, workdir)
+        db.add_functions(functions)
+
+        query_embeddings = [db.embed_query(prompt) for prompt in PROMPTS]
+        report = {"functions": len(functions), "queries": len(PROMPTS), "backends": {}}
+
+        backend_results = {}
+        for index in (ChromaIndex(db.collection), NumpyIndex(db.collection)):
+            latencies, results = time_index(index, query_embeddings, n_results, repeat)
+            latencies_ms = sorted(1000 * latency for latency in latencies)
+            backend_results[index.name] = results
+            report["backends"][index.name] = {
+                "p50_ms": statistics.median(latencies_ms),
+                "p95_ms": percentile(latencies_ms, 95),
+                "mean_ms": statistics.fmean(latencies_ms),
+            }
+
+        chroma, numpy = backend_results["chroma"], backend_results["numpy"]
+        report["top1_agreement"] = sum(
+            c["ids"][0][:1] == n["ids"][0][:1] for c, n in zip(chroma, numpy)) / len(PROMPTS)
+        report["topk_agreement"] = sum(
+            set(c["ids"][0]) == set(n["ids"][0]) for c, n in zip(chroma, numpy)) / len(PROMPTS)
+    return report
+
+
+def print_report(report):
+    print(f"{report['functions']} functions, {report['queries']} queries")
+    print(f"top-1 agreement: {report['top1_agreement']:.0%}, top-k agreement: {report['topk_agreement']:.0%}")
+    print(f"{'backend':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'mean (ms)':>10}")
+    for name, figures in report["backends"].items():
+        print(f"{name:>8} {figures['p50_ms']:>10.3f} {figures['p95_ms']:>10.3f} {figures['mean_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic", type=int, default=0, help="Extra synthetic functions to index")
+    parser.add_argument("--n-results", type=int, default=3, help="Results per query")
+    parser.add_argument("--repeat", type=int, default=100, help="Passes over the prompt set")
+    parser.add_argument("--offline", action="store_true", help="Use the deterministic stand-in models")
+    args = parser.parse_args()
+    model_manager = fake_model_manager() if args.offline else None
+    print_report(run(args.synthetic, args.n_results, args.repeat, model_manager))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark session stores: append-only JSON files versus the shared SQLite database.
+
+Writes `interactions` interactions to each of `sessions` sessions, flushes
+them, then loads every session back, for each backend.
+
+Usage:
+    python -m benchmarks.bench_sessions --sessions 10000 --interactions 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.services.session_store import AppendLogSessionStore, SQLiteSessionStore
+
+
+def make_interaction(session, turn):
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'user_query': f"Session {session} request {turn}: open the calculator",
+        'response': {'function': 'open_calculator', 'execution_result': {'success': True}},
+        'metadata': {'retrieval_tier': 'lexical'}
+    }
+
+
+def make_store(backend, directory, durability):
+    if backend == "file":
+        return AppendLogSessionStore(directory=os.path.join(directory, "files"), durability=durability)
+    return SQLiteSessionStore(path=os.path.join(directory, "sessions.db"), durability=durability)
+
+
+def run_backend(backend, sessions, interactions, durability):
+    """
+    Time writes, flush and loads for one backend
+
+    Returns:
+        dict: Timings in seconds
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        store = make_store(backend, workdir, durability)
+        session_ids = [f"bench_{i}" for i in range(sessions)]
+
+        start = time.perf_counter()
+        for turn in range(interactions):
+            for i, session_id in enumerate(session_ids):
+                store.append_interaction(session_id, make_interaction(i, turn))
+        append_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.flush()
+        flush_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for session_id in session_ids:
+            history, _ = store.load(session_id)
+            assert len(history) == min(interactions, 10)
+        load_seconds = time.perf_counter() - start
+        store.close()
+
+    writes = sessions * interactions
+    return {
+        "backend": backend,
+        "append_seconds": append_seconds,
+        "flush_seconds": flush_seconds,
+        "load_seconds": load_seconds,
+        "writes_per_second": writes / (append_seconds + flush_seconds),
+        "load_ms": 1000 * load_seconds / sessions,
+    }
+
+
+def run(sessions, interactions, durability="shutdown", backends=("file", "sqlite")):
+    return [run_backend(backend, sessions, interactions, durability) for backend in backends]
+
+
+def print_results(results):
+    print(f"{'backend':>8} {'append (s)':>11} {'flush (s)':>10} {'writes/s':>10} "
+          f"{'load (s)':>9} {'load/session (ms)':>18}")
+    for r in results:
+        print(f"{r['backend']:>8} {r['append_seconds']:>11.3f} {r['flush_seconds']:>10.3f} "
+              f"{r['writes_per_second']:>10.0f} {r['load_seconds']:>9.3f} {r['load_ms']:>18.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000, help="Number of sessions")
+    parser.add_argument("--interactions", type=int, default=5, help="Interactions per session")
+    parser.add_argument("--durability", default="shutdown", choices=["always", "interval", "shutdown"],
+                        help="Durability mode of both stores")
+    parser.add_argument("--backends", default="file,sqlite", help="Comma separated backends")
+    args = parser.parse_args()
+
+    print_results(run(args.sessions, args.interactions, args.durability, args.backends.split(",")))
+
+
+if __name__ == "__main__":
+    main()
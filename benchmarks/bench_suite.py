@@ -0,0 +1,245 @@
+"""
+Offline benchmark suite: time every subsystem around the models with
+deterministic stand-in models and track the results over time.
+
+Stages:
+    registry_cold     FunctionRegistry startup on an empty index (every function embedded)
+    registry_warm     FunctionRegistry startup on an up-to-date index (nothing re-embedded)
+    search            FunctionRegistry.search, query cache cleared before every pass
+    search_cached     FunctionRegistry.search answered from the query cache
+    codegen           CodeGenerator.generate_function_code, code cache cleared before every pass
+    session_save      SessionContext.add_interaction (written behind; the flush is reported separately)
+    session_load      SessionContext construction from a persisted session
+    session_summary   SessionContext.get_context_summary
+    execute           POST /execute through the ASGI app
+
+Every run is appended to a JSON-lines history file, and p50 latencies are
+compared with the previous run.
+
+Usage:
+    python -m benchmarks.bench_suite --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from app.config import settings
+from app.services.code_generator import CodeGenerator
+from app.services.context import SessionContext
+from app.services.registry import FunctionRegistry
+from app.services.session_store import AppendLogSessionStore
+from benchmarks.bench_precision import prompts
+from benchmarks.fakes import fake_model_manager, install_fakes
+from benchmarks.stats import percentile
+
+HISTORY = os.path.join(os.path.dirname(__file__), "results", "history.jsonl")
+
+# Prompts whose functions only read system state, safe to execute repeatedly
+EXECUTE_PROMPTS = [
+    "how much memory is used",
+    "disk usage",
+    "show me system information",
+    "list the files in this directory",
+    "what's the memory usage right now",
+    "list directory with path .",
+]
+
+
+def summarize(latencies):
+    """Latency figures in milliseconds"""
+    latencies_ms = sorted(1000 * latency for latency in latencies)
+    return {
+        "calls": len(latencies_ms),
+        "p50_ms": statistics.median(latencies_ms),
+        "p95_ms": percentile(latencies_ms, 95),
+        "mean_ms": statistics.fmean(latencies_ms),
+    }
+
+
+def timed(call, items, repeat, before_pass=None):
+    """Time call(item) for every item, `repeat` times"""
+    latencies = []
+    for _ in range(repeat):
+        if before_pass:
+            before_pass()
+        for item in items:
+            start = time.perf_counter()
+            call(item)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_registry(model_manager, workdir, repeat):
+    """Time registry startup cold and warm, then search and code generation"""
+    results = {}
+    cold = []
+    for i in range(repeat):
+        settings.vector_db_path = os.path.join(workdir, f"index_{i}")
+        start = time.perf_counter()
+        FunctionRegistry(model_manager)
+        cold.append(time.perf_counter() - start)
+    results["registry_cold"] = summarize(cold)
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        registry = FunctionRegistry(model_manager)
+        warm.append(time.perf_counter() - start)
+    results["registry_warm"] = summarize(warm)
+
+    queries = prompts()
+    results["search"] = summarize(timed(registry.search, queries, repeat, registry.db.query_cache.clear))
+    results["search_cached"] = summarize(timed(registry.search, queries, repeat))
+
+    cases = [(registry.search(query)["metadatas"][0][0], query) for query in queries]
+    generator = CodeGenerator(model_manager, plans=registry.code_plans)
+    results["codegen"] = summarize(timed(
+        lambda case: generator.generate_function_code(*case), cases, repeat, generator.cache.clear))
+    return results
+
+
+def bench_sessions(workdir, repeat, sessions=50):
+    """Time session saves, loads and context summaries on the append-log store"""
+    store = AppendLogSessionStore(directory=os.path.join(workdir, "sessions"), durability="shutdown")
+    session_ids = [f"bench_{i}" for i in range(sessions)]
+    contexts = [SessionContext(session_id, store=store) for session_id in session_ids]
+    response = {"function": "get_memory_usage", "execution_result": {"success": True, "result": {"percent": 42.0}}}
+
+    def save(context):
+        context.add_interaction("how much memory is used", response)
+
+    save_latencies = timed(save, contexts, repeat, store.flush)
+    start = time.perf_counter()
+    store.flush()
+    flush_seconds = time.perf_counter() - start
+
+    results = {
+        "session_save": summarize(save_latencies),
+        "session_load": summarize(timed(lambda session_id: SessionContext(session_id, store=store),
+                                        session_ids, repeat)),
+    }
+
+    def summary(context):
+        # Invalidate the cached summary so every call builds it
+        context._summary = None
+        context.get_context_summary()
+
+    results["session_summary"] = summarize(timed(summary, contexts, repeat))
+    results["session_save"]["flush_ms"] = 1000 * flush_seconds
+    store.close()
+    return results
+
+
+async def bench_execute(repeat):
+    """Time POST /execute through the ASGI app, spread over a few sessions"""
+    import httpx
+    from app.main import app, registry
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        for i in range(repeat):
+            registry.db.query_cache.clear()
+            for prompt in EXECUTE_PROMPTS:
+                start = time.perf_counter()
+                response = await client.post("/execute", params={"session_id": f"bench_{i % 5}"},
+                                             json={"prompt": prompt})
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+    return {"execute": summarize(latencies)}
+
+
+def run(repeat=20, token_seconds=0.0):
+    """
+    Run every stage with the stand-in models
+
+    Returns:
+        dict: Latency figures per stage
+    """
+    saved = (settings.vector_db_path, settings.session_dir)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = bench_registry(fake_model_manager(token_seconds), workdir, repeat)
+            results.update(bench_sessions(workdir, repeat))
+
+            # app.main builds its registry, sessions and generator at import
+            settings.vector_db_path = os.path.join(workdir, "app_index")
+            settings.session_dir = os.path.join(workdir, "app_sessions")
+            install_fakes(token_seconds)
+            results.update(asyncio.run(bench_execute(repeat)))
+    finally:
+        settings.vector_db_path, settings.session_dir = saved
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path=HISTORY):
+    """Previous runs, oldest first"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(results, path=HISTORY, repeat=None):
+    """Append a run to the history file and return the stored entry"""
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+
+def print_results(results, previous=None):
+    print(f"{'stage':>16} {'calls':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'mean (ms)':>10} {'p50 change':>11}")
+    for stage, figures in results.items():
+        change = "-"
+        if previous and stage in previous.get("results", {}):
+            before = previous["results"][stage]["p50_ms"]
+            if before:
+                change = f"{100 * (figures['p50_ms'] - before) / before:+.0f}%"
+        print(f"{stage:>16} {figures['calls']:>6} {figures['p50_ms']:>10.3f} {figures['p95_ms']:>10.3f} "
+              f"{figures['mean_ms']:>10.3f} {change:>11}")
+    if previous:
+        print(f"compared with {previous.get('revision') or 'unknown revision'} at {previous['timestamp']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="Passes per stage")
+    parser.add_argument("--token-seconds", type=float, default=0.0,
+                        help="Simulated LLM time per generated word")
+    parser.add_argument("--history", default=HISTORY, help="JSON-lines file results are appended to")
+    parser.add_argument("--no-history", action="store_true", help="Do not record this run")
+    args = parser.parse_args()
+
+    previous = (load_history(args.history) or [None])[-1]
+    results = run(args.repeat, args.token_seconds)
+    print_results(results, previous)
+    if not args.no_history:
+        append_history(results, args.history, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the system functions with and without the background sampler.
+
+Without a sampler get_cpu_usage measures for one second on every call and
+the other functions query psutil directly; with one they read the latest
+sample from the ring buffer.
+
+Usage:
+    python -m benchmarks.bench_system --repeat 3
+"""
+import argparse
+import statistics
+import time
+
+from app.functions import system
+from app.services import system_sampler
+from app.services.system_sampler import SystemSampler
+
+CALLS = [
+    ("get_cpu_usage", system.get_cpu_usage, {}),
+    ("get_cpu_usage per_cpu", system.get_cpu_usage, {"per_cpu": True}),
+    ("get_cpu_usage 60s", system.get_cpu_usage, {"window": 60}),
+    ("get_memory_usage", system.get_memory_usage, {}),
+    ("get_disk_usage", system.get_disk_usage, {}),
+]
+
+
+def time_calls(repeat):
+    """Median latency (seconds) per call"""
+    results = {}
+    for label, function, kwargs in CALLS:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(**kwargs)
+            latencies.append(time.perf_counter() - start)
+        results[label] = statistics.median(latencies)
+    return results
+
+
+def run(repeat=3, interval=1.0):
+    """
+    Time every call without a sampler, then with a running one
+
+    Returns:
+        list: One result dict per call
+    """
+    saved = system_sampler._default_sampler
+    try:
+        system_sampler._default_sampler = None
+        direct = time_calls(repeat)
+
+        sampler = SystemSampler(interval=interval)
+        system_sampler._default_sampler = sampler.start()
+        sampler.latest()
+        sampled = time_calls(max(repeat, 100))
+        sampler.stop()
+    finally:
+        system_sampler._default_sampler = saved
+    return [{"call": label, "direct_seconds": direct[label], "sampled_seconds": sampled[label]} for label in direct]
+
+
+def print_results(results):
+    print(f"{'call':>22} {'direct (ms)':>12} {'sampled (us)':>13} {'speedup':>9}")
+    for r in results:
+        print(f"{r['call']:>22} {1000 * r['direct_seconds']:>12.3f} {1e6 * r['sampled_seconds']:>13.1f} "
+              f"{r['direct_seconds'] / r['sampled_seconds']:>8.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Calls per function without the sampler")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sampling interval in seconds")
+    args = parser.parse_args()
+    print_results(run(args.repeat, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Evaluate retrieval accuracy against latency for several retrieval configurations.
+
+Runs the labeled prompts in datasets/retrieval.json (direct and paraphrased
+single-turn prompts for every bundled function) and the conversations in
+datasets/multiturn.json through FunctionRegistry.search, and reports
+recall@1, recall@3, MRR and p50/p95/p99 search latency per configuration.
+Conversation turns are replayed with the labeled function of earlier turns
+in the session, so each turn is scored independently of earlier mistakes.
+
+With --gate the results are compared with a baseline file and the process
+exits with status 1 when a metric regressed by more than the tolerance.
+Offline runs use the deterministic stand-in models, whose baseline is
+benchmarks/baselines/retrieval_offline.json.
+
+Usage:
+    python -m benchmarks.eval_retrieval --offline
+    python -m benchmarks.eval_retrieval --offline --gate
+    python -m benchmarks.eval_retrieval --configs default,no_prior --set int8:inference_precision=int8
+    python -m benchmarks.eval_retrieval --offline --write-baseline benchmarks/baselines/retrieval_offline.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from app.config import settings
+from app.services.context import SessionContext
+from app.services.model_manager import ModelManager
+from app.services.registry import FunctionRegistry
+from benchmarks.bench_context import load_conversations
+from benchmarks.fakes import fake_model_manager
+from benchmarks.stats import percentile
+
+DATASET = os.path.join(os.path.dirname(__file__), "datasets", "retrieval.json")
+OFFLINE_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "retrieval_offline.json")
+ACCURACY_METRICS = ("recall@1", "recall@3", "mrr")
+
+# Settings overrides per configuration; "warm_cache" times searches answered
+# from the query cache instead of embedding every prompt
+CONFIGURATIONS = {
+    "default": {},
+    "no_lexical": {"lexical_fast_path": False},
+    "numpy_index": {"vector_index_backend": "numpy"},
+    "no_prior": {"context_prior_weight": 0.0},
+    "warm_cache": {"warm_cache": True},
+}
+
+
+def load_cases(path=DATASET):
+    """Labeled single-turn prompts"""
+    with open(path) as f:
+        return json.load(f)["cases"]
+
+
+def score(ids, expected):
+    """Reciprocal rank of the expected function among the results (0 when absent)"""
+    return 1.0 / (ids.index(expected) + 1) if expected in ids else 0.0
+
+
+def summarize(ranks, latencies):
+    latencies_ms = sorted(1000 * latency for latency in latencies)
+    return {
+        "queries": len(ranks),
+        "recall@1": sum(rank == 1.0 for rank in ranks) / len(ranks),
+        "recall@3": sum(rank >= 1 / 3 for rank in ranks) / len(ranks),
+        "mrr": sum(ranks) / len(ranks),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
+
+
+def queries(cases, conversations):
+    """
+    (kind, prompt, expected, recent_functions) for every single-turn case
+    and conversation turn
+    """
+    for case in cases:
+        yield case.get("kind", "direct"), case["prompt"], case["expected"], None
+    for conversation in conversations:
+        session = SessionContext(persist=False)
+        for turn in conversation["turns"]:
+            recent = session.recent_functions(settings.context_prior_functions) or None
+            yield "multiturn", turn["prompt"], turn["expected"], recent
+            session.add_interaction(turn["prompt"], {"function": turn["expected"]})
+
+
+def evaluate(registry, cases, conversations, warm_cache=False, n_results=3):
+    """
+    Search every labeled query once
+
+    Returns:
+        dict: Metrics over all queries under "all" and per kind
+    """
+    items = list(queries(cases, conversations))
+    if warm_cache:
+        for _, prompt, _, recent in items:
+            registry.search(prompt, recent_functions=recent, n_results=n_results)
+
+    by_kind = {}
+    for kind, prompt, expected, recent in items:
+        if not warm_cache:
+            registry.db.query_cache.clear()
+        start = time.perf_counter()
+        results = registry.search(prompt, recent_functions=recent, n_results=n_results)
+        elapsed = time.perf_counter() - start
+        ranks, latencies = by_kind.setdefault(kind, ([], []))
+        ranks.append(score(results["ids"][0], expected))
+        latencies.append(elapsed)
+
+    report = {"all": summarize(
+        [rank for ranks, _ in by_kind.values() for rank in ranks],
+        [latency for _, latencies in by_kind.values() for latency in latencies]
+    )}
+    for kind, (ranks, latencies) in by_kind.items():
+        report[kind] = summarize(ranks, latencies)
+    return report
+
+
+def run(configurations, model_manager=None, offline=False, dataset=DATASET):
+    """
+    Evaluate every configuration on a fresh registry
+
+    Args:
+        configurations (dict): Name to settings overrides
+        model_manager (ModelManager, optional): Models to use (default: the
+            stand-ins when offline, otherwise the configured models)
+        offline (bool): Use the deterministic stand-in models
+
+    Returns:
+        dict: Report per configuration name
+
+    Raises:
+        ValueError: If a configuration sets inference_precision while the
+            models are the stand-ins or were passed in, which it cannot change
+    """
+    if offline or model_manager is not None:
+        fixed = [name for name, overrides in configurations.items() if "inference_precision" in overrides]
+        if fixed:
+            models = "the stand-in models" if offline and model_manager is None else "the given model manager"
+            raise ValueError(f"inference_precision cannot be applied to {models} (configurations: {', '.join(fixed)})")
+    cases, conversations = load_cases(dataset), load_conversations()
+    reports = {}
+    for name, overrides in configurations.items():
+        overrides = dict(overrides)
+        warm_cache = overrides.pop("warm_cache", False)
+        precision = overrides.pop("inference_precision", None)
+        manager = model_manager or (fake_model_manager() if offline else ModelManager(precision=precision))
+
+        saved = {key: getattr(settings, key) for key in overrides}
+        saved_path = settings.vector_db_path
+        try:
+            with tempfile.TemporaryDirectory() as workdir:
+                settings.vector_db_path = workdir
+                for key, value in overrides.items():
+                    setattr(settings, key, value)
+                registry = FunctionRegistry(manager)
+                missing = {case["expected"] for case in cases} - set(registry.functions)
+                if missing:
+                    raise ValueError(f"Dataset labels unknown functions: {sorted(missing)}")
+                reports[name] = evaluate(registry, cases, conversations, warm_cache)
+        finally:
+            settings.vector_db_path = saved_path
+            for key, value in saved.items():
+                setattr(settings, key, value)
+    return reports
+
+
+def regressions(reports, baseline, tolerance=0.02, latency_tolerance=None):
+    """
+    Compare reports with a baseline
+
+    Args:
+        reports (dict): Current reports per configuration
+        baseline (dict): Baseline reports per configuration
+        tolerance (float): Allowed absolute drop of recall@1, recall@3 and MRR
+        latency_tolerance (float, optional): Allowed p95 latency ratio to the
+            baseline (latency is not gated when None)
+
+    Returns:
+        list: Human readable descriptions of every regression
+    """
+    found = []
+    for name, report in reports.items():
+        if name not in baseline:
+            continue
+        for kind, metrics in report.items():
+            before = baseline[name].get(kind)
+            if not before:
+                continue
+            for metric in ACCURACY_METRICS:
+                if metrics[metric] < before[metric] - tolerance:
+                    found.append(f"{name}/{kind}: {metric} {before[metric]:.3f} -> {metrics[metric]:.3f}")
+            if latency_tolerance and metrics["p95_ms"] > before["p95_ms"] * latency_tolerance:
+                found.append(f"{name}/{kind}: p95 {before['p95_ms']:.3f} ms -> {metrics['p95_ms']:.3f} ms")
+    return found
+
+
+def parse_configurations(names, extra):
+    """
+    Build configurations from predefined names and NAME:KEY=VALUE[,KEY=VALUE] specs
+
+    Values are parsed as JSON where possible (true, 0.3, "x"), otherwise kept as strings.
+    """
+    configurations = {name: CONFIGURATIONS[name] for name in names}
+    for spec in extra:
+        name, _, assignments = spec.partition(":")
+        overrides = {}
+        for assignment in filter(None, assignments.split(",")):
+            key, _, value = assignment.partition("=")
+            if key not in ("warm_cache", "inference_precision") and not hasattr(settings, key):
+                raise ValueError(f"Unknown setting '{key}'")
+            try:
+                overrides[key] = json.loads(value)
+            except ValueError:
+                overrides[key] = value
+        configurations[name] = overrides
+    return configurations
+
+
+def print_reports(reports):
+    print(f"{'configuration':>14} {'queries':>8} {'kind':>11} {'R@1':>6} {'R@3':>6} {'MRR':>6} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for name, report in reports.items():
+        for kind, m in report.items():
+            print(f"{name:>14} {m['queries']:>8} {kind:>11} {m['recall@1']:>6.1%} {m['recall@3']:>6.1%} "
+                  f"{m['mrr']:>6.3f} {m['p50_ms']:>9.3f} {m['p95_ms']:>9.3f} {m['p99_ms']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--configs", default=",".join(CONFIGURATIONS),
+                        help=f"Comma separated predefined configurations ({', '.join(CONFIGURATIONS)})")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME:KEY=VALUE,...",
+                        help="Extra configuration overriding settings, e.g. wide:context_candidates=10")
+    parser.add_argument("--dataset", default=DATASET, help="Labeled single-turn prompt set")
+    parser.add_argument("--offline", action="store_true", help="Use the deterministic stand-in models")
+    parser.add_argument("--gate", action="store_true", help="Exit with status 1 on regressions against --baseline")
+    parser.add_argument("--baseline", default=None,
+                        help="Baseline report (default with --offline: benchmarks/baselines/retrieval_offline.json)")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed drop of recall and MRR")
+    parser.add_argument("--latency-tolerance", type=float, default=None,
+                        help="Allowed p95 latency ratio to the baseline (not gated by default)")
+    parser.add_argument("--write-baseline", default=None, metavar="PATH", help="Save this run as a baseline")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args()
+
+    configurations = parse_configurations(filter(None, args.configs.split(",")), args.set)
+    try:
+        reports = run(configurations, offline=args.offline, dataset=args.dataset)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_reports(reports)
+
+    if args.write_baseline:
+        os.makedirs(os.path.dirname(args.write_baseline) or ".", exist_ok=True)
+        with open(args.write_baseline, "w") as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.gate:
+        baseline_path = args.baseline or (OFFLINE_BASELINE if args.offline else None)
+        if not baseline_path:
+            parser.error("--gate needs --baseline unless --offline is given")
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        found = regressions(reports, baseline, args.tolerance, args.latency_tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Deterministic stand-ins for the embedding model and the LLM.
+
+They need neither network access nor torch, so benchmarks can time everything
+around the models offline. Vectors hash words and word bigrams into a fixed
+number of buckets (plus a faint text-seeded dense component): prompts sharing vocabulary with a function's document land
+close to it, and the same text always gets the same vector.
+
+Usage:
+    from benchmarks.fakes import fake_model_manager, install_fakes
+
+    model_manager = fake_model_manager()   # a private ModelManager
+    install_fakes()                         # swap the process-wide one (before importing app.main)
+"""
+import hashlib
+import math
+import queue
+import random
+import re
+import threading
+import time
+
+from app.services.llm import CODE_FENCE, LLMService
+from app.services.model_manager import ModelManager, get_model_manager
+from app.utils.cache import LRUCache
+
+DIMENSIONS = 384
+NOISE = 0.01
+# Characters per streamed chunk: small enough that the closing fence
+# arrives split across chunks, like tokens of a real tokenizer
+STREAM_CHUNK = 3
+
+
+def _bucket(token, dimensions):
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimensions, 1.0 if value >> 63 else -1.0
+
+
+class FakeEmbeddingService:
+    """Hashing embedding with the interface of EmbeddingService"""
+    def __init__(self, model_name="fake-hash", dimensions=DIMENSIONS, precision="auto"):
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.precision = precision
+
+    def get_embedding(self, text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        # A faint dense component seeded by the text: without it, texts sharing
+        # no words are exactly orthogonal and approximate indexes order the
+        # resulting distance ties arbitrarily from one build to the next
+        noise = random.Random(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest())
+        vector = [NOISE * noise.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            index, sign = _bucket(token, self.dimensions)
+            vector[index] += sign
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def get_embeddings(self, texts):
+        return [self.get_embedding(text) for text in texts]
+
+
+class FakeLLMService(LLMService):
+    """
+    LLM whose completions are a fixed script for the requested function
+
+    Shares LLMService's code cache, batcher and streaming logic; only the
+    model calls are replaced. Streaming produces small chunks on a background
+    thread and stops at the closing code fence or on cancellation, like
+    generate() with a TextIteratorStreamer. `token_seconds` simulates
+    generation speed.
+    """
+    def __init__(self, model_name="fake-llm", code_cache=None, max_new_tokens=None, precision="auto",
+                 token_seconds=0.0):
+        self.model_name = model_name
+        self.precision = precision
+        self.max_new_tokens = max_new_tokens or 256
+        self.code_cache = code_cache if code_cache is not None else LRUCache(256)
+        self.token_seconds = token_seconds
+        self.batcher = None
+
+    def prompt_length(self, prompt):
+        return len(prompt.split())
+
+    def _script(self, prompt):
+        """The completion for a prompt, generated instantly"""
+        fields = dict(re.findall(r"^(Function name|Module): (.+)$", prompt, re.MULTILINE))
+        name, module = fields.get("Function name", "main"), fields.get("Module", "app")
+        return (
+            f"from app.functions.{module} import {name}\n\n"
+            f"try:\n    print({name}())\nexcept Exception as e:\n    print(f\"Error: {{e}}\")\n```\n"
+        )
+
+    def _complete(self, prompt):
+        completion = self._script(prompt)
+        if self.token_seconds:
+            time.sleep(self.token_seconds * len(completion.split()))
+        return completion
+
+    def generate_response(self, prompt, max_new_tokens=None):
+        return prompt + self._complete(prompt)
+
+    def generate_batch(self, prompts, max_new_tokens=None):
+        return [self._complete(prompt) for prompt in prompts]
+
+    def _start_stream(self, prompt, max_new_tokens, cancelled, failure):
+        chunks = queue.Queue()
+
+        def generate():
+            try:
+                text = ""
+                completion = self._script(prompt)
+                for start in range(0, len(completion), STREAM_CHUNK):
+                    if cancelled.is_set():
+                        break
+                    chunk = completion[start:start + STREAM_CHUNK]
+                    if self.token_seconds:
+                        time.sleep(self.token_seconds * len(chunk.split()))
+                    chunks.put(chunk)
+                    text += chunk
+                    # The stop string ends generation right after the fence
+                    if CODE_FENCE in text[-len(CODE_FENCE) - STREAM_CHUNK:]:
+                        break
+            except Exception as e:
+                failure.append(e)
+            finally:
+                chunks.put(None)
+
+        threading.Thread(target=generate, name="fake-llm-stream", daemon=True).start()
+        return iter(chunks.get, None)
+
+def fake_factories(token_seconds=0.0):
+    """(embedding_factory, llm_factory) for ModelManager"""
+    return FakeEmbeddingService, lambda: FakeLLMService(token_seconds=token_seconds)
+
+
+def fake_model_manager(token_seconds=0.0):
+    """A ModelManager serving the fakes"""
+    embedding_factory, llm_factory = fake_factories(token_seconds)
+    return ModelManager(embedding_model="fake-hash", llm_model="fake-llm",
+                        embedding_factory=embedding_factory, llm_factory=llm_factory)
+
+
+def install_fakes(token_seconds=0.0):
+    """
+    Serve the fakes from the process-wide model manager
+
+    Call before importing app.main, which builds its registry at import time.
+
+    Returns:
+        ModelManager: The process-wide manager
+    """
+    manager = get_model_manager()
+    manager.embedding_model, manager.llm_model = "fake-hash", "fake-llm"
+    manager.configure(*fake_factories(token_seconds))
+    return manager
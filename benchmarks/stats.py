@@ -0,0 +1,21 @@
+"""
+Latency statistics shared by the benchmarks.
+"""
+import math
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an ascending list
+
+    The smallest value with at least p% of the values at or below it, so it
+    is always an observed value and never below the median for p >= 50.
+
+    Args:
+        sorted_values (list): Values in ascending order (not empty)
+        p (float): Percentile between 0 and 100
+
+    Returns:
+        The percentile value
+    """
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
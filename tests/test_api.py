@@ -0,0 +1,202 @@
+import json
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.fakes import FakeEmbeddingService, FakeLLMService, fake_model_manager, install_fakes
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """
+    app.main with its services replaced by ones built on the stand-in models,
+    with the index, sessions and jobs in a temp dir
+
+    app.main builds its services at import, possibly already during test
+    collection and against the configured paths, so they are swapped on the
+    module rather than relying on settings being patched before the import.
+    """
+    from app.config import settings
+    from app.services.code_generator import CodeGenerator
+    from app.services.context import SessionContext
+    from app.services.jobs import JobManager
+    from app.services.registry import FunctionRegistry
+    from app.services.session_store import AppendLogSessionStore
+    from app.services.sessions import SessionManager
+
+    workdir = tmp_path_factory.mktemp("api")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(settings, "vector_db_path", str(workdir / "index"))
+    patch.setattr(settings, "session_dir", str(workdir / "sessions"))
+    if "app.main" not in sys.modules:
+        # A first import builds the module's own services: keep them off the real models
+        shared = install_fakes()
+        import app.main
+        shared.embedding_model, shared.llm_model = settings.embedding_model, settings.llm_model
+        shared.configure()
+    import app.main as main
+
+    manager = fake_model_manager()
+    registry = FunctionRegistry(manager, main.executors)
+    store = AppendLogSessionStore(str(workdir / "sessions"), durability="shutdown")
+    patch.setattr(main, "model_manager", manager)
+    patch.setattr(main, "registry", registry)
+    patch.setattr(main, "code_generator", CodeGenerator(manager, plans=registry.code_plans))
+    patch.setattr(main, "sessions", SessionManager(
+        session_factory=lambda session_id: SessionContext(session_id, store=store)
+    ))
+    patch.setattr(main, "jobs", JobManager(main.executors.get("jobs")))
+    try:
+        yield main
+    finally:
+        store.close()
+        patch.undo()
+
+
+@pytest.fixture
+def client(api):
+    return TestClient(api.app)
+
+
+def read_events(body):
+    """Parse a server-sent event stream into (event, data) pairs"""
+    events = []
+    for block in filter(None, body.split("\n\n")):
+        lines = block.split("\n")
+        name = lines[0][len("event: "):]
+        data = "\n".join(line[len("data: "):] for line in lines[1:])
+        events.append((name, data if name == "token" else json.loads(data)))
+    return events
+
+
+def test_execute_batch_returns_results_in_order(client):
+    """Every item gets a result at its own index"""
+    prompts = ["open calculator", "how much memory is used", "disk usage"]
+    response = client.post("/execute/batch", json={"items": [{"prompt": prompt} for prompt in prompts]})
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["function"] for result in results] == [
+        "application.open_calculator", "system.get_memory_usage", "system.get_disk_usage"
+    ]
+    assert all(result["code"] and result["error"] is None for result in results)
+
+
+def test_execute_batch_items_fail_alone(api, client, monkeypatch):
+    """An unmatched prompt or bad parameters fail their own item only"""
+    search_many = api.registry.search_many
+
+    def without_second_match(queries, recent_functions=None, n_results=3):
+        results = search_many(queries, recent_functions, n_results)
+        results[1] = {"ids": [[]], "metadatas": [[]]}
+        return results
+
+    monkeypatch.setattr(api.registry, "search_many", without_second_match)
+    response = client.post("/execute/batch", json={"items": [
+        {"prompt": "how much memory is used", "parameters": {"no_such_argument": 1}},
+        {"prompt": "open calculator"},
+        {"prompt": "disk usage"},
+    ]})
+    assert response.status_code == 200
+
+    bad_parameters, unmatched, ok = response.json()["results"]
+    assert bad_parameters["function"] == "system.get_memory_usage"
+    assert bad_parameters["execution_result"]["success"] is False
+    assert unmatched["function"] is None
+    assert unmatched["error"] == "No matching function found"
+    assert ok["function"] == "system.get_disk_usage"
+    assert ok["error"] is None and ok["code"]
+
+
+def test_execute_batch_accepts_an_empty_batch(client):
+    """An empty batch is answered with no results"""
+    response = client.post("/execute/batch", json={"items": []})
+    assert response.status_code == 200
+    assert response.json() == {"results": []}
+
+
+def test_execute_stream_sends_function_tokens_then_done(api, client, monkeypatch):
+    """LLMService.stream_code cuts the stream at the closing fence and ends with the non-streamed code"""
+    from app.services.code_generator import CodeGenerator
+    from app.services.model_manager import ModelManager
+
+    class ChattyModel(FakeLLMService):
+        """Keeps generating past the fence, as if its stop string never fired"""
+        def _complete(self, prompt):
+            return super()._complete(prompt) + "This script imports the function and prints its result.\n"
+
+        def _start_stream(self, prompt, max_new_tokens, cancelled, failure):
+            completion = self._complete(prompt)
+            return (completion[start:start + 2] for start in range(0, len(completion), 2))
+
+    manager = ModelManager(embedding_factory=FakeEmbeddingService, llm_factory=ChattyModel)
+    monkeypatch.setattr(api, "code_generator", CodeGenerator(manager, plans=api.registry.code_plans))
+    response = client.post("/execute/stream", json={"prompt": "open calculator"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = read_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "function" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+
+    function_id = events[0][1]["function"]
+    assert function_id == "application.open_calculator"
+    tokens = "".join(data for name, data in events if name == "token")
+    assert "`" not in tokens and "This script" not in tokens
+
+    done = events[-1][1]
+    metadata = api.registry.records[function_id]["metadata"]
+    assert done["code"] == tokens.strip()
+    assert done["code"] == ChattyModel().generate_code(metadata, "open calculator")
+    # The streamed generation was cached like a non-streamed one
+    assert list(manager.llm.stream_code(metadata, "open calculator")) == [done["code"]]
+
+
+def test_background_jobs_can_be_polled_and_cancelled(api, client, monkeypatch):
+    """background=true queues a job that GET /jobs/{id} reports and DELETE cancels while queued"""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.jobs import JobManager
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(api, "jobs", JobManager(executor))
+    release = threading.Event()
+    blocker = api.jobs.submit("tests.block", lambda: {"success": release.wait(10)})
+    request = {"prompt": "how much memory is used", "parameters": {"window": 5}, "background": True}
+    try:
+        response = client.post("/execute", json=request)
+        assert response.status_code == 200
+        assert response.json()["execution_result"] is None
+        job_id = response.json()["job_id"]
+
+        # Queued behind the blocker, so it can still be cancelled
+        assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+        response = client.delete(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "cancelled"
+
+        # Finished jobs cannot be cancelled
+        release.set()
+        blocker.future.result(timeout=10)
+        assert client.get(f"/jobs/{blocker.id}").json()["status"] == "succeeded"
+        assert client.delete(f"/jobs/{blocker.id}").status_code == 409
+
+        # A job that runs reports the function's result
+        job_id = client.post("/execute", json=request).json()["job_id"]
+        deadline = time.monotonic() + 10
+        while client.get(f"/jobs/{job_id}").json()["status"] not in ("succeeded", "failed"):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        job = client.get(f"/jobs/{job_id}").json()
+        assert job["function"] == "system.get_memory_usage"
+        assert job["status"] == "succeeded" and job["result"]["success"] is True
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert client.get("/jobs/job_unknown").status_code == 404
+    assert client.delete("/jobs/job_unknown").status_code == 404
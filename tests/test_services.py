@@ -0,0 +1,912 @@
+import hashlib
+import re
+import pytest
+from app.services.model_manager import ModelManager
+
+class FakeEmbeddingService:
+    """Deterministic bag-of-words stand-in for EmbeddingService"""
+    def get_embedding(self, text):
+        vector = [0.0] * 32
+        for token in re.findall(r"[a-z]+", text.lower()):
+            vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % 32] += 1.0
+        norm = sum(value * value for value in vector) ** 0.5 or 1.0
+        return [value / norm for value in vector]
+
+    def get_embeddings(self, texts):
+        return [self.get_embedding(text) for text in texts]
+
+def test_model_manager_loads_lazily():
+    """Models are only built on first access"""
+    calls = []
+    manager = ModelManager(embedding_factory=lambda: calls.append("embedding") or FakeEmbeddingService())
+    assert calls == []
+    assert manager.status()["embedding"]["loaded"] is False
+
+    embedding_function = manager.embedding_function()
+    assert calls == []
+    assert embedding_function(["open calculator"]) == [FakeEmbeddingService().get_embedding("open calculator")]
+    assert len(embedding_function(["a", "b"])) == 2
+    assert calls == ["embedding"]
+    assert manager.status()["embedding"]["loaded"] is True
+
+def test_model_manager_reports_load_errors():
+    """A failing model load is reported through status() and retried later"""
+    def broken():
+        raise RuntimeError("no weights")
+
+    manager = ModelManager(llm_factory=broken)
+    with pytest.raises(RuntimeError):
+        manager.llm
+    assert manager.status()["llm"]["error"] == "no weights"
+
+    manager.warmup(["llm"], background=False)
+    assert manager.is_loaded("llm") is False
+
+def sample_function(path="."):
+    """List files in a path."""
+    return path
+
+def other_function():
+    """Do something else."""
+    return None
+
+def test_vector_database_incremental_sync(tmp_path):
+    """Only new, changed or removed functions are embedded or deleted"""
+    from app.models.database import VectorDatabase
+
+    embedded = []
+
+    class CountingEmbeddingService(FakeEmbeddingService):
+        def get_embeddings(self, texts):
+            embedded.extend(texts)
+            return super().get_embeddings(texts)
+
+    manager = ModelManager(embedding_factory=CountingEmbeddingService)
+
+    def open_db():
+        return VectorDatabase(str(tmp_path), embedding_function=manager.embedding_function())
+
+    db = open_db()
+    records = [
+        db.build_function_record(sample_function, "List files", "tests"),
+        db.build_function_record(other_function, "Other", "tests"),
+    ]
+    assert db.sync_functions(records) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert len(embedded) == 2
+
+    # Reopening the persisted index with the same functions embeds nothing
+    db = open_db()
+    assert db.sync_functions(records) == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+    assert len(embedded) == 2
+
+    # A changed description re-embeds one function, a dropped one is deleted
+    changed = [db.build_function_record(sample_function, "List directory contents", "tests")]
+    assert db.sync_functions(changed) == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+    assert len(embedded) == 3
+    assert list(db.get_fingerprints()) == ["tests.sample_function"]
+
+def test_vector_database_add_functions_batches_embeddings(tmp_path):
+    """add_functions embeds documents batch_size at a time"""
+    from app.models.database import VectorDatabase
+
+    batches = []
+
+    class RecordingEmbeddingService(FakeEmbeddingService):
+        def get_embeddings(self, texts):
+            batches.append(len(texts))
+            return super().get_embeddings(texts)
+
+    manager = ModelManager(embedding_factory=RecordingEmbeddingService)
+    db = VectorDatabase(str(tmp_path), embedding_function=manager.embedding_function())
+
+    functions = [(sample_function, "List files", f"module{i}") for i in range(5)]
+    assert db.add_functions(functions, batch_size=2) == 5
+    assert batches == [2, 2, 1]
+    assert db.collection.count() == 5
+
+def test_numpy_index_matches_chroma(tmp_path):
+    """The NumPy backend returns the same results and shape as Chroma"""
+    from app.models.database import VectorDatabase
+    from app.models.index import ChromaIndex, NumpyIndex
+
+    manager = ModelManager(embedding_factory=FakeEmbeddingService)
+    db = VectorDatabase(str(tmp_path), embedding_function=manager.embedding_function(), index_backend="numpy")
+    db.add_functions([
+        (sample_function, "List files in a directory", "files"),
+        (other_function, "Open the calculator application", "apps"),
+        (sample_function, "Report memory usage", "system"),
+    ])
+
+    for query in ("list files", "open calculator", "memory usage"):
+        embedding = db.embed_query(query)
+        chroma = ChromaIndex(db.collection).search(embedding, n_results=2)
+        numpy = NumpyIndex(db.collection).search(embedding, n_results=2)
+        assert numpy["ids"][0][0] == chroma["ids"][0][0]
+        assert numpy["metadatas"][0][0]["module"] == chroma["metadatas"][0][0]["module"]
+        assert numpy["distances"][0] == pytest.approx(chroma["distances"][0], abs=1e-4)
+
+    assert db.search_functions("open calculator", n_results=1)["ids"] == [["apps.other_function"]]
+
+    # One query for several embeddings gives the same answers as one query each
+    queries = ["list files", "open calculator", "memory usage"]
+    embeddings = db.embed_queries(queries)
+    for index in (ChromaIndex(db.collection), NumpyIndex(db.collection)):
+        batched = index.search_many(embeddings, n_results=2)
+        assert [result["ids"] for result in batched] == [index.search(e, n_results=2)["ids"] for e in embeddings]
+
+def test_lru_cache_eviction_and_ttl(monkeypatch):
+    """LRUCache evicts the least recently used entry and expires stale ones"""
+    from app.utils import cache as cache_module
+
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    cache = cache_module.LRUCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("b") is None
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 1, "max_size": 2, "hits": 1, "misses": 2,
+        "evictions": 1, "expirations": 1, "hit_rate": 1 / 3,
+    }
+
+def test_query_embedding_cache(tmp_path):
+    """Repeated prompts are embedded once and the cache is cleared on model reload"""
+    from app.models.database import VectorDatabase
+    from app.utils.cache import LRUCache
+
+    embedded = []
+
+    class CountingEmbeddingService(FakeEmbeddingService):
+        def get_embeddings(self, texts):
+            embedded.extend(texts)
+            return super().get_embeddings(texts)
+
+    manager = ModelManager(embedding_factory=CountingEmbeddingService)
+    db = VectorDatabase(str(tmp_path), embedding_function=manager.embedding_function(),
+                        query_cache=LRUCache(16))
+    manager.add_reload_listener(db.query_cache.clear)
+
+    db.embed_query("Open calculator")
+    db.embed_query("  open   CALCULATOR ")
+    assert embedded == ["Open calculator"]
+    assert db.query_cache.stats()["hits"] == 1
+
+    manager.configure(embedding_factory=CountingEmbeddingService)
+    assert len(db.query_cache) == 0
+    db.embed_query("open calculator")
+    assert len(embedded) == 2
+
+LEXICAL_FUNCTIONS = {
+    "system.get_cpu_usage": {"name": "get_cpu_usage", "module": "system", "docstring": "Get current CPU usage percentage."},
+    "system.get_memory_usage": {"name": "get_memory_usage", "module": "system", "docstring": "Get current memory usage details."},
+    "system.get_system_info": {"name": "get_system_info", "module": "system", "docstring": "Get comprehensive system information."},
+    "utilities.list_directory": {"name": "list_directory", "module": "utilities", "docstring": "List contents of a directory."},
+    "utilities.create_directory": {"name": "create_directory", "module": "utilities", "docstring": "Create a new directory."},
+}
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("get cpu usage", "system.get_cpu_usage"),
+    ("Show me the system information", "system.get_system_info"),
+    ("list the files in this directory", "utilities.list_directory"),
+    ("how much memory is free", None),
+    ("create a directory listing", None),
+    ("open calculator", None),
+])
+def test_lexical_index_resolves_only_unambiguous_prompts(prompt, expected):
+    """The lexical fast path answers prompts naming a function and defers the rest"""
+    from app.services.lexical import LexicalIndex
+
+    index = LexicalIndex()
+    index.build(LEXICAL_FUNCTIONS)
+    match = index.match(prompt)
+    assert (match[0] if match else None) == expected
+
+def test_embedding_batcher_coalesces_concurrent_requests():
+    """Concurrent embed() calls inside the window share one encode call"""
+    import asyncio
+    from app.services.batching import EmbeddingBatcher
+
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=4, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed("x" * i) for i in range(1, 7)))
+
+    vectors = asyncio.run(run())
+    assert vectors == [[float(i)] for i in range(1, 7)]
+    assert [len(batch) for batch in calls] == [4, 2]
+
+    stats = batcher.stats()
+    assert stats["batch_size"]["count"] == 2
+    assert stats["queue_wait_seconds"]["count"] == 6
+
+def test_embedding_batcher_propagates_errors():
+    """A failing or short encode call fails every request of its batch"""
+    import asyncio
+    from app.services.batching import EmbeddingBatcher
+
+    responses = [RuntimeError("model unavailable"), [], [[1.0]]]
+
+    def embed_batch(texts):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=1)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            await batcher.embed("hello")
+        # Fewer vectors than texts fails the batch instead of leaving callers waiting
+        with pytest.raises(RuntimeError, match="0 vectors for 1 texts"):
+            await asyncio.wait_for(batcher.embed("hello"), timeout=5)
+        # ... and the worker keeps serving
+        return await asyncio.wait_for(batcher.embed("hello"), timeout=5)
+
+    assert asyncio.run(run()) == [1.0]
+
+def test_executor_pool_throughput_scales_with_in_flight_requests():
+    """Blocking calls overlap on the pool while the event loop keeps running"""
+    import asyncio
+    import time
+    from app.services.executors import ExecutorPool
+
+    pool = ExecutorPool({"execution": 8, "io": 1})
+
+    async def measure(name, in_flight):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.run(name, time.sleep, 0.2) for _ in range(in_flight)))
+        elapsed = time.perf_counter() - start
+        ticker_task.cancel()
+        return elapsed, ticks
+
+    try:
+        parallel, ticks = asyncio.run(measure("execution", 8))
+        serial, _ = asyncio.run(measure("io", 4))
+    finally:
+        pool.shutdown()
+
+    # 8 in-flight requests on 8 workers finish in about one call's time
+    assert parallel < 0.6
+    # A single-worker pool serializes them
+    assert serial >= 0.8
+    # The event loop was never blocked
+    assert ticks >= 10
+
+def test_job_manager_lifecycle():
+    """Jobs report results and timing, respect the queue limit and can be cancelled"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.jobs import JobManager, QueueFullError
+
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    manager = JobManager(executor, max_queue_depth=2, max_retained=2)
+
+    def blocking(**kwargs):
+        release.wait(5)
+        return {"success": True, "result": kwargs["value"]}
+
+    first = manager.submit("tests.blocking", blocking, {"value": 1})
+    second = manager.submit("tests.blocking", blocking, {"value": 2})
+    with pytest.raises(QueueFullError):
+        manager.submit("tests.blocking", blocking, {"value": 3})
+
+    # The second job is still queued behind the first one
+    assert manager.cancel(second.id) is True
+    assert manager.get(second.id).status == "cancelled"
+
+    release.set()
+    first.future.result(timeout=5)
+    job = manager.get(first.id).to_dict()
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"success": True, "result": 1}
+    assert job["run_seconds"] >= 0
+
+    failed = manager.submit("tests.failing", lambda: {"success": False, "error": "boom"})
+    failed.future.result(timeout=5)
+    # Only the two most recent finished jobs are retained
+    assert manager.get(first.id) is None
+    assert manager.get(failed.id).to_dict()["error"] == "boom"
+    executor.shutdown()
+
+def test_stream_command_yields_lines_and_exit_status():
+    """Output lines are streamed as produced, followed by an exit event"""
+    from app.services.streaming import stream_command, format_sse
+
+    events = list(stream_command("echo one; echo two 1>&2; exit 3", timeout=10))
+    assert {"event": "stdout", "data": "one"} in events
+    assert {"event": "stderr", "data": "two"} in events
+    assert events[-1]["event"] == "exit"
+    assert events[-1]["returncode"] == 3
+    assert events[-1]["success"] is False
+    assert format_sse(events[0]).startswith(f"event: {events[0]['event']}\ndata: ")
+
+def test_stream_command_enforces_byte_cap_and_timeout():
+    """Verbose or slow commands are killed at the byte cap or the timeout"""
+    import time
+    from app.services.streaming import stream_command
+
+    events = list(stream_command("yes", max_output_bytes=1000, timeout=10))
+    assert events[-1]["truncated"] is True
+    assert sum(len(event["data"]) + 1 for event in events[:-1]) <= 1000
+
+    events = list(stream_command("echo start; sleep 5", timeout=0.5))
+    assert events[0] == {"event": "stdout", "data": "start"}
+    assert events[-1]["timed_out"] is True
+
+    # A single line far longer than the cap is cut off without being buffered whole
+    events = list(stream_command("head -c 50000000 /dev/zero | tr '\\0' x", max_output_bytes=100000, timeout=10))
+    assert events[-1]["truncated"] is True
+    assert sum(len(event["data"]) for event in events[:-1]) <= 100000
+
+    # The cap ends the command at once, even when it stops writing and keeps running
+    start = time.monotonic()
+    events = list(stream_command("head -c 100000 /dev/zero | tr '\\0' x; sleep 30", max_output_bytes=1000, timeout=20))
+    assert events[-1]["truncated"] is True and events[-1]["timed_out"] is False
+    assert time.monotonic() - start < 10
+
+def test_stream_command_kills_child_processes_on_timeout():
+    """Processes started by the command die with it"""
+    import time
+    import psutil
+    from app.services.streaming import stream_command
+
+    events = list(stream_command("sleep 30 & echo $!; wait", timeout=0.5))
+    assert events[-1]["timed_out"] is True
+    child = int(events[0]["data"])
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            if psutil.Process(child).status() == psutil.STATUS_ZOMBIE:
+                break
+        except psutil.NoSuchProcess:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("The background child outlived the timed out command")
+
+def test_session_manager_evicts_and_rehydrates(tmp_path, monkeypatch):
+    """Evicted sessions are flushed to disk and reloaded on their next request"""
+    from app.services import sessions as sessions_module
+    from app.services.context import SessionContext
+    from app.services.session_store import AppendLogSessionStore
+    from app.services.sessions import SessionManager
+
+    now = [0.0]
+    monkeypatch.setattr(sessions_module.time, "monotonic", lambda: now[0])
+
+    store = AppendLogSessionStore(str(tmp_path), durability="shutdown")
+    manager = SessionManager(max_sessions=2, idle_ttl=60,
+                             session_factory=lambda session_id: SessionContext(session_id, store=store))
+    first = manager.get("first")
+    first.add_interaction("open calculator", {"function": "application.open_calculator"})
+    manager.get("second")
+    manager.get("third")
+
+    # The least recently used session was evicted
+    assert "first" not in manager
+    assert len(manager) == 2
+    assert manager.stats()["evictions"] == 1
+
+    # ... and comes back from disk with its history
+    rehydrated = manager.get("first")
+    assert rehydrated is not first
+    assert rehydrated.interaction_history[0]["user_query"] == "open calculator"
+
+    # Idle sessions are evicted after the TTL
+    now[0] += 61
+    assert manager.evict_idle() == 2
+    assert manager.stats()["live_sessions"] == 0
+    # ... and the store keeps no bookkeeping for sessions that left memory
+    assert not store._max_history and not store._log_records
+
+def test_session_manager_sweeps_idle_sessions_without_requests(tmp_path):
+    """The background sweeper evicts idle sessions on a quiet server"""
+    import time
+    from app.services.context import SessionContext
+    from app.services.session_store import AppendLogSessionStore
+    from app.services.sessions import SessionManager
+
+    store = AppendLogSessionStore(str(tmp_path), durability="shutdown")
+    manager = SessionManager(idle_ttl=0.05, session_factory=lambda session_id: SessionContext(session_id, store=store))
+    manager.get("quiet").add_interaction("open calculator", {"function": "application.open_calculator"})
+    manager.start(interval=0.02)
+    try:
+        deadline = time.monotonic() + 5
+        while "quiet" in manager and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "quiet" not in manager
+        assert manager.stats()["evictions"] == 1
+        # Evicted sessions were flushed on the way out
+        assert (tmp_path / "quiet.log").exists()
+    finally:
+        manager.close()
+    assert manager._sweeper is None
+
+def test_session_size_is_tracked_incrementally():
+    """estimated_size follows the history window and data updates without re-serializing"""
+    import json
+    from app.services.context import SessionContext
+
+    session = SessionContext("sized", max_history=2, persist=False)
+    for i in range(3):
+        session.add_interaction(f"query {i}", {"function": "system.get_memory_usage"})
+    session.set_data("theme", "dark")
+    session.set_data("theme", "light")
+
+    expected = sum(len(json.dumps(item)) for item in session.interaction_history) + len(json.dumps("light"))
+    assert session.estimated_size() == expected
+
+def test_append_log_session_store_replay_and_compaction(tmp_path):
+    """Records are appended, replayed on load and compacted into the snapshot"""
+    import os
+    from app.services.session_store import AppendLogSessionStore
+
+    store = AppendLogSessionStore(str(tmp_path), durability="always", compact_after=5)
+    for i in range(4):
+        store.append_interaction("s1", {"user_query": f"q{i}"}, max_history=3)
+    store.set_data("s1", "theme", "dark")
+    # The fifth record triggered a compaction: snapshot rewritten, log truncated
+    assert not os.path.exists(tmp_path / "s1.log")
+
+    store.append_interaction("s1", {"user_query": "q4"}, max_history=3)
+    with open(tmp_path / "s1.log", "a") as f:
+        f.write('{"op": "interaction", "interac')  # torn write from a crash
+
+    history, data = AppendLogSessionStore(str(tmp_path), durability="shutdown").load("s1", max_history=3)
+    assert [item["user_query"] for item in history] == ["q2", "q3", "q4"]
+    assert data == {"theme": "dark"}
+    store.close()
+
+def test_append_log_session_store_write_behind(tmp_path):
+    """Buffered modes only touch the disk when flushed"""
+    import os
+    from app.services.session_store import AppendLogSessionStore
+
+    store = AppendLogSessionStore(str(tmp_path), durability="shutdown")
+    store.append_interaction("s1", {"user_query": "q0"})
+    store.append_interaction("s2", {"user_query": "q0"})
+    assert not os.path.exists(tmp_path / "s1.log")
+
+    store.close()
+    assert os.path.exists(tmp_path / "s1.log")
+    assert os.path.exists(tmp_path / "s2.log")
+
+def test_sqlite_session_store_is_shared_between_workers(tmp_path):
+    """Two stores on one database see each other's writes; old interactions are pruned"""
+    import sqlite3
+    from app.services.context import SessionContext
+    from app.services.session_store import SQLiteSessionStore
+    from app.services.sessions import SessionManager
+
+    path = str(tmp_path / "sessions.db")
+    worker_a = SQLiteSessionStore(path, durability="shutdown", compact_after=4)
+    worker_b = SQLiteSessionStore(path, durability="shutdown", compact_after=4)
+    manager_b = SessionManager(session_factory=lambda session_id: SessionContext(session_id, max_history=3, store=worker_b))
+
+    session_b = manager_b.get("s1")
+    assert not session_b.interaction_history
+
+    for i in range(4):
+        worker_a.append_interaction("s1", {"timestamp": f"2024-01-01T00:00:0{i}", "user_query": f"q{i}"}, max_history=3)
+    worker_a.set_data("s1", "theme", "dark")
+    worker_a.flush()
+
+    # The cached session is refreshed from the shared store
+    assert manager_b.get("s1") is session_b
+    assert [item["user_query"] for item in session_b.interaction_history] == ["q1", "q2", "q3"]
+    assert session_b.get_data("theme") == "dark"
+
+    # The fourth interaction pruned the session down to max_history rows
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+    assert rows == 3
+
+    # Releasing a session prunes it early and forgets its counters
+    worker_a.append_interaction("s1", {"timestamp": "2024-01-01T00:00:04", "user_query": "q4"}, max_history=3)
+    worker_a.release("s1")
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+    assert rows == 3
+    assert "s1" not in worker_a._written and "s1" not in worker_a._max_history
+    worker_a.close()
+    worker_b.close()
+
+def test_context_summary_is_cached_and_unchanged(tmp_path):
+    """The incrementally maintained summary matches the original rebuild-every-time output"""
+    from datetime import datetime
+    from app.services.context import SessionContext
+    from app.services.session_store import AppendLogSessionStore
+
+    def rebuild(history):
+        summary = []
+        for i, interaction in enumerate(list(history)[-3:]):
+            timestamp = datetime.fromisoformat(interaction['timestamp']).strftime('%H:%M:%S')
+            summary.append(f"Interaction {i+1} ({timestamp}):")
+            summary.append(f"User: {interaction['user_query']}")
+            response = interaction['response']
+            if isinstance(response, dict) and 'function' in response:
+                summary.append(f"System: Used function '{response['function']}'")
+            elif isinstance(response, dict) and 'error' in response:
+                summary.append(f"System: Error - {response['error']}")
+            else:
+                summary.append("System: Response provided")
+            summary.append("---")
+        return "\n".join(summary)
+
+    store = AppendLogSessionStore(str(tmp_path), durability="shutdown")
+    session = SessionContext("s1", max_history=5, store=store)
+    assert session.get_context_summary() == "No previous interactions."
+
+    responses = [{"function": "system.get_cpu_usage"}, {"error": "boom"}, "text", {}]
+    for i in range(7):
+        session.add_interaction(f"query {i}", responses[i % len(responses)])
+        summary = session.get_context_summary()
+        assert summary == rebuild(session.interaction_history)
+        assert session.get_context_summary() is summary
+    assert len(session.interaction_history) == 5
+
+    store.flush()
+    reloaded = SessionContext("s1", max_history=5, store=store)
+    assert reloaded.get_context_summary() == summary
+
+def test_registry_session_prior_reranks_vector_candidates(tmp_path, monkeypatch):
+    """Functions used earlier in the session are favoured among vector search candidates"""
+    from app.config import settings
+    from app.services.registry import FunctionRegistry
+
+    monkeypatch.setattr(settings, "vector_db_path", str(tmp_path))
+    monkeypatch.setattr(settings, "lexical_fast_path", False)
+    registry = FunctionRegistry(ModelManager(embedding_factory=FakeEmbeddingService))
+
+    plain = registry.search("check it again")
+    assert len(plain["ids"][0]) == 3
+    assert "scores" not in plain
+
+    monkeypatch.setattr(settings, "context_prior_weight", 0.9)
+    used = [function_id for function_id in registry.records if function_id != plain["ids"][0][0]][0]
+    ranked = registry.search("check it again", recent_functions=[used])
+    assert ranked["ids"][0][0] == used
+    assert len(ranked["ids"][0]) == 3
+    assert ranked["scores"][0] == sorted(ranked["scores"][0], reverse=True)
+
+    monkeypatch.setattr(settings, "context_prior_weight", 0.0)
+    assert registry.search("check it again", recent_functions=[used])["ids"] == plain["ids"]
+
+    # Function vectors are read at build time, so the prior never queries the index
+    assert set(registry.function_vectors) == set(registry.records)
+    monkeypatch.setattr(settings, "context_prior_weight", 0.9)
+    monkeypatch.setattr(registry.db, "get_embeddings", lambda ids: pytest.fail("index read during search"))
+    assert registry.search("check it again", recent_functions=[used])["ids"] == ranked["ids"]
+
+def test_code_plan_renders_like_the_metadata_path():
+    """Plans compiled from the function object fill the pre-rendered script with extracted arguments"""
+    import inspect
+    from app.functions import utilities
+    from app.services.code_generator import CodeGenerator, CodePlan, render_script
+
+    info = {"module": "utilities", "name": "copy_file", "signature": str(inspect.signature(utilities.copy_file))}
+    plan = CodePlan.from_function(utilities.copy_file, "utilities")
+    generator = CodeGenerator(model_manager=object(), plans={"utilities.copy_file": plan})
+    prompt = "copy, source is notes, destination is 42"
+
+    code = generator.generate_function_code(info, prompt)
+    assert generator.get_plan(info) is plan
+    assert code == render_script("utilities", "copy_file", 'source="notes", destination=42')
+    assert code == CodePlan.from_metadata(info).render(prompt)
+    assert plan.render(None) == render_script("utilities", "copy_file", "")
+
+    # A changed signature recompiles the plan from the metadata
+    stale = dict(info, signature="(source)")
+    assert generator.get_plan(stale) is not plan
+
+def test_generated_code_cache_is_keyed_on_fingerprint_and_arguments():
+    """Identical (function, arguments) pairs reuse the script; a source change invalidates it"""
+    import inspect
+    from app.functions import utilities
+    from app.services.code_generator import CodeGenerator
+
+    generator = CodeGenerator(model_manager=object())
+    info = {"module": "utilities", "name": "list_directory", "fingerprint": "v1",
+            "signature": str(inspect.signature(utilities.list_directory))}
+
+    first = generator.generate_function_code(info, "list files, path is tmp")
+    assert generator.generate_function_code(info, "please list, PATH is tmp") == first
+    assert generator.cache.stats()["hits"] == 1
+    assert generator.generate_function_code(info, "list files, path is var") != first
+
+    generator.generate_function_code(dict(info, fingerprint="v2"), "list files, path is tmp")
+    assert generator.cache.stats()["misses"] == 3
+
+def test_llm_code_cache_persists_to_disk(tmp_path):
+    """LLM-generated code is cached by function and normalized context, across restarts"""
+    from app.services.llm import LLMService
+    from app.utils.cache import PersistentLRUCache
+
+    path = str(tmp_path / "llm_code.jsonl")
+    generated = []
+
+    def make_service():
+        service = LLMService.__new__(LLMService)  # skip loading the model
+        service.model_name = "tiny"
+        service.precision = "auto"
+        service.code_cache = PersistentLRUCache(path, max_size=2)
+        service._generate_code = lambda metadata, context=None: generated.append(context) or f"code {len(generated)}"
+        return service
+
+    info = {"module": "system", "name": "get_cpu_usage", "signature": "()", "docstring": "", "fingerprint": "f1"}
+    service = make_service()
+    assert service.generate_code(info, "Check CPU") == "code 1"
+    assert service.generate_code(info, "  check   cpu ") == "code 1"
+    for i in range(4):
+        service.generate_code(info, f"context {i}")
+
+    # Only the two most recent entries survive, in memory and after a restart
+    restarted = make_service()
+    assert len(restarted.code_cache) == 2
+    assert restarted.generate_code(info, "context 3") == "code 5"
+    assert len(generated) == 5
+    with open(path, "a") as f:
+        f.write('["torn')
+    assert len(make_service().code_cache) == 2
+
+def test_generation_batcher_groups_concurrent_requests_by_length():
+    """Concurrent prompts are batched, with lengths in a batch at most max_padding apart"""
+    import threading
+    from app.services.batching import GenerationBatcher
+
+    batches = []
+
+    def generate_batch(prompts):
+        batches.append(list(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+    batcher = GenerationBatcher(generate_batch, measure=len, max_batch_size=8, max_wait_ms=200, max_padding=2)
+    prompts = ["ab", "abc", "abcdefgh", "abcdefg", "a"]
+    results = {}
+    threads = [threading.Thread(target=lambda p=p: results.update({p: batcher.generate(p)})) for p in prompts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {prompt: prompt.upper() for prompt in prompts}
+    assert sorted(map(sorted, batches)) == [["a", "ab", "abc"], ["abcdefg", "abcdefgh"]]
+    assert batcher.stats()["batch_size"]["count"] == 2
+
+def test_generation_batcher_survives_failures():
+    """Short or failing batches fail their callers, and the worker keeps serving"""
+    import time
+    from app.services.batching import GenerationBatcher
+
+    calls = []
+
+    def generate_batch(prompts):
+        calls.append(prompts)
+        return [] if len(calls) == 1 else [prompt.upper() for prompt in prompts]
+
+    batcher = GenerationBatcher(generate_batch, measure=len, max_wait_ms=1, timeout=5)
+    with pytest.raises(RuntimeError, match="0 completions for 1 prompts"):
+        batcher.generate("first")
+    assert batcher.generate("second") == "SECOND"
+
+    # A failing grouping step does not kill the worker
+    batcher.group = lambda items: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        batcher.generate("third")
+    del batcher.group
+    assert batcher.generate("fourth") == "FOURTH"
+
+    # Callers stop waiting after the timeout
+    batcher.generate_batch = lambda prompts: time.sleep(0.5) or prompts
+    batcher.timeout = 0.05
+    with pytest.raises(TimeoutError):
+        batcher.generate("slow")
+
+def test_until_code_fence_stops_at_the_closing_fence():
+    """Streamed code ends before the closing fence, even when it arrives split across chunks"""
+    from app.services.llm import until_code_fence
+
+    assert list(until_code_fence(["import os\n", "x = 1`", "`", "`\nprint('after')"])) == ["import os\n", "x = 1"]
+    assert list(until_code_fence(["a = '``", "b'"])) == ["a = '", "``b'"]
+    assert "".join(until_code_fence(["no fence\n", "at all"])) == "no fence\nat all"
+
+def test_llm_stream_code_assembles_cancels_and_caches():
+    """LLMService.stream_code forwards a stub model's chunks up to the fence, caches the code and cancels generation"""
+    from app.services.llm import build_code_prompt, extract_code
+    from benchmarks.fakes import FakeLLMService
+
+    metadata = {"module": "system", "name": "get_memory_usage", "signature": "()", "docstring": "Memory usage"}
+    started = []
+
+    class StubModel(FakeLLMService):
+        def _start_stream(self, prompt, max_new_tokens, cancelled, failure):
+            started.append(cancelled)
+            return super()._start_stream(prompt, max_new_tokens, cancelled, failure)
+
+    llm = StubModel()
+    chunks = list(llm.stream_code(metadata, "how much memory"))
+    expected = extract_code(llm.generate_batch([build_code_prompt(metadata, "how much memory")])[0])
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == expected
+    assert started[-1].is_set()
+
+    # The completed generation is cached and served in one piece
+    assert list(llm.stream_code(metadata, "how much memory")) == [expected]
+    assert len(started) == 1
+
+    # A consumer that stops early cancels generation and caches nothing
+    stream = llm.stream_code(metadata, "something else")
+    next(stream)
+    stream.close()
+    assert started[-1].is_set()
+    assert len(llm.code_cache) == 1
+
+    class FailingModel(FakeLLMService):
+        def _script(self, prompt):
+            raise RuntimeError("out of memory")
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        list(FailingModel().stream_code(metadata))
+
+def test_inference_precision_is_part_of_the_embedding_key():
+    """Vectors from different precisions never share index fingerprints or cached query vectors"""
+    from app.models.database import VectorDatabase
+
+    assert ModelManager(embedding_model="mini", precision="auto").embedding_key == "mini"
+    assert ModelManager(embedding_model="mini", precision="fp32").embedding_key == "mini"
+    int8 = ModelManager(embedding_model="mini", precision="int8")
+    assert int8.embedding_key == "mini@int8"
+    assert int8.status()["embedding"]["precision"] == "int8"
+
+    # Only the salt matters for the key, so skip opening a Chroma client
+    full, quantized = VectorDatabase.__new__(VectorDatabase), VectorDatabase.__new__(VectorDatabase)
+    full.fingerprint_salt, quantized.fingerprint_salt = "mini", int8.embedding_key
+    assert full._query_cache_key("open calculator") != quantized._query_cache_key("open calculator")
+
+    with pytest.raises(ValueError):
+        ModelManager(precision="fp8")
+
+def test_timing_middleware_reports_stages_and_prometheus_metrics(monkeypatch):
+    """Stages timed during a request end up in Server-Timing and in the stage histograms"""
+    import asyncio
+    import time
+    import httpx
+    from app.utils.logging import PerformanceTimer
+    from app.utils.metrics import PrometheusWriter
+    from app.utils.timing import RequestMetrics, TimingMiddleware
+
+    metrics = RequestMetrics()
+
+    async def endpoint(scope, receive, send):
+        with metrics.stage("retrieval"):
+            await asyncio.sleep(0.01)
+        with metrics.stage("codegen"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def request():
+        transport = httpx.ASGITransport(app=TimingMiddleware(endpoint, metrics))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/execute")
+
+    header = asyncio.run(request()).headers["server-timing"]
+    entries = dict(entry.split(";dur=") for entry in header.split(", "))
+    assert list(entries) == ["retrieval", "codegen", "total"]
+    assert float(entries["retrieval"]) >= 10 and float(entries["total"]) >= float(entries["retrieval"])
+
+    writer = PrometheusWriter()
+    writer.histogram("stage_duration_seconds", "Latency of request stages", metrics.stages.snapshots())
+    writer.counter("requests_total", "HTTP responses", metrics.responses.samples())
+    text = writer.render()
+    assert "# TYPE app_stage_duration_seconds histogram" in text
+    assert 'app_stage_duration_seconds_bucket{stage="retrieval",le="+Inf"} 1' in text
+    assert 'app_stage_duration_seconds_count{stage="codegen"} 1' in text
+    assert 'app_requests_total{method="GET",route="unmatched",status="200"} 1' in text
+
+    # Elapsed time ignores wall clock jumps
+    with PerformanceTimer() as timer:
+        monkeypatch.setattr(time, "time", lambda: 0.0)
+    assert 0 <= timer.elapsed < 1
+
+def test_retrieval_evaluation_covers_every_function_and_matches_the_offline_baseline():
+    """The labeled prompt set covers app/functions and offline retrieval quality does not regress"""
+    import inspect
+    import json
+    from app.functions import application, system, utilities
+    from benchmarks.eval_retrieval import OFFLINE_BASELINE, load_cases, regressions, run
+
+    functions = {
+        f"{module.__name__.rsplit('.', 1)[-1]}.{name}"
+        for module in (application, system, utilities)
+        for name, _ in inspect.getmembers(module, inspect.isfunction) if not name.startswith("_")
+    }
+    cases = load_cases()
+    assert {case["expected"] for case in cases} == functions
+    assert {case["kind"] for case in cases} == {"direct", "paraphrase"}
+
+    reports = run({"default": {}}, offline=True)
+    assert set(reports["default"]) == {"all", "direct", "paraphrase", "multiturn"}
+    with open(OFFLINE_BASELINE) as f:
+        assert regressions(reports, json.load(f)) == []
+
+    # The stand-ins have no precision to change, so the override is refused rather than ignored
+    with pytest.raises(ValueError, match="int8"):
+        run({"int8": {"inference_precision": "int8"}}, offline=True)
+
+def test_disk_usage_skips_unreadable_mounts(monkeypatch):
+    """Without a sampler, mounts that fail with any OSError are left out instead of failing the call"""
+    import errno
+    from collections import namedtuple
+    from app.functions import system
+    from app.services import system_sampler
+
+    Partition = namedtuple("Partition", "mountpoint")
+    Usage = namedtuple("Usage", "total used free percent")
+    failures = {"/denied": PermissionError(errno.EACCES, "denied"), "/stale": OSError(errno.EIO, "I/O error")}
+
+    def disk_usage(mountpoint):
+        if mountpoint in failures:
+            raise failures[mountpoint]
+        return Usage(2 * 1024 ** 3, 1024 ** 3, 1024 ** 3, 50.0)
+
+    monkeypatch.setattr(system_sampler, "_default_sampler", None)
+    monkeypatch.setattr(system.psutil, "disk_partitions", lambda: [Partition(p) for p in ("/", "/denied", "/stale")])
+    monkeypatch.setattr(system.psutil, "disk_usage", disk_usage)
+    assert list(system.get_disk_usage()) == ["/"]
+    assert system.get_disk_usage()["/"]["percentage"] == "50.0%"
+
+def test_system_functions_answer_from_the_background_sampler(monkeypatch):
+    """With a running sampler the system functions return instantly, including windowed averages"""
+    import time
+    import psutil
+    from app.functions import system
+    from app.services import system_sampler
+    from app.services.system_sampler import SystemSampler
+
+    sampler = SystemSampler(interval=0.02, history_seconds=0.1, disk_interval=60)
+    monkeypatch.setattr(system_sampler, "_default_sampler", sampler)
+    sampler.start()
+    try:
+        assert sampler.latest() is not None
+        time.sleep(0.2)
+        assert len(sampler.samples) == sampler.samples.maxlen == 5
+
+        start = time.perf_counter()
+        overall = system.get_cpu_usage()
+        cores = system.get_cpu_usage(per_cpu=True)
+        averaged = system.get_cpu_usage(window=0.06)
+        memory = system.get_memory_usage(window="0.06")
+        disks = system.get_disk_usage()
+        assert time.perf_counter() - start < 0.05
+    finally:
+        sampler.stop()
+
+    assert isinstance(overall, float) and 0 <= averaged <= 100
+    assert len(cores) == psutil.cpu_count()
+    assert set(memory) == {"total", "available", "used", "percentage"}
+    assert all(set(usage) == {"total", "used", "free", "percentage"} for usage in disks.values())
+    assert 1 <= len(sampler.window(0.06)) <= 4
+    assert not sampler.running and system_sampler.running_sampler() is None